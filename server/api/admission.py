@@ -0,0 +1,119 @@
+"""
+Admission middleware for upload endpoints
+"""
+
+import json
+from typing import Dict, Iterable, Optional
+
+from services.admission import AdmissionController, Rejection
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that sheds uploads before their bodies are read
+
+    POSTs to ``paths`` go through ``controller.admit`` on their
+    Content-Length and are answered straight away with 413, 429 or 503
+    (plus ``Retry-After``) if refused. Bodies sent without a
+    Content-Length, or longer than announced, are cut off with 413 as
+    soon as they pass the size limit. POSTs to ``size_limits`` paths
+    only get the size checks, against their own limit: they are not
+    video jobs, so the job queue says nothing about whether to take them.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: AdmissionController,
+        paths: Iterable[str] = ("/api/v1/upload/video",),
+        size_limits: Optional[Dict[str, int]] = None
+    ):
+        self.app = app
+        self.controller = controller
+        self.paths = set(paths)
+        self.size_limits = dict(size_limits or {})
+
+    @staticmethod
+    def _content_length(scope) -> Optional[int]:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    async def _reject(send, rejection: Rejection):
+        body = json.dumps(rejection.as_dict()).encode("utf-8")
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1"))
+        ]
+        if rejection.retry_after is not None:
+            headers.append((b"retry-after", str(rejection.retry_after).encode("latin-1")))
+        await send({"type": "http.response.start", "status": rejection.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path")
+        if (
+            scope["type"] != "http" or scope["method"] != "POST"
+            or (path not in self.paths and path not in self.size_limits)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        admitted = path in self.paths
+        if admitted:
+            limit = controller.max_upload_size
+            rejection = controller.admit(self._content_length(scope))
+        else:
+            limit = self.size_limits[path]
+            rejection = controller.check_size(self._content_length(scope), limit)
+        if rejection is not None:
+            await self._reject(send, rejection)
+            return
+
+        received = 0
+        # Size-only uploads hold no admission slot to give back
+        released = not admitted
+        started = False
+        cut_off = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                controller.release()
+
+        async def limited_receive():
+            nonlocal received, cut_off
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    release()
+                    if not started:
+                        cut_off = True
+                        await self._reject(send, controller.check_size(received, limit))
+                    # The app sees a client that went away and stops reading
+                    return {"type": "http.disconnect"}
+                if not message.get("more_body", False):
+                    release()
+            elif message["type"] == "http.disconnect":
+                release()
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if cut_off:
+                return
+            started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        finally:
+            release()
@@ -2,16 +2,34 @@
 API Routes for HomeworkGuardian
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Header
+from fastapi.responses import Response
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+import asyncio
 import logging
 import json
+import time
 
-from services.analysis_service import AnalysisService
+from core.config import settings
+from services.analysis_service import AnalysisService, decode_image
 from services.email_service import EmailService
+from services.admission import AdmissionController
 from services.alert_service import AlertService
+from services.device_telemetry import DeviceTelemetry
+from services.event_log import EventLogConsumer, create_event_log
+from services.ingest_shards import ShardCoordinator
+from services.notification_outbox import NotificationDispatcher, notification_outbox
+from services.report_batch import DailyReportBatch
+from services.state_snapshot import StateSnapshotter
+from services.report_cache import (
+    ReportCache,
+    CachedReport,
+    REPORT_DAILY,
+    REPORT_WEEKLY,
+    week_start
+)
 from models.schemas import (
     AnalysisRequest,
     AnalysisResponse,
@@ -24,9 +42,69 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # Service instances
-analysis_service = AnalysisService()
+device_telemetry = DeviceTelemetry()
+analysis_service = AnalysisService(telemetry=device_telemetry)
+upload_admission = AdmissionController(analysis_service.video_jobs, telemetry=device_telemetry)
 email_service = EmailService()
-alert_service = AlertService()
+alert_service = AlertService(notification_outbox)
+state_snapshotter = StateSnapshotter(alert_service)
+notification_dispatcher = NotificationDispatcher(notification_outbox, email_service)
+report_cache = ReportCache()
+ingest_shards = ShardCoordinator()
+event_log = create_event_log()
+report_batch = DailyReportBatch(
+    notification_outbox,
+    children_provider=lambda: [
+        (config.child_id, config.email)
+        for config in alert_service.configs.values()
+        if config.enable_email
+    ]
+)
+
+
+def _report_response(report: CachedReport, if_none_match: Optional[str]) -> Response:
+    """
+    Serve a cached report, answering 304 when the client copy is current
+    """
+    headers = {"ETag": report.etag, "Cache-Control": "private, no-cache"}
+    if report.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=report.body,
+        media_type="application/json",
+        headers=headers
+    )
+
+
+async def apply_event(event: Dict[str, Any]) -> List[str]:
+    """
+    Evaluate alerts and invalidate report rollups for one metadata event
+    """
+    if ingest_shards.enabled:
+        # Alert state lives on the shard owning this session
+        shard_result = await ingest_shards.submit(event)
+        alerts = shard_result["alerts_triggered"]
+    else:
+        alerts = await alert_service.check_and_trigger(
+            event["session_id"],
+            event["child_id"],
+            event["activity"],
+            event["duration_seconds"]
+        )
+    await report_cache.invalidate_event(
+        event["child_id"], datetime.fromisoformat(event["timestamp"])
+    )
+    return alerts
+
+
+event_consumer = (
+    EventLogConsumer(
+        event_log,
+        apply_event,
+        partitions=settings.EVENT_LOG_CONSUMER_PARTITIONS or None
+    )
+    if event_log is not None else None
+)
 
 
 # ==================== Upload Endpoints ====================
@@ -38,6 +116,14 @@ async def upload_metadata(request: AnalysisRequest):
     """
     try:
         result = await analysis_service.process_metadata(request)
+        event = request.model_dump(mode="json")
+        if event_log is not None:
+            # Consumers evaluate alerts; respond as soon as the event is logged
+            partition, message_id = await event_log.append(event)
+            result["alerts_triggered"] = []
+            result["queued"] = {"partition": partition, "id": message_id}
+        else:
+            result["alerts_triggered"] = await apply_event(event)
         return {"status": "success", "data": result}
     except Exception as e:
         logger.error(f"Error processing metadata: {e}")
@@ -48,16 +134,24 @@ async def upload_metadata(request: AnalysisRequest):
 async def upload_video(
     video: UploadFile = File(...),
     session_id: Optional[str] = None,
-    timestamp: Optional[str] = None
+    timestamp: Optional[str] = None,
+    child_id: Optional[str] = None
 ):
     """
     Upload video segment from mobile device
+
+    Segments queue fairly per child; ``child_id`` defaults to the one
+    the session was started for.
     """
+    if child_id is None and session_id is not None:
+        state = alert_service.session_states.get(session_id)
+        child_id = state.child_id if state is not None else None
     try:
         result = await analysis_service.process_video(
             video, 
             session_id=session_id,
-            timestamp=timestamp
+            timestamp=timestamp,
+            tenant=child_id
         )
         return {"status": "success", "data": result}
     except Exception as e:
@@ -65,6 +159,37 @@ async def upload_video(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/upload/frame")
+async def upload_frame(
+    frame: UploadFile = File(...),
+    session_id: Optional[str] = None
+):
+    """
+    Upload a live camera frame for alerting
+
+    Answers with ``dropped: true`` if a newer frame from the session
+    superseded this one or it went stale before a worker was free.
+    Staleness is measured from when the server received the frame;
+    device clocks are not trusted.
+    """
+    received = time.monotonic()
+    # Frames supersede each other per session, so anonymous ones would collide
+    if not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required for live frames")
+    # Decoding a full-size JPEG would otherwise stall the event loop
+    image = await asyncio.to_thread(decode_image, await frame.read())
+    if image is None:
+        raise HTTPException(status_code=400, detail="Frame is not a decodable image")
+    try:
+        result = await analysis_service.submit_live_frame(
+            image, session_id, time.monotonic() - received
+        )
+        return {"status": "success", "data": result}
+    except Exception as e:
+        logger.error(f"Error processing frame: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ==================== Analysis Endpoints ====================
 
 @router.post("/analysis/segment")
@@ -110,6 +235,8 @@ async def set_alert_config(config: AlertConfig):
     """
     try:
         await alert_service.update_config(config)
+        if ingest_shards.enabled:
+            await ingest_shards.update_config(config)
         return {"status": "success", "message": "Alert config updated"}
     except Exception as e:
         logger.error(f"Error updating alert config: {e}")
@@ -122,44 +249,148 @@ async def get_alert_status(session_id: str):
     Get current alert status for a session
     """
     try:
-        status = await alert_service.get_status(session_id)
+        if ingest_shards.enabled:
+            status = await ingest_shards.get_status(session_id)
+        else:
+            status = await alert_service.get_status(session_id)
         return {"status": "success", "data": status}
     except Exception as e:
         logger.error(f"Error getting alert status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/alert/outbox")
+async def get_outbox_stats():
+    """
+    Get outbound notification queue counts
+    """
+    return {"status": "success", "data": notification_outbox.stats()}
+
+
+@router.get("/analysis/quality")
+async def get_analysis_quality():
+    """
+    Get the current detection quality tier, latency and queue depth
+    """
+    return {"status": "success", "data": analysis_service.quality.stats()}
+
+
+@router.get("/analysis/scheduler")
+async def get_frame_scheduler_stats():
+    """
+    Get frame queue depths, drop counts and live frame age
+    """
+    return {"status": "success", "data": analysis_service.scheduler.stats()}
+
+
+@router.get("/analysis/video-queue")
+async def get_video_queue_stats():
+    """
+    Get per-child video queue depth, running jobs and wait times
+    """
+    return {"status": "success", "data": analysis_service.video_jobs.stats()}
+
+
+@router.get("/upload/admission")
+async def get_upload_admission_stats():
+    """
+    Get upload queue depth, drain rate and rejection counts
+    """
+    return {"status": "success", "data": upload_admission.stats()}
+
+
+@router.get("/alert/sessions")
+async def get_alert_session_stats():
+    """
+    Get tracked alert session count and memory per session
+    """
+    return {"status": "success", "data": alert_service.get_session_stats()}
+
+
+@router.get("/ingest/shards")
+async def get_ingest_shards():
+    """
+    Get ingest shard workers and their session counts
+    """
+    if not ingest_shards.enabled:
+        return {"status": "success", "data": {"workers": [], "shards": []}}
+    return {"status": "success", "data": await ingest_shards.stats()}
+
+
+@router.get("/ingest/log")
+async def get_event_log_stats():
+    """
+    Get event-log consumer progress and per-partition lag
+    """
+    if event_consumer is None:
+        return {"status": "success", "data": {"enabled": False}}
+    return {"status": "success", "data": await event_consumer.stats()}
+
+
 # ==================== Report Endpoints ====================
 
 @router.get("/report/daily/{child_id}")
 async def get_daily_report(
     child_id: str,
-    date: Optional[str] = None
+    date: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
 ):
     """
     Get daily learning report
+
+    ``date`` is a local YYYY-MM-DD day, matching how ingested events
+    invalidate the cache; it defaults to today.
     """
     try:
-        report = await analysis_service.generate_daily_report(child_id, date)
-        return {"status": "success", "data": report}
+        day = datetime.strptime(date, "%Y-%m-%d") if date else datetime.now()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    try:
+        period = day.strftime("%Y-%m-%d")
+        cached = await report_cache.get(REPORT_DAILY, child_id, period)
+        if cached is None:
+            generation = await report_cache.generation(REPORT_DAILY, child_id, period)
+            report = await analysis_service.generate_daily_report(child_id, period)
+            cached = await report_cache.put(
+                REPORT_DAILY, child_id, period, {"status": "success", "data": report}, generation
+            )
+        return _report_response(cached, if_none_match)
     except Exception as e:
         logger.error(f"Error generating daily report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/report/weekly/{child_id}")
-async def get_weekly_report(child_id: str):
+async def get_weekly_report(
+    child_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """
     Get weekly learning report
     """
     try:
-        report = await analysis_service.generate_weekly_report(child_id)
-        return {"status": "success", "data": report}
+        period = week_start(datetime.now())
+        cached = await report_cache.get(REPORT_WEEKLY, child_id, period)
+        if cached is None:
+            generation = await report_cache.generation(REPORT_WEEKLY, child_id, period)
+            report = await analysis_service.generate_weekly_report(child_id)
+            cached = await report_cache.put(
+                REPORT_WEEKLY, child_id, period, {"status": "success", "data": report}, generation
+            )
+        return _report_response(cached, if_none_match)
     except Exception as e:
         logger.error(f"Error generating weekly report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/report/batch/status")
+async def get_report_batch_status():
+    """
+    Get progress of the nightly daily-report batch
+    """
+    return {"status": "success", "data": report_batch.progress()}
+
+
 # ==================== Email Endpoints ====================
 
 @router.post("/email/test")
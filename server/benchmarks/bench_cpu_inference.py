@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+CPU Inference Benchmark
+Median latency of each CPU execution mode for a small conv classifier and an MLP head
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import torch
+
+from services.cpu_inference import EAGER, CPUInferenceOptimizer, tune_threads
+from services.model_cache import ModelArtifactCache
+
+RUNS = 50
+
+
+def conv_classifier():
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 32, 3, stride=2, padding=1), torch.nn.ReLU(),
+        torch.nn.Conv2d(32, 64, 3, stride=2, padding=1), torch.nn.ReLU(),
+        torch.nn.Conv2d(64, 128, 3, stride=2, padding=1), torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(1), torch.nn.Flatten(),
+        torch.nn.Linear(128, 5)
+    ).eval(), torch.randn(1, 3, 224, 224)
+
+
+def mlp_head():
+    return torch.nn.Sequential(
+        torch.nn.Linear(1024, 2048), torch.nn.ReLU(),
+        torch.nn.Linear(2048, 2048), torch.nn.ReLU(),
+        torch.nn.Linear(2048, 5)
+    ).eval(), torch.randn(8, 1024)
+
+
+if __name__ == "__main__":
+    threads = tune_threads()
+    print("=" * 60)
+    print(f"CPU inference benchmark ({RUNS} runs, threads {threads})")
+    print("=" * 60)
+    print(f"{'model':>14} {'mode':>14} {'ms':>9} {'speedup':>8} {'error':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        optimizer = CPUInferenceOptimizer(
+            cache_path=os.path.join(directory, "cpu.json"),
+            runs=RUNS,
+            artifacts=ModelArtifactCache(os.path.join(directory, "artifacts"))
+        )
+        for name, build in (("conv", conv_classifier), ("mlp", mlp_head)):
+            model, example = build()
+            results = optimizer.benchmark(model, example)
+            for mode, result in results.items():
+                speedup = results[EAGER]["ms"] / result["ms"]
+                print(f"{name:>14} {mode:>14} {result['ms']:>9.3f} {speedup:>7.2f}x {result['error']:>8.4f}")
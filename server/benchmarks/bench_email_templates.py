@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Email Template Benchmark
+Per-message render CPU and allocations: inline f-strings vs compiled templates
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.email_templates import EmailTemplates
+
+ITERATIONS = 20000
+CHILDREN = ["小明", "小红", "小刚", "小丽"]
+
+
+def legacy_render(alert_type: str, child_name: str, details: str):
+    """Alert rendering as EmailService.send_alert did it before templates"""
+    subject_map = {
+        "leave_too_long": f"⚠️ {child_name} 离开时间过长",
+        "play_while_work": f"📱 {child_name} 边玩边学",
+        "session_start": f"✅ {child_name} 开始学习了",
+        "session_end": f"🏁 {child_name} 学习结束"
+    }
+    body_map = {
+        "leave_too_long": f"提醒：{child_name} 已经离开超过15分钟了。请关注。",
+        "play_while_work": f"提醒：检测到{child_name}一边学习一边玩耍超过5分钟。",
+        "session_start": f"{child_name}已开始学习。学习时长统计已开始。",
+        "session_end": f"{child_name}今日学习已结束。详情请查看学习报告。"
+    }
+    subject = subject_map.get(alert_type, "HomeworkGuardian 提醒")
+    body = body_map.get(alert_type, details)
+    html = f"""
+        <html>
+        <body>
+            <h2>{subject}</h2>
+            <p>{body}</p>
+            <p>时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
+            <hr>
+            <p><small>来自 HomeworkGuardian 家庭作业监控系统</small></p>
+        </body>
+        </html>
+        """
+    return subject, MIMEText(body, "plain"), MIMEText(html, "html")
+
+
+def template_render(templates: EmailTemplates):
+    def render(alert_type: str, child_name: str, details: str):
+        rendered = templates.render_alert(alert_type, child_name, details)
+        html = rendered.html(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        return rendered.subject, rendered.text_part(), MIMEText(html, "html")
+    return render
+
+
+def measure(name: str, render):
+    # Warm up caches so steady-state cost is measured
+    for child in CHILDREN:
+        render("leave_too_long", child, "离开时间: 16 分钟")
+        render("play_while_work", child, "玩耍时间: 5 分钟")
+
+    start = time.process_time_ns()
+    for i in range(ITERATIONS):
+        render("leave_too_long", CHILDREN[i % len(CHILDREN)], "离开时间: 16 分钟")
+    cpu_us = (time.process_time_ns() - start) / ITERATIONS / 1000
+
+    tracemalloc.start()
+    for i in range(1000):
+        render("play_while_work", CHILDREN[i % len(CHILDREN)], "玩耍时间: 5 分钟")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<12} {cpu_us:8.2f} us/msg   peak allocated {peak / 1024:6.1f} KiB")
+    return cpu_us
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print(f"Email render benchmark ({ITERATIONS} messages)")
+    print("=" * 60)
+    legacy = measure("f-strings", legacy_render)
+    compiled = measure("templates", template_render(EmailTemplates()))
+    print(f"Speedup: {legacy / compiled:.1f}x")
@@ -3,7 +3,7 @@ Core Configuration
 """
 
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 
 
@@ -28,6 +28,38 @@ class Settings(BaseSettings):
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
     EMAIL_FROM: str = "noreply@homeworkguardian.com"
+    EMAIL_LOCALE: str = "zh_CN"
+    SMTP_START_TLS: bool = True
+    SMTP_POOL_SIZE: int = 4
+    SMTP_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_IDLE_CHECK_SECONDS: int = 30
+    
+    # Notification outbox
+    OUTBOX_PATH: str = "/data/outbox.db"
+    OUTBOX_CONCURRENCY: int = 8
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BASE_DELAY_SECONDS: float = 5.0
+    OUTBOX_MAX_DELAY_SECONDS: float = 900.0
+    OUTBOX_LEASE_SECONDS: float = 300.0
+    
+    # Alert digests (per-recipient coalescing)
+    ALERT_DIGEST_WINDOW_SECONDS: int = 60
+    ALERT_DIGEST_MAX_ALERTS: int = 10
+    ALERT_DIGEST_URGENT_TYPES: List[str] = ["leave_too_long"]
+    
+    # Alert session state
+    SESSION_IDLE_TTL_SECONDS: int = 4 * 3600
+    SESSION_EVICT_BATCH: int = 64
+    STATE_SNAPSHOT_ENABLED: bool = True
+    STATE_SNAPSHOT_DIR: str = "/data/state"
+    STATE_SNAPSHOT_INTERVAL_SECONDS: float = 300.0
+    STATE_JOURNAL_FLUSH_SECONDS: float = 1.0
+    ALERT_STATE_BACKEND: str = "memory"  # "memory" or "redis"; use redis with WORKERS > 1
+    ALERT_CONFIG_CACHE_SECONDS: float = 5.0
+    # Singleton jobs (nightly report batch) run on one elected worker:
+    # a Redis lock with the redis backend, else a file lock in this dir
+    LEADER_LOCK_DIR: str = "/data/locks"
+    LEADER_LOCK_TTL_SECONDS: float = 60.0
     
     # Alert thresholds
     ALERT_LEAVE_MINUTES: int = 15
@@ -35,10 +67,84 @@ class Settings(BaseSettings):
     
     # GPU
     USE_GPU: bool = True
+    # Import torch and probe the GPU in the background after start-up;
+    # disable on metadata/alert-only workers so they never load torch
+    MODEL_WARMUP: bool = True
+    # Pose detectors built and warmed up with synthetic frames before /ready
+    DETECTOR_POOL_SIZE: int = 2
+    WARMUP_RESOLUTIONS: List[str] = ["640x480", "1280x720"]
+    WARMUP_FRAMES: int = 2
+    # Load-adaptive detection quality (services.quality_control)
+    QOS_ENABLED: bool = True
+    QOS_LATENCY_SLO_MS: float = 200.0
+    QOS_QUEUE_HIGH: int = 8
+    QOS_QUEUE_LOW: int = 2
+    QOS_DEGRADE_AFTER: int = 3  # consecutive overloaded checks before stepping down
+    QOS_RECOVER_AFTER: int = 10  # consecutive calm checks before stepping up
+    QOS_EVAL_INTERVAL_SECONDS: float = 1.0
+    # Live frames older than this are dropped instead of analyzed (services.frame_scheduler)
+    FRAME_STALENESS_SECONDS: float = 2.0
+    FRAME_SCHEDULER_WORKERS: int = 2
+    # Weighted fair sharing of process_video jobs across children (services.fair_queue)
+    VIDEO_JOBS_CONCURRENCY: int = 4
+    VIDEO_JOBS_TENANT_CONCURRENCY: int = 1
+    VIDEO_JOBS_TENANT_WEIGHTS: Dict[str, float] = {}  # child_id -> weight, default 1.0
+    # Inference device pool: every GPU, else CPU core groups of this size (0 = one group)
+    DEVICE_POOL_CPU_GROUP_SIZE: int = 4
+    DEVICE_POOL_MEMORY_WEIGHT: float = 1.0
+    # Compiled/exported models (python -m services.model_cache warm ...)
+    MODEL_ARTIFACT_DIR: str = "/app/model_cache"
+    # CPU inference (GPUDetector.optimize_for_inference without CUDA)
+    CPU_INFERENCE_THREADS: int = 0  # 0 = all CPUs in the affinity mask
+    CPU_INFERENCE_CACHE_PATH: str = "/data/cpu_inference.json"
+    CPU_INFERENCE_BENCHMARK_RUNS: int = 20
+    CPU_INFERENCE_MAX_ERROR: float = 0.05  # relative to the largest eager output
+    # Device telemetry served by /health and /api/v1/gpu/status
+    TELEMETRY_INTERVAL_SECONDS: float = 10.0
+    TELEMETRY_HISTORY_SIZE: int = 60
+    
+    # Server
+    WORKERS: int = 1
+    # Session-affine ingestion processes (0 = evaluate alerts in-process);
+    # an alternative to WORKERS > 1 with a shared alert state backend
+    INGEST_SHARDS: int = 0
+    INGEST_SHARD_VNODES: int = 128
+    
+    # Event-log ingestion ("off", "file" or "redis"); when enabled,
+    # /upload/metadata appends and returns, consumers evaluate alerts
+    EVENT_LOG_BACKEND: str = "off"  # "file" requires WORKERS = 1
+    EVENT_LOG_DIR: str = "/data/event_log"
+    EVENT_LOG_PARTITIONS: int = 8
+    EVENT_LOG_MAX_LEN: int = 1_000_000
+    EVENT_LOG_GROUP: str = "alerts"
+    EVENT_LOG_CONSUMER_PARTITIONS: List[int] = []  # empty = lock-assigned, one owner per partition
+    EVENT_LOG_CLAIM_IDLE_SECONDS: float = 30.0  # also the retry delay after a failure
+    EVENT_LOG_MAX_DELIVERIES: int = 5  # then the entry goes to the dead-letter stream
     
     # Storage
     UPLOAD_DIR: str = "/data/uploads"
     MAX_UPLOAD_SIZE: int = 500 * 1024 * 1024  # 500MB
+    MAX_FRAME_SIZE: int = 5 * 1024 * 1024  # 5MB, one encoded camera frame
+    # Upload admission control (services.admission); refused uploads get Retry-After
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_QUEUE: int = 32  # queued video jobs plus uploads still arriving
+    ADMISSION_MIN_FREE_DISK_GB: float = 1.0
+    ADMISSION_MAX_MEMORY_PERCENT: float = 90.0
+    ADMISSION_MIN_GPU_FREE_GB: float = 0.5
+    ADMISSION_RETRY_MIN_SECONDS: int = 1
+    ADMISSION_RETRY_MAX_SECONDS: int = 120
+    
+    # Report cache
+    REPORT_CACHE_BACKEND: str = "memory"  # "memory" or "redis"
+    REPORT_CACHE_MAX_ENTRIES: int = 10000
+    REPORT_CACHE_TTL_SECONDS: int = 300
+    
+    # Nightly report batch
+    REPORT_BATCH_DIR: str = "/data/report_batches"
+    REPORT_BATCH_HOUR: int = 21
+    REPORT_BATCH_MINUTE: int = 30
+    REPORT_BATCH_WORKERS: int = 0  # 0 = os.cpu_count()
+    REPORT_BATCH_CHUNK_SIZE: int = 500
     
     class Config:
         env_file = ".env"
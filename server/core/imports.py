@@ -0,0 +1,28 @@
+"""
+Deferred Imports - Heavy optional modules loaded on first use
+"""
+
+import importlib
+import logging
+from functools import lru_cache
+from types import ModuleType
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def optional_import(name: str) -> Optional[ModuleType]:
+    """
+    Import a module on first use, or None if it is not installed
+
+    Model and media libraries (torch, mediapipe, pygame) take longer to
+    import than the rest of the API put together, so modules that only
+    need them on some code paths call this instead of importing at the
+    top. The result is cached, including a failed import.
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        logger.warning(f"{name} not available")
+        return None
@@ -3,8 +3,7 @@ HomeworkGuardian Server - Main Application
 GPU-accelerated backend for child's homework monitoring
 """
 
-import torch
-import cv2
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -15,9 +14,9 @@ from datetime import datetime, timedelta
 import logging
 
 from api import routes
+from api.admission import AdmissionMiddleware
 from core.config import settings
 from core.database import init_db, close_db
-from services.gpu_detector import GPUDetector
 from services.email_service import EmailService
 
 # Configure logging
@@ -28,6 +27,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def warmup_models():
+    """Load models and warm up detectors ahead of the first analysis request"""
+    try:
+        gpu_info = routes.analysis_service.warmup()
+    except Exception as e:
+        # /ready stays 503 so the instance never takes video traffic
+        logger.error(f"Model warmup failed: {e}")
+        return
+    logger.info(f"GPU Status: {gpu_info}")
+    
+    if gpu_info["available"]:
+        logger.info(f"Using GPU: {gpu_info['name']}")
+    else:
+        logger.warning("Running on CPU - performance will be limited")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan handler"""
@@ -37,19 +52,64 @@ async def lifespan(app: FastAPI):
     # Initialize database
     await init_db()
     
-    # Check GPU availability
-    gpu_info = GPUDetector.check_gpu()
-    logger.info(f"GPU Status: {gpu_info}")
+    # Import torch, check GPU availability and warm up detectors off the
+    # start-up path; /ready reports 503 until this finishes
+    warmup = None
+    if settings.MODEL_WARMUP:
+        warmup = asyncio.create_task(asyncio.to_thread(warmup_models))
     
-    if gpu_info["available"]:
-        logger.info(f"Using GPU: {gpu_info['name']}")
-    else:
-        logger.warning("Running on CPU - performance will be limited")
+    # Sample device telemetry for the health endpoints
+    routes.device_telemetry.start()
+    
+    # Deliver queued notifications in the background
+    routes.notification_dispatcher.start()
+    
+    # Load all alert configs and subscribe to changes from other workers
+    await routes.alert_service.load_configs()
+    if settings.WORKERS > 1 and not routes.alert_service.shared_state.shared:
+        logger.warning(
+            "WORKERS > 1 with in-process alert state: each worker sees only part "
+            "of a session's events; set ALERT_STATE_BACKEND=redis"
+        )
+    
+    # Restore alert sessions and pending deadlines from the last run
+    if settings.STATE_SNAPSHOT_ENABLED:
+        await routes.state_snapshotter.restore()
+        routes.state_snapshotter.start()
+    
+    # Fire leave/play deadlines for sessions that stop reporting
+    routes.alert_service.start()
+    
+    # Spawn session-affine ingest shards
+    if routes.ingest_shards.enabled:
+        await routes.ingest_shards.start()
+    
+    # Consume logged metadata events
+    if routes.event_consumer is not None:
+        routes.event_consumer.start()
+    
+    # Schedule nightly daily-report batch
+    routes.report_batch.start_scheduler()
     
     yield
     
     # Shutdown
     logger.info("Shutting down HomeworkGuardian Server...")
+    await routes.report_batch.stop_scheduler()
+    if routes.event_consumer is not None:
+        await routes.event_consumer.stop()
+    if routes.ingest_shards.enabled:
+        await routes.ingest_shards.stop()
+    await routes.alert_service.stop()
+    if settings.STATE_SNAPSHOT_ENABLED:
+        await routes.state_snapshotter.stop()
+    await routes.notification_dispatcher.stop()
+    await routes.device_telemetry.stop()
+    await routes.analysis_service.scheduler.stop()
+    await routes.email_service.close()
+    if warmup is not None:
+        await warmup
+    routes.analysis_service.close()
     await close_db()
 
 
@@ -63,6 +123,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Shed video uploads under load before their bodies are read, and cap
+# live frames by size (added first so CORS headers wrap its rejections)
+app.add_middleware(
+    AdmissionMiddleware,
+    controller=routes.upload_admission,
+    size_limits={"/api/v1/upload/frame": settings.MAX_FRAME_SIZE}
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -89,19 +157,44 @@ async def root():
 # Health check
 @app.get("/health")
 async def health_check():
-    gpu_info = GPUDetector.check_gpu()
     return {
         "status": "healthy",
-        "gpu": gpu_info,
+        "gpu": routes.device_telemetry.latest(),
         "timestamp": datetime.utcnow().isoformat()
     }
 
 
+# Readiness check (liveness is /health)
+@app.get("/ready")
+async def readiness_check():
+    if settings.MODEL_WARMUP and not routes.analysis_service.ready:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {
+        "status": "ready",
+        "warmup": routes.analysis_service.warmup_stats if settings.MODEL_WARMUP else None
+    }
+
+
 # GPU info endpoint
 @app.get("/api/v1/gpu/status")
 async def gpu_status():
-    """Get current GPU status"""
-    return GPUDetector.check_gpu()
+    """Get current GPU status (latest background sample)"""
+    return routes.device_telemetry.latest()
+
+
+@app.get("/api/v1/devices")
+async def device_pool_status():
+    """Get per-device queue depth, sessions and utilization"""
+    return routes.analysis_service.device_pool.stats()
+
+
+@app.get("/api/v1/gpu/history")
+async def gpu_history():
+    """Get recent device telemetry samples, oldest first"""
+    return {
+        "interval_seconds": routes.device_telemetry.interval_seconds,
+        "samples": routes.device_telemetry.history()
+    }
 
 
 if __name__ == "__main__":
@@ -110,6 +203,7 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
-        workers=1
+        # Reload only supports a single worker
+        reload=settings.WORKERS == 1,
+        workers=settings.WORKERS
     )
@@ -24,6 +24,7 @@ class AlertType(str, Enum):
     PLAY_WHILE_WORK = "play_while_work"
     SESSION_START = "session_start"
     SESSION_END = "session_end"
+    CUSTOM = "custom"  # raised by window rules and AlertConfig.rules
 
 
 # ==================== Request Models ====================
@@ -41,6 +42,27 @@ class AnalysisRequest(BaseModel):
     tags: Optional[List[str]] = []
 
 
+class WindowRule(BaseModel):
+    """Alert when activities add up to a threshold within a sliding window"""
+    activities: List[ActivityType] = [ActivityType.PLAYING, ActivityType.DISTRACTED]
+    threshold_minutes: int = 5
+    window_minutes: int = 20
+    bucket_seconds: int = 60  # counter resolution; the window is rounded to buckets
+    alert_type: AlertType = AlertType.CUSTOM
+
+
+class AlertRule(BaseModel):
+    """Declarative alert rule, compiled into RuleEngine dispatch tables"""
+    rule_id: str
+    activities: List[ActivityType]
+    threshold_minutes: float
+    window_minutes: Optional[int] = None  # None: one consecutive run of the activities
+    bucket_seconds: int = 60
+    cooldown_minutes: float = 15
+    channels: List[str] = ["email"]
+    alert_type: AlertType = AlertType.CUSTOM
+
+
 class AlertConfig(BaseModel):
     """Alert configuration"""
     child_id: str
@@ -49,6 +71,9 @@ class AlertConfig(BaseModel):
     play_while_work_threshold_minutes: int = 5
     enable_email: bool = True
     enable_push: bool = False
+    locale: Optional[str] = None  # email template locale, defaults to EMAIL_LOCALE
+    window_rules: List[WindowRule] = []
+    rules: List[AlertRule] = []
 
 
 # ==================== Response Models ====================
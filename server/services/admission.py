@@ -0,0 +1,163 @@
+"""
+Admission Control - Load shedding for uploads, with Retry-After hints
+"""
+
+import logging
+import math
+import shutil
+from typing import Any, Dict, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+# Rejection reasons
+TOO_LARGE = "too_large"
+QUEUE_FULL = "queue_full"
+DISK_FULL = "disk_full"
+MEMORY_PRESSURE = "memory_pressure"
+GPU_MEMORY_PRESSURE = "gpu_memory_pressure"
+
+
+class Rejection:
+    """Why an upload was refused, and when the client should try again"""
+
+    __slots__ = ("status_code", "reason", "detail", "retry_after")
+
+    def __init__(self, status_code: int, reason: str, detail: str, retry_after: Optional[int] = None):
+        self.status_code = status_code
+        self.reason = reason
+        self.detail = detail
+        self.retry_after = retry_after
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"detail": self.detail, "reason": self.reason, "retry_after": self.retry_after}
+
+
+class AdmissionController:
+    """
+    Decides whether to accept an upload before its body is read
+
+    Uploads are refused with 429 while the video job queue (plus
+    uploads already admitted and still streaming in) is at
+    ``max_queue``, and with 503 when ``UPLOAD_DIR`` would drop below
+    ``min_free_disk_gb``, host memory is above ``max_memory_percent``
+    or every GPU has less than ``min_gpu_free_gb`` free. Memory figures
+    come from the telemetry sampler, so a check never touches the
+    driver. ``Retry-After`` is the time the jobs ahead need to drain at
+    the recently observed completion rate, clamped to the configured
+    bounds; with no completions yet, the maximum.
+    """
+
+    def __init__(
+        self,
+        jobs,
+        telemetry=None,
+        upload_dir: Optional[str] = None,
+        max_upload_size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        min_free_disk_gb: Optional[float] = None,
+        max_memory_percent: Optional[float] = None,
+        min_gpu_free_gb: Optional[float] = None,
+        retry_min_seconds: Optional[int] = None,
+        retry_max_seconds: Optional[int] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.jobs = jobs
+        self.telemetry = telemetry
+        self.upload_dir = upload_dir or settings.UPLOAD_DIR
+        self.max_upload_size = max_upload_size or settings.MAX_UPLOAD_SIZE
+        self.max_queue = max_queue or settings.ADMISSION_MAX_QUEUE
+        self.min_free_disk_gb = (
+            settings.ADMISSION_MIN_FREE_DISK_GB if min_free_disk_gb is None else min_free_disk_gb
+        )
+        self.max_memory_percent = max_memory_percent or settings.ADMISSION_MAX_MEMORY_PERCENT
+        self.min_gpu_free_gb = (
+            settings.ADMISSION_MIN_GPU_FREE_GB if min_gpu_free_gb is None else min_gpu_free_gb
+        )
+        self.retry_min_seconds = retry_min_seconds or settings.ADMISSION_RETRY_MIN_SECONDS
+        self.retry_max_seconds = retry_max_seconds or settings.ADMISSION_RETRY_MAX_SECONDS
+        self.enabled = settings.ADMISSION_ENABLED if enabled is None else enabled
+        # Admitted uploads whose bodies are still arriving (not yet queued)
+        self.in_flight = 0
+        self.counts: Dict[str, int] = {"admitted": 0}
+
+    def depth(self) -> int:
+        return self.jobs.depth() + self.in_flight
+
+    def retry_after(self, ahead: int) -> int:
+        """
+        Seconds until ``ahead`` jobs finish at the current drain rate
+        """
+        rate = self.jobs.drain_rate()
+        if rate <= 0:
+            return self.retry_max_seconds
+        return max(self.retry_min_seconds, min(self.retry_max_seconds, math.ceil(ahead / rate)))
+
+    def check_size(self, content_length: Optional[int], limit: Optional[int] = None) -> Optional[Rejection]:
+        limit = limit or self.max_upload_size
+        if content_length is not None and content_length > limit:
+            return Rejection(
+                413, TOO_LARGE,
+                f"Upload of {content_length} bytes exceeds the {limit} byte limit"
+            )
+        return None
+
+    def _check_load(self, content_length: Optional[int]) -> Optional[Rejection]:
+        depth = self.depth()
+        if depth >= self.max_queue:
+            return Rejection(
+                429, QUEUE_FULL, f"{depth} video jobs queued",
+                self.retry_after(depth - self.max_queue + 1)
+            )
+
+        # Resources free up as the work already accepted drains
+        drain = self.retry_after(depth + self.jobs.running)
+        free_disk = shutil.disk_usage(self.upload_dir).free - (content_length or 0)
+        if free_disk < self.min_free_disk_gb * GB:
+            return Rejection(503, DISK_FULL, f"{round(free_disk / GB, 2)}GB free for uploads", drain)
+
+        sample = self.telemetry.latest() if self.telemetry is not None else {}
+        memory = sample.get("memory") or {}
+        if (memory.get("percent") or 0) > self.max_memory_percent:
+            return Rejection(503, MEMORY_PRESSURE, f"Host memory {memory['percent']}% used", drain)
+        devices = sample.get("devices") or []
+        if devices and max(d["memory_free"] for d in devices) < self.min_gpu_free_gb:
+            return Rejection(
+                503, GPU_MEMORY_PRESSURE,
+                f"{max(d['memory_free'] for d in devices)}GB GPU memory free", drain
+            )
+        return None
+
+    def admit(self, content_length: Optional[int]) -> Optional[Rejection]:
+        """
+        None if the upload may proceed (the caller must ``release`` it), else why not
+        """
+        rejection = self.check_size(content_length)
+        if rejection is None and self.enabled:
+            rejection = self._check_load(content_length)
+        if rejection is not None:
+            self.counts[rejection.reason] = self.counts.get(rejection.reason, 0) + 1
+            logger.info(f"Upload rejected ({rejection.reason}): {rejection.detail}")
+            return rejection
+        self.in_flight += 1
+        self.counts["admitted"] += 1
+        return None
+
+    def release(self):
+        """
+        An admitted upload's body has arrived (or the request ended early)
+        """
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": self.depth(),
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "drain_rate": round(self.jobs.drain_rate(), 3),
+            **self.counts
+        }
@@ -0,0 +1,82 @@
+"""
+Alert Digest - Per-recipient coalescing of alert emails
+"""
+
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from core.config import settings
+from services.notification_outbox import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class AlertDigest:
+    """
+    Coalesce alerts for the same recipient into one digest email
+
+    Non-urgent alerts wait in the outbox for ``window_seconds``; every
+    alert for that recipient queued in the meantime is sent with the
+    first one as a single digest. Reaching ``max_alerts`` flushes
+    immediately, and urgent alert types are due at once (taking any
+    waiting alerts for the recipient along with them).
+    """
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        window_seconds: Optional[float] = None,
+        max_alerts: Optional[int] = None,
+        urgent_types: Optional[Iterable[str]] = None
+    ):
+        self.outbox = outbox
+        self.window_seconds = (
+            settings.ALERT_DIGEST_WINDOW_SECONDS if window_seconds is None else window_seconds
+        )
+        self.max_alerts = max_alerts or settings.ALERT_DIGEST_MAX_ALERTS
+        self.urgent_types = frozenset(
+            settings.ALERT_DIGEST_URGENT_TYPES if urgent_types is None else urgent_types
+        )
+
+    async def queue(
+        self,
+        recipient: str,
+        alert_type: str,
+        child_name: str,
+        details: str,
+        locale: Optional[str] = None
+    ) -> int:
+        """
+        Queue an alert for the recipient's next digest
+
+        The outbox writes are SQLite calls contending with the dispatcher,
+        so they run in a worker thread rather than on the event loop.
+        """
+        return await asyncio.to_thread(
+            self._queue, recipient, alert_type, child_name, details, locale
+        )
+
+    def _queue(
+        self,
+        recipient: str,
+        alert_type: str,
+        child_name: str,
+        details: str,
+        locale: Optional[str]
+    ) -> int:
+        coalesce_key = f"digest:{recipient}"
+        urgent = alert_type in self.urgent_types
+        item_id = self.outbox.queue_alert(
+            recipient,
+            alert_type,
+            child_name,
+            details,
+            locale=locale,
+            delay=0 if urgent else self.window_seconds,
+            coalesce_key=coalesce_key
+        )
+        if not urgent and self.outbox.count_pending(coalesce_key) >= self.max_alerts:
+            logger.debug(f"Digest for {recipient} full - flushing early")
+            self.outbox.expedite(coalesce_key)
+        return item_id
@@ -2,45 +2,118 @@
 Alert Service - Monitor and trigger alerts
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
-from collections import defaultdict
+import math
+import time
+from typing import Dict, Any, Optional, List, Set, Tuple
 
 from models.schemas import AlertConfig, AlertType
-from services.email_service import EmailService
+from services.alert_digest import AlertDigest
+from services.alert_state import AlertStateStore
+from services.notification_outbox import NotificationOutbox, notification_outbox
+from services.rule_engine import RuleEngine
+from services.session_state import SessionState, SessionStore
+from services.sliding_window import SlidingWindowCounter
+from services.timer_wheel import TimerWheel
 
 logger = logging.getLogger(__name__)
 
+# Alert detail labels per tracked activity
+ACTIVITY_LABELS = {
+    "leave": "离开时间",
+    "play": "玩耍时间"
+}
+
 
 class AlertService:
     """Alert monitoring and triggering service"""
     
-    def __init__(self):
-        self.email_service = EmailService()
-        # In production, this would be in database
+    def __init__(
+        self,
+        outbox: Optional[NotificationOutbox] = None,
+        shared_state: Optional[AlertStateStore] = None
+    ):
+        # Alerts are queued durably and sent by NotificationDispatcher,
+        # coalesced per recipient into digests
+        self.outbox = outbox or notification_outbox
+        self.digest = AlertDigest(self.outbox)
+        # Configs and sent-alert flags shared by all workers; self.configs
+        # holds the configs this worker has seen
+        self.shared_state = shared_state or AlertStateStore()
         self.configs: Dict[str, AlertConfig] = {}
-        self.session_states: Dict[str, Dict[str, Any]] = defaultdict(dict)
+        # Compact per-session state, evicted once idle past the TTL
+        self.session_states = SessionStore(on_evict=self._on_evict)
+        # Deadlines for leave/play alerts, fired by a single background task
+        self.timer_wheel = TimerWheel(tick_seconds=1.0)
+        self._timer_task: Optional[asyncio.Task] = None
+        # Declarative AlertConfig.rules, indexed per child and activity
+        self.rule_engine = RuleEngine()
+        # Changed since the last journal flush (see StateSnapshotter)
+        self.dirty_sessions: Set[str] = set()
+        self.dirty_configs: Set[str] = set()
         
     async def update_config(self, config: AlertConfig):
         """
         Update alert configuration for a child
         """
+        await self.shared_state.put_config(config)
         self.configs[config.child_id] = config
+        self.dirty_configs.add(config.child_id)
+        self.rule_engine.set_rules(config.child_id, config.rules)
         logger.info(f"Alert config updated for {config.child_id}")
         
+    async def load_configs(self) -> int:
+        """
+        Load every stored config and follow changes made by other workers
+        
+        After this, hot-path config lookups are served from memory.
+        """
+        await self.shared_state.start()
+        for config in self.shared_state.all_configs():
+            self.configs[config.child_id] = config
+            self.rule_engine.set_rules(config.child_id, config.rules)
+        return len(self.configs)
+        
+    async def _get_config(self, child_id: str) -> Optional[AlertConfig]:
+        """
+        Read-through config lookup; picks up updates made by other workers
+        """
+        config = await self.shared_state.get_config(child_id)
+        if config is None:
+            return self.configs.get(child_id)
+        if self.configs.get(child_id) is not config:
+            self.configs[child_id] = config
+            self.dirty_configs.add(child_id)
+            self.rule_engine.set_rules(child_id, config.rules)
+        return config
+        
     async def get_status(self, session_id: str) -> Dict[str, Any]:
         """
         Get current alert status for a session
         """
-        state = self.session_states.get(session_id, {})
+        state = self.session_states.get(session_id)
+        if state is None:
+            return {
+                "session_id": session_id,
+                "is_active": False,
+                "leave_time": None,
+                "play_time": None,
+                "alerts_sent": []
+            }
         return {
             "session_id": session_id,
-            "is_active": state.get("is_active", False),
-            "leave_time": state.get("leave_time"),
-            "play_time": state.get("play_time"),
-            "alerts_sent": state.get("alerts_sent", [])
+            "is_active": state.is_active,
+            "leave_time": SessionState.to_datetime(state.leave_time),
+            "play_time": SessionState.to_datetime(state.play_time),
+            "alerts_sent": state.alerts_sent
         }
+        
+    def get_session_stats(self) -> Dict[str, Any]:
+        """
+        Tracked session count and approximate memory per session
+        """
+        return self.session_states.memory_stats()
     
     async def check_and_trigger(
         self,
@@ -54,124 +127,480 @@ class AlertService:
         """
         alerts_triggered = []
         
-        if child_id not in self.configs:
+        config = await self._get_config(child_id)
+        if config is None:
             return alerts_triggered
             
-        config = self.configs[child_id]
-        state = self.session_states[session_id]
+        state = self.session_states.touch(session_id, child_id)
+        self.dirty_sessions.add(session_id)
+        
+        if self.shared_state.shared:
+            return await self._check_shared(state, config, session_id, activity, duration_seconds)
         
         # Check for leave alert
-        if activity == "away":
-            leave_time = state.get("leave_time")
-            if leave_time is None:
-                state["leave_time"] = datetime.now()
-                state["leave_duration"] = duration_seconds
-            else:
-                # Update duration
-                state["leave_duration"] = state.get("leave_duration", 0) + duration_seconds
-                
-                # Check threshold
-                leave_minutes = state["leave_duration"] / 60
-                if leave_minutes >= config.leave_threshold_minutes:
-                    if "leave_too_long" not in state.get("alerts_sent", []):
-                        await self._send_alert(
-                            config,
-                            AlertType.LEAVE_TOO_LONG,
-                            session_id,
-                            f"离开时间: {leave_minutes:.0f} 分钟"
-                        )
-                        alerts_triggered.append("leave_too_long")
-                        state.setdefault("alerts_sent", []).append("leave_too_long")
-        else:
-            # Reset leave time
-            state["leave_time"] = None
-            state["leave_duration"] = 0
+        if await self._track_activity(
+            state,
+            config,
+            session_id,
+            "leave",
+            AlertType.LEAVE_TOO_LONG,
+            config.leave_threshold_minutes,
+            activity == "away",
+            duration_seconds
+        ):
+            alerts_triggered.append("leave_too_long")
             
         # Check for play while working alert
-        if activity == "playing" or activity == "distracted":
-            play_time = state.get("play_time")
-            if play_time is None:
-                state["play_time"] = datetime.now()
-                state["play_duration"] = duration_seconds
-            else:
-                state["play_duration"] = state.get("play_duration", 0) + duration_seconds
+        if await self._track_activity(
+            state,
+            config,
+            session_id,
+            "play",
+            AlertType.PLAY_WHILE_WORK,
+            config.play_while_work_threshold_minutes,
+            activity == "playing" or activity == "distracted",
+            duration_seconds
+        ):
+            alerts_triggered.append("play_while_work")
+            
+        # Check sliding-window rules
+        for alert_type in await self._check_window_rules(
+            state, config, session_id, activity, duration_seconds
+        ):
+            if alert_type not in alerts_triggered:
+                alerts_triggered.append(alert_type)
                 
-                play_minutes = state["play_duration"] / 60
-                if play_minutes >= config.play_while_work_threshold_minutes:
-                    if "play_while_work" not in state.get("alerts_sent", []):
-                        await self._send_alert(
-                            config,
-                            AlertType.PLAY_WHILE_WORK,
-                            session_id,
-                            f"玩耍时间: {play_minutes:.0f} 分钟"
-                        )
-                        alerts_triggered.append("play_while_work")
-                        state.setdefault("alerts_sent", []).append("play_while_work")
-        else:
-            # Reset play time
-            state["play_time"] = None
-            state["play_duration"] = 0
+        # Check declarative rules indexed under this activity
+        for match in self.rule_engine.evaluate(session_id, child_id, activity, duration_seconds):
+            rule = match.rule
+            await self._send_alert(
+                config,
+                rule.alert_type,
+                session_id,
+                f"{rule.rule_id}: {match.minutes:.0f} 分钟",
+                channels=rule.channels
+            )
+            if rule.alert_type.value not in alerts_triggered:
+                alerts_triggered.append(rule.alert_type.value)
             
         return alerts_triggered
     
+    async def _check_shared(
+        self,
+        state: SessionState,
+        config: AlertConfig,
+        session_id: str,
+        activity: str,
+        duration_seconds: int
+    ) -> List[str]:
+        """
+        Check an event against run and window totals kept in the shared backend
+        
+        With several workers, a session's events land on whichever worker
+        takes each request, so no local counter sees the whole run. One
+        atomic backend call per event updates every leave/play run,
+        window and rule of the session and decides which rules and
+        windows fire; leave/play alerts are then claimed as usual.
+        """
+        seconds = int(duration_seconds)
+        tracked = [
+            ("leave", AlertType.LEAVE_TOO_LONG, config.leave_threshold_minutes,
+             activity == "away"),
+            ("play", AlertType.PLAY_WHILE_WORK, config.play_while_work_threshold_minutes,
+             activity == "playing" or activity == "distracted")
+        ]
+        rules = self.rule_engine.rules_for(config.child_id, activity)
+        run_rules = [c for c in rules if c.window is None]
+        window_rules = [c for c in rules if c.window is not None]
+        
+        runs = [(prefix, seconds, -1, 0) for prefix, _, _, active in tracked if active]
+        runs += [(f"rule:{c.rule.rule_id}", seconds, c.threshold, c.cooldown) for c in run_rules]
+        windows = [
+            (
+                f"window:{i}",
+                seconds if activity in rule.activities else 0,
+                rule.bucket_seconds,
+                math.ceil(rule.window_minutes * 60 / rule.bucket_seconds),
+                rule.threshold_minutes * 60,
+                -1
+            )
+            for i, rule in enumerate(config.window_rules)
+        ]
+        windows += [
+            (
+                f"rule:{c.rule.rule_id}",
+                seconds,
+                c.bucket,
+                math.ceil(c.window / c.bucket),
+                c.threshold,
+                c.cooldown
+            )
+            for c in window_rules
+        ]
+        run_results, window_results = await self.shared_state.track(
+            session_id, state.last_seen, runs, windows
+        )
+        
+        alerts_triggered = []
+        results = iter(run_results)
+        for prefix, alert_type, threshold, active in tracked:
+            run = next(results) if active else None
+            if await self._track_activity(
+                state, config, session_id, prefix, alert_type, threshold,
+                active, duration_seconds, run=run[:2] if run else None
+            ):
+                alerts_triggered.append(alert_type.value)
+                
+        fired = []
+        for rule, (total, fire) in zip(config.window_rules, window_results):
+            if fire:
+                fired.append((
+                    rule.alert_type,
+                    f"最近 {rule.window_minutes} 分钟内累计: {total / 60:.0f} 分钟",
+                    None
+                ))
+        rule_results = list(results) + window_results[len(config.window_rules):]
+        for compiled, (total, *rest) in zip(run_rules + window_rules, rule_results):
+            if rest[-1]:
+                fired.append((
+                    compiled.rule.alert_type,
+                    f"{compiled.rule.rule_id}: {total / 60:.0f} 分钟",
+                    compiled.rule.channels
+                ))
+        for alert_type, details, channels in fired:
+            await self._send_alert(config, alert_type, session_id, details, channels=channels)
+            if alert_type.value not in alerts_triggered:
+                alerts_triggered.append(alert_type.value)
+        return alerts_triggered
+    
+    async def _check_window_rules(
+        self,
+        state: SessionState,
+        config: AlertConfig,
+        session_id: str,
+        activity: str,
+        duration_seconds: int,
+        now: Optional[float] = None
+    ) -> List[str]:
+        """
+        Update each window rule's counter and alert on threshold crossings
+        
+        Unlike the consecutive leave/play checks, time spent on other
+        activities does not reset a window, so alternating between
+        studying and playing still adds up. A rule re-arms once its
+        window total drops back below the threshold.
+        """
+        if not config.window_rules:
+            return []
+        now = time.monotonic() if now is None else now
+        
+        if state.windows is None or state.windows[0] is not config:
+            # New or updated config: start the counters afresh
+            state.windows = (
+                config,
+                [
+                    SlidingWindowCounter(rule.window_minutes * 60, rule.bucket_seconds)
+                    for rule in config.window_rules
+                ],
+                [True] * len(config.window_rules)
+            )
+            
+        triggered = []
+        _, counters, armed = state.windows
+        for i, (rule, counter) in enumerate(zip(config.window_rules, counters)):
+            if activity in rule.activities:
+                counter.add(now, duration_seconds)
+            minutes = counter.total(now) / 60
+            if minutes < rule.threshold_minutes:
+                armed[i] = True
+                continue
+            if not armed[i]:
+                continue
+                
+            armed[i] = False
+            await self._send_alert(
+                config,
+                rule.alert_type,
+                session_id,
+                f"最近 {rule.window_minutes} 分钟内累计: {minutes:.0f} 分钟"
+            )
+            triggered.append(rule.alert_type.value)
+        return triggered
+    
+    async def _track_activity(
+        self,
+        state: SessionState,
+        config: AlertConfig,
+        session_id: str,
+        prefix: str,
+        alert_type: AlertType,
+        threshold_minutes: int,
+        active: bool,
+        duration_seconds: int,
+        run: Optional[Tuple[int, int]] = None
+    ) -> bool:
+        """
+        Accumulate one tracked activity and alert once it crosses its threshold
+        
+        Entering the activity also schedules a deadline on the timer wheel,
+        so the alert fires even if the device stops reporting. ``run`` is
+        the shared (seconds, start) of the run when totals are kept in the
+        backend; this worker then follows it instead of counting itself.
+        """
+        time_attr = f"{prefix}_time"
+        duration_attr = f"{prefix}_duration"
+        timer_attr = f"{prefix}_timer"
+        
+        if not active:
+            # Reset on return and drop the pending deadline
+            setattr(state, time_attr, 0)
+            setattr(state, duration_attr, 0)
+            self.timer_wheel.cancel(getattr(state, timer_attr))
+            setattr(state, timer_attr, None)
+            return False
+            
+        already_sent = state.alert_sent(alert_type)
+        if run is not None:
+            # Other workers may have started or extended the run; move the deadline
+            total, started = run
+            self.timer_wheel.cancel(getattr(state, timer_attr))
+            setattr(state, timer_attr, None)
+            setattr(state, time_attr, started)
+            setattr(state, duration_attr, total)
+            remaining = threshold_minutes * 60 - total
+            if remaining > 0 and not already_sent:
+                setattr(state, timer_attr, self.timer_wheel.schedule(
+                    time.monotonic() + remaining,
+                    (session_id, prefix, alert_type)
+                ))
+        elif not getattr(state, time_attr):
+            setattr(state, time_attr, state.last_seen)
+            setattr(state, duration_attr, duration_seconds)
+            remaining = threshold_minutes * 60 - duration_seconds
+            if remaining > 0 and not already_sent:
+                setattr(state, timer_attr, self.timer_wheel.schedule(
+                    time.monotonic() + remaining,
+                    (session_id, prefix, alert_type)
+                ))
+        else:
+            # Update duration
+            setattr(state, duration_attr, getattr(state, duration_attr) + duration_seconds)
+            
+        # Check threshold
+        minutes = getattr(state, duration_attr) / 60
+        if minutes < threshold_minutes or already_sent:
+            return False
+            
+        self.timer_wheel.cancel(getattr(state, timer_attr))
+        setattr(state, timer_attr, None)
+        state.mark_sent(alert_type)
+        if not await self.shared_state.claim_alert(session_id, alert_type):
+            # Another worker already sent it
+            return False
+        await self._send_alert(
+            config,
+            alert_type,
+            session_id,
+            f"{ACTIVITY_LABELS[prefix]}: {minutes:.0f} 分钟"
+        )
+        return True
+    
+    # Plain-data fields carried when a session moves to another worker
+    _EXPORT_FIELDS = (
+        "child_id", "flags", "start_time",
+        "leave_time", "leave_duration", "play_time", "play_duration"
+    )
+    
+    def export_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove a session and return it as picklable data for another worker
+        
+        Pending leave/play deadlines travel as remaining seconds; window
+        and rule progress is not carried over.
+        """
+        state = self.session_states.pop(session_id)
+        if state is None:
+            return None
+        self.dirty_sessions.add(session_id)
+        now = time.monotonic()
+        data = {name: getattr(state, name) for name in self._EXPORT_FIELDS}
+        data["deadlines"] = {}
+        for prefix in ACTIVITY_LABELS:
+            handle = getattr(state, f"{prefix}_timer")
+            if handle is not None and handle.active:
+                data["deadlines"][prefix] = (
+                    max(self.timer_wheel.deadline(handle) - now, 0.0),
+                    handle.payload[2].value
+                )
+                self.timer_wheel.cancel(handle)
+        self.rule_engine.reset_session(session_id)
+        return data
+    
+    def import_session(self, session_id: str, data: Dict[str, Any]):
+        """
+        Adopt a session exported by another worker
+        """
+        state = SessionState(data["child_id"], 0)
+        for name in self._EXPORT_FIELDS:
+            setattr(state, name, data[name])
+        now = time.monotonic()
+        for prefix, (remaining, alert_type) in data.get("deadlines", {}).items():
+            setattr(state, f"{prefix}_timer", self.timer_wheel.schedule(
+                now + remaining,
+                (session_id, prefix, AlertType(alert_type))
+            ))
+        self.session_states.put(session_id, state)
+        self.dirty_sessions.add(session_id)
+    
+    async def process_timers(self, now: Optional[float] = None) -> List[str]:
+        """
+        Fire alerts whose deadlines have passed without a new event
+        
+        Returns the session ids that were alerted.
+        """
+        alerted = []
+        for session_id, prefix, alert_type in self.timer_wheel.advance(now):
+            state = self.session_states.get(session_id)
+            if state is None:
+                continue
+            setattr(state, f"{prefix}_timer", None)
+            self.dirty_sessions.add(session_id)
+            if (
+                not state.is_active
+                or not getattr(state, f"{prefix}_time")
+                or state.alert_sent(alert_type)
+            ):
+                continue
+            if self.shared_state.shared:
+                # Skip if the run ended or restarted on another worker since
+                run = await self.shared_state.current_run(session_id, prefix)
+                if run is None or run[1] != getattr(state, f"{prefix}_time"):
+                    continue
+            config = await self._get_config(state.child_id)
+            if config is None:
+                continue
+            state.mark_sent(alert_type)
+            if not await self.shared_state.claim_alert(session_id, alert_type):
+                continue
+                
+            threshold = (
+                config.leave_threshold_minutes if prefix == "leave"
+                else config.play_while_work_threshold_minutes
+            )
+            await self._send_alert(
+                config,
+                alert_type,
+                session_id,
+                f"{ACTIVITY_LABELS[prefix]}: {threshold} 分钟"
+            )
+            alerted.append(session_id)
+        return alerted
+    
+    def start(self):
+        """
+        Start firing timer-wheel deadlines in the background
+        """
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._run_timers())
+    
+    async def stop(self):
+        """
+        Stop the timer task and config change listener
+        """
+        await self.shared_state.stop()
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            try:
+                await self._timer_task
+            except asyncio.CancelledError:
+                pass
+            self._timer_task = None
+    
+    async def _run_timers(self):
+        while True:
+            await asyncio.sleep(self.timer_wheel.tick_seconds)
+            try:
+                await self.process_timers()
+                self.session_states.evict()
+            except Exception as e:
+                logger.error(f"Error firing alert timers: {e}")
+    
+    def _on_evict(self, session_id: str, state: SessionState):
+        self.dirty_sessions.add(session_id)
+        for handle in state.timers():
+            self.timer_wheel.cancel(handle)
+        self.rule_engine.reset_session(session_id)
+    
     async def _send_alert(
         self,
         config: AlertConfig,
         alert_type: AlertType,
         session_id: str,
-        details: str
+        details: str,
+        channels: Optional[List[str]] = None
     ):
         """
-        Send alert notification
+        Queue alert notification on the given channels (email by default)
         """
-        if config.enable_email:
-            await self.email_service.send_alert(
+        channels = channels or ["email"]
+        if "push" in channels and config.enable_push:
+            logger.warning(f"Push alert {alert_type.value} for {config.child_id} dropped: no push provider")
+        if "email" in channels and config.enable_email:
+            await self.digest.queue(
                 config.email,
                 alert_type.value,
                 config.child_id,
-                details
+                details,
+                locale=config.locale
             )
-            logger.info(f"Alert sent: {alert_type.value} for {config.child_id}")
+            logger.info(f"Alert queued: {alert_type.value} for {config.child_id}")
     
     async def start_session(self, session_id: str, child_id: str):
         """
         Start monitoring a session
         """
-        self.session_states[session_id] = {
-            "child_id": child_id,
-            "is_active": True,
-            "start_time": datetime.now(),
-            "leave_time": None,
-            "play_time": None,
-            "alerts_sent": []
-        }
+        previous = self.session_states.get(session_id)
+        if previous is not None:
+            for handle in previous.timers():
+                self.timer_wheel.cancel(handle)
+        self.rule_engine.reset_session(session_id)
+        await self.shared_state.reset_session(session_id)
+                
+        self.session_states.start(session_id, child_id)
+        self.dirty_sessions.add(session_id)
         
         # Send session start notification
-        if child_id in self.configs:
-            config = self.configs[child_id]
-            if config.enable_email:
-                await self.email_service.send_alert(
-                    config.email,
-                    AlertType.SESSION_START,
-                    child_id,
-                    "学习监控已启动"
-                )
+        config = await self._get_config(child_id)
+        if config is not None:
+            await self._send_alert(
+                config,
+                AlertType.SESSION_START,
+                session_id,
+                "学习监控已启动"
+            )
                 
     async def end_session(self, session_id: str):
         """
         End monitoring a session
         """
-        if session_id in self.session_states:
-            child_id = self.session_states[session_id]["child_id"]
-            self.session_states[session_id]["is_active"] = False
+        state = self.session_states.get(session_id)
+        if state is not None:
+            child_id = state.child_id
+            state.is_active = False
+            self.dirty_sessions.add(session_id)
+            for handle in state.timers():
+                self.timer_wheel.cancel(handle)
+            state.leave_timer = state.play_timer = None
+            self.rule_engine.reset_session(session_id)
             
             # Send session end notification
-            if child_id in self.configs:
-                config = self.configs[child_id]
-                if config.enable_email:
-                    await self.email_service.send_alert(
-                        config.email,
-                        AlertType.SESSION_END,
-                        child_id,
-                        "今日学习已结束"
-                    )
+            config = await self._get_config(child_id)
+            if config is not None and await self.shared_state.claim_alert(
+                session_id, AlertType.SESSION_END
+            ):
+                await self._send_alert(
+                    config,
+                    AlertType.SESSION_END,
+                    session_id,
+                    "今日学习已结束"
+                )
@@ -0,0 +1,655 @@
+"""
+Alert State - Alert configs, sent-alert flags and session totals shared across workers
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from models.schemas import AlertConfig, AlertType
+from services.session_state import ALERT_FLAGS
+
+logger = logging.getLogger(__name__)
+
+# Try to import the asyncio Redis client
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    logger.warning("redis not available - alert state limited to in-process backend")
+
+
+# (name, seconds, threshold seconds, cooldown seconds); a negative
+# threshold only accumulates, the caller decides whether to alert
+RunSpec = Tuple[str, int, float, float]
+# (name, seconds, bucket seconds, bucket count, threshold seconds,
+# cooldown seconds); a negative cooldown fires once until the total
+# drops back below the threshold
+WindowSpec = Tuple[str, int, int, int, float, float]
+# (run seconds, run start epoch, fired) and (window seconds, fired)
+RunResult = Tuple[int, int, bool]
+WindowResult = Tuple[int, bool]
+
+
+def track_session(
+    fields: Dict[str, Any],
+    now: int,
+    runs: List[RunSpec],
+    windows: List[WindowSpec]
+) -> Tuple[List[RunResult], List[WindowResult]]:
+    """
+    Apply one event to a session's run and window totals
+
+    ``fields`` mirrors the Redis hash kept by RedisAlertStateBackend
+    (same field names, same rules), so both backends behave alike.
+    Every event bumps ``seq``; a run whose last event is not the
+    immediately preceding one starts over.
+    """
+    seq = fields["seq"] = fields.get("seq", 0) + 1
+    run_results = []
+    for name, seconds, threshold, cooldown in runs:
+        total, start, fired = seconds, now, False
+        if fields.get(f"{name}:last") == seq - 1:
+            total = fields[f"{name}:total"] + seconds
+            start = fields[f"{name}:start"]
+            fired = fields[f"{name}:fired"]
+        fire = False
+        fired_at = fields.get(f"{name}:at")
+        if (
+            threshold >= 0 and total >= threshold and not fired
+            and (fired_at is None or now - fired_at >= cooldown)
+        ):
+            fire = fired = True
+            fields[f"{name}:at"] = now
+        fields[f"{name}:last"] = seq
+        fields[f"{name}:total"] = total
+        fields[f"{name}:start"] = start
+        fields[f"{name}:fired"] = fired
+        run_results.append((total, start, fire))
+
+    window_results = []
+    for name, seconds, bucket_seconds, buckets, threshold, cooldown in windows:
+        index = now // bucket_seconds
+        head = fields.get(f"{name}:head")
+        if head is not None and index > head:
+            for expired in range(head - buckets + 1, min(head, index - buckets) + 1):
+                fields.pop(f"{name}:{expired}", None)
+        current = index if head is None else max(head, index)
+        fields[f"{name}:head"] = current
+        if seconds > 0 and index > current - buckets:
+            fields[f"{name}:{index}"] = fields.get(f"{name}:{index}", 0) + seconds
+        total = sum(
+            fields.get(f"{name}:{b}", 0) for b in range(current - buckets + 1, current + 1)
+        )
+        fire = False
+        if threshold >= 0:
+            if cooldown < 0:
+                if total < threshold:
+                    fields.pop(f"{name}:fired", None)
+                elif f"{name}:fired" not in fields:
+                    fields[f"{name}:fired"] = True
+                    fire = True
+            elif total >= threshold:
+                fired_at = fields.get(f"{name}:at")
+                if fired_at is None or now - fired_at >= cooldown:
+                    fields[f"{name}:at"] = now
+                    fire = True
+        window_results.append((total, fire))
+    return run_results, window_results
+
+
+class InMemoryAlertStateBackend:
+    """
+    Single-process backend; flags and totals expire after ``ttl_seconds`` untouched
+
+    ``shared`` makes AlertService keep session totals here instead of
+    in its own SessionState, as it does with Redis (used by tests that
+    run several services against one backend).
+    """
+
+    def __init__(self, ttl_seconds: int, clock=time.monotonic, shared: bool = False):
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self.shared = shared
+        self._configs: Dict[str, str] = {}
+        self._flags: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._sessions: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def get_config(self, child_id: str) -> Optional[str]:
+        return self._configs.get(child_id)
+
+    async def set_config(self, child_id: str, data: str):
+        self._configs[child_id] = data
+
+    async def all_configs(self) -> Dict[str, str]:
+        return dict(self._configs)
+
+    @staticmethod
+    def _purge(entries: OrderedDict, now: float):
+        while entries:
+            session_id, (expires_at, _) = next(iter(entries.items()))
+            if expires_at > now:
+                break
+            del entries[session_id]
+
+    async def get_flags(self, session_id: str) -> int:
+        entry = self._flags.get(session_id)
+        if entry is None or entry[0] <= self._clock():
+            return 0
+        return entry[1]
+
+    async def claim_flag(self, session_id: str, bit: int) -> bool:
+        now = self._clock()
+        self._purge(self._flags, now)
+        flags = await self.get_flags(session_id)
+        if flags & bit:
+            return False
+        self._flags[session_id] = (now + self.ttl_seconds, flags | bit)
+        self._flags.move_to_end(session_id)
+        return True
+
+    async def clear_flags(self, session_id: str):
+        self._flags.pop(session_id, None)
+        self._sessions.pop(session_id, None)
+
+    def _session_fields(self, session_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[0] <= self._clock():
+            return None
+        return entry[1]
+
+    async def track(
+        self,
+        session_id: str,
+        now: int,
+        runs: List[RunSpec],
+        windows: List[WindowSpec]
+    ) -> Tuple[List[RunResult], List[WindowResult]]:
+        clock = self._clock()
+        self._purge(self._sessions, clock)
+        fields = self._session_fields(session_id) or {}
+        results = track_session(fields, now, runs, windows)
+        self._sessions[session_id] = (clock + self.ttl_seconds, fields)
+        self._sessions.move_to_end(session_id)
+        return results
+
+    async def current_run(self, session_id: str, name: str) -> Optional[Tuple[int, int]]:
+        fields = self._session_fields(session_id)
+        if fields is None or fields.get(f"{name}:last") != fields.get("seq"):
+            return None
+        return fields[f"{name}:total"], fields[f"{name}:start"]
+
+
+class RedisAlertStateBackend:
+    """
+    Redis backend shared by every worker and node
+
+    Configs are JSON strings in one hash. Sent-alert flags are one integer
+    per session, updated by a Lua script so that checking and setting a
+    bit is a single atomic step: exactly one worker wins each alert.
+    Run and window totals live in one hash per session, updated by
+    another script (the same rules as ``track_session``) that also
+    decides which rules fire, so events of one session can land on any
+    worker and still cost one round trip each.
+    """
+
+    shared = True
+
+    CONFIGS_KEY = "alert:configs"
+
+    CLAIM_SCRIPT = """
+    local flags = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local bit = tonumber(ARGV[1])
+    if flags % (2 * bit) >= bit then
+        return 0
+    end
+    redis.call('SET', KEYS[1], flags + bit, 'EX', ARGV[2])
+    return 1
+    """
+
+    TRACK_SCRIPT = """
+    local unpack = unpack or table.unpack
+    local key = KEYS[1]
+    local now = tonumber(ARGV[2])
+    local seq = redis.call('HINCRBY', key, 'seq', 1)
+    local out = {}
+    local i = 4
+    for _ = 1, tonumber(ARGV[3]) do
+        local name, seconds = ARGV[i], tonumber(ARGV[i + 1])
+        local threshold, cooldown = tonumber(ARGV[i + 2]), tonumber(ARGV[i + 3])
+        i = i + 4
+        local run = redis.call('HMGET', key, name .. ':last', name .. ':total',
+            name .. ':start', name .. ':fired', name .. ':at')
+        local total, start, fired = seconds, now, '0'
+        if tonumber(run[1]) == seq - 1 then
+            total = tonumber(run[2]) + seconds
+            start = tonumber(run[3])
+            fired = run[4]
+        end
+        local fire = 0
+        if threshold >= 0 and total >= threshold and fired == '0'
+            and (not run[5] or now - tonumber(run[5]) >= cooldown) then
+            fire = 1
+            fired = '1'
+            redis.call('HSET', key, name .. ':at', now)
+        end
+        redis.call('HSET', key, name .. ':last', seq, name .. ':total', total,
+            name .. ':start', start, name .. ':fired', fired)
+        table.insert(out, total)
+        table.insert(out, start)
+        table.insert(out, fire)
+    end
+    while i <= #ARGV do
+        local name, seconds = ARGV[i], tonumber(ARGV[i + 1])
+        local size, buckets = tonumber(ARGV[i + 2]), tonumber(ARGV[i + 3])
+        local threshold, cooldown = tonumber(ARGV[i + 4]), tonumber(ARGV[i + 5])
+        i = i + 6
+        local index = math.floor(now / size)
+        local head = tonumber(redis.call('HGET', key, name .. ':head'))
+        if head and index > head then
+            for b = head - buckets + 1, math.min(head, index - buckets) do
+                redis.call('HDEL', key, name .. ':' .. b)
+            end
+        end
+        local current = index
+        if head and head > index then
+            current = head
+        end
+        redis.call('HSET', key, name .. ':head', current)
+        if seconds > 0 and index > current - buckets then
+            redis.call('HINCRBY', key, name .. ':' .. index, seconds)
+        end
+        local fields = {}
+        for b = current - buckets + 1, current do
+            table.insert(fields, name .. ':' .. b)
+        end
+        local total = 0
+        for _, v in ipairs(redis.call('HMGET', key, unpack(fields))) do
+            total = total + (tonumber(v) or 0)
+        end
+        local fire = 0
+        if threshold >= 0 then
+            if cooldown < 0 then
+                if total < threshold then
+                    redis.call('HDEL', key, name .. ':fired')
+                elseif redis.call('HSETNX', key, name .. ':fired', 1) == 1 then
+                    fire = 1
+                end
+            elseif total >= threshold then
+                local at = tonumber(redis.call('HGET', key, name .. ':at'))
+                if not at or now - at >= cooldown then
+                    redis.call('HSET', key, name .. ':at', now)
+                    fire = 1
+                end
+            end
+        end
+        table.insert(out, total)
+        table.insert(out, fire)
+    end
+    redis.call('EXPIRE', key, ARGV[1])
+    return out
+    """
+
+    def __init__(self, client, ttl_seconds: int):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self._claim = client.register_script(self.CLAIM_SCRIPT)
+        self._track = client.register_script(self.TRACK_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: int) -> "RedisAlertStateBackend":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for the redis alert state backend")
+        return cls(aioredis.from_url(url), ttl_seconds)
+
+    @staticmethod
+    def _flags_key(session_id: str) -> str:
+        return f"alert:flags:{session_id}"
+
+    @staticmethod
+    def _session_key(session_id: str) -> str:
+        return f"alert:session:{session_id}"
+
+    async def get_config(self, child_id: str) -> Optional[str]:
+        data = await self.client.hget(self.CONFIGS_KEY, child_id)
+        return data.decode("utf-8") if data is not None else None
+
+    async def set_config(self, child_id: str, data: str):
+        await self.client.hset(self.CONFIGS_KEY, child_id, data)
+
+    async def all_configs(self) -> Dict[str, str]:
+        configs = await self.client.hgetall(self.CONFIGS_KEY)
+        return {k.decode("utf-8"): v.decode("utf-8") for k, v in configs.items()}
+
+    async def get_flags(self, session_id: str) -> int:
+        return int(await self.client.get(self._flags_key(session_id)) or 0)
+
+    async def claim_flag(self, session_id: str, bit: int) -> bool:
+        claimed = await self._claim(
+            keys=[self._flags_key(session_id)],
+            args=[bit, self.ttl_seconds]
+        )
+        return bool(claimed)
+
+    async def clear_flags(self, session_id: str):
+        await self.client.delete(self._flags_key(session_id), self._session_key(session_id))
+
+    async def track(
+        self,
+        session_id: str,
+        now: int,
+        runs: List[RunSpec],
+        windows: List[WindowSpec]
+    ) -> Tuple[List[RunResult], List[WindowResult]]:
+        args: List[Any] = [self.ttl_seconds, now, len(runs)]
+        for spec in runs:
+            args.extend(spec)
+        for spec in windows:
+            args.extend(spec)
+        out = await self._track(keys=[self._session_key(session_id)], args=args)
+        split = 3 * len(runs)
+        run_results = [
+            (int(out[i]), int(out[i + 1]), bool(out[i + 2])) for i in range(0, split, 3)
+        ]
+        window_results = [
+            (int(out[i]), bool(out[i + 1])) for i in range(split, len(out), 2)
+        ]
+        return run_results, window_results
+
+    async def current_run(self, session_id: str, name: str) -> Optional[Tuple[int, int]]:
+        seq, last, total, start = await self.client.hmget(
+            self._session_key(session_id),
+            ["seq", f"{name}:last", f"{name}:total", f"{name}:start"]
+        )
+        if last is None or last != seq:
+            return None
+        return int(total), int(start)
+
+
+ConfigHandler = Callable[[str, str], Awaitable[None]]
+# Called once the bus is subscribed (again), and when the subscription is lost
+SubscribedHandler = Callable[[], Awaitable[None]]
+DisconnectHandler = Callable[[], None]
+
+
+class LocalConfigBus:
+    """In-process stand-in for config change notifications"""
+
+    def __init__(self):
+        self._subscribers: List[asyncio.Queue] = []
+
+    async def publish(self, child_id: str, data: str):
+        for queue in self._subscribers:
+            queue.put_nowait((child_id, data))
+
+    async def listen(
+        self,
+        handler: ConfigHandler,
+        on_subscribed: Optional[SubscribedHandler] = None,
+        on_disconnect: Optional[DisconnectHandler] = None
+    ):
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        try:
+            if on_subscribed is not None:
+                await on_subscribed()
+            while True:
+                await handler(*await queue.get())
+        finally:
+            self._subscribers.remove(queue)
+
+
+class RedisConfigBus:
+    """
+    Config change notifications over Redis pub/sub
+
+    Pub/sub does not queue messages for a dropped subscriber, so when
+    the connection fails ``listen`` reports the disconnect, retries with
+    exponential backoff, and reports each new subscription so the
+    caller can reload whatever it missed.
+    """
+
+    CHANNEL = "alert:config:changed"
+
+    def __init__(
+        self,
+        client,
+        reconnect_min_seconds: float = 0.5,
+        reconnect_max_seconds: float = 30.0
+    ):
+        self.client = client
+        self.reconnect_min_seconds = reconnect_min_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisConfigBus":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for the redis config bus")
+        return cls(aioredis.from_url(url))
+
+    async def publish(self, child_id: str, data: str):
+        await self.client.publish(
+            self.CHANNEL, json.dumps({"child_id": child_id, "config": data})
+        )
+
+    async def listen(
+        self,
+        handler: ConfigHandler,
+        on_subscribed: Optional[SubscribedHandler] = None,
+        on_disconnect: Optional[DisconnectHandler] = None
+    ):
+        delay = self.reconnect_min_seconds
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.CHANNEL)
+                if on_subscribed is not None:
+                    await on_subscribed()
+                delay = self.reconnect_min_seconds
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    change = json.loads(message["data"])
+                    await handler(change["child_id"], change["config"])
+            except Exception as e:
+                logger.warning(f"Config bus disconnected, retrying in {delay:.1f}s: {e}")
+                if on_disconnect is not None:
+                    on_disconnect()
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.reconnect_max_seconds)
+
+
+class AlertStateStore:
+    """
+    Shared alert state with a local config cache
+
+    Once ``start`` has subscribed to the config bus and then loaded
+    every config, lookups are served from memory only and changes
+    published by any worker are applied as they arrive. Before that,
+    while the bus is disconnected (every config is reloaded once it
+    resubscribes), or without a bus, configs are read through from the
+    backend at most once per ``cache_ttl_seconds`` per child. Either way, unchanged JSON keeps
+    the cached AlertConfig object, so per-session state keyed on the
+    config survives. Alert flags are never cached locally: every claim
+    goes to the backend so workers cannot double-fire. With a ``shared``
+    backend, per-session run and window totals live there too.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        cache_ttl_seconds: Optional[float] = None,
+        clock=time.monotonic,
+        bus=None
+    ):
+        if backend is None:
+            backend = self._backend_from_settings()
+        self.backend = backend
+        self.bus = bus
+        self.cache_ttl_seconds = (
+            settings.ALERT_CONFIG_CACHE_SECONDS if cache_ttl_seconds is None else cache_ttl_seconds
+        )
+        self._clock = clock
+        self._configs: Dict[str, Tuple[float, str, AlertConfig]] = {}
+        # True while the cache holds every config and tracks changes
+        self.subscribed = False
+        self._listener: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._loaded = 0
+
+    @staticmethod
+    def _backend_from_settings():
+        if settings.ALERT_STATE_BACKEND == "redis":
+            return RedisAlertStateBackend.from_url(
+                settings.REDIS_URL,
+                settings.SESSION_IDLE_TTL_SECONDS
+            )
+        return InMemoryAlertStateBackend(settings.SESSION_IDLE_TTL_SECONDS)
+
+    @staticmethod
+    def bus_from_settings():
+        if settings.ALERT_STATE_BACKEND == "redis":
+            return RedisConfigBus.from_url(settings.REDIS_URL)
+        return LocalConfigBus()
+
+    def _cache(self, child_id: str, data: str) -> AlertConfig:
+        cached = self._configs.get(child_id)
+        if cached is not None and cached[1] == data:
+            config = cached[2]
+        else:
+            config = AlertConfig.model_validate_json(data)
+        self._configs[child_id] = (self._clock() + self.cache_ttl_seconds, data, config)
+        return config
+
+    async def start(self) -> int:
+        """
+        Load every config and follow changes published on the bus
+        """
+        if self.bus is None:
+            self.bus = self.bus_from_settings()
+        if self._listener is None or self._listener.done():
+            self._ready.clear()
+            self._listener = asyncio.create_task(
+                self.bus.listen(self._on_change, self._on_subscribed, self._on_disconnect)
+            )
+        # Configs are loaded only once subscribed, so no change is missed
+        ready = asyncio.create_task(self._ready.wait())
+        await asyncio.wait({ready, self._listener}, return_when=asyncio.FIRST_COMPLETED)
+        if not ready.done():
+            ready.cancel()
+            # The listener gave up; surface why
+            await self._listener
+        return self._loaded
+
+    async def _on_subscribed(self):
+        configs = await self.backend.all_configs()
+        for child_id, data in configs.items():
+            self._cache(child_id, data)
+        self._loaded = len(configs)
+        self.subscribed = True
+        self._ready.set()
+        logger.info(f"Alert config cache loaded {len(configs)} configs")
+
+    def _on_disconnect(self):
+        # Serve reads from the backend until the bus is back
+        self.subscribed = False
+
+    async def stop(self):
+        """
+        Stop following config changes
+        """
+        self.subscribed = False
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _on_change(self, child_id: str, data: str):
+        try:
+            self._cache(child_id, data)
+        except Exception as e:
+            logger.error(f"Bad config change for {child_id}: {e}")
+
+    async def put_config(self, config: AlertConfig):
+        """
+        Store a config for all workers, cache it and notify the others
+        """
+        data = config.model_dump_json()
+        await self.backend.set_config(config.child_id, data)
+        self._configs[config.child_id] = (self._clock() + self.cache_ttl_seconds, data, config)
+        if self.bus is not None:
+            await self.bus.publish(config.child_id, data)
+
+    def all_configs(self) -> List[AlertConfig]:
+        """
+        Every cached config (complete once started)
+        """
+        return [config for _, _, config in self._configs.values()]
+
+    async def get_config(self, child_id: str) -> Optional[AlertConfig]:
+        """
+        Get a child's config from memory, or read through when not subscribed
+        """
+        cached = self._configs.get(child_id)
+        if self.subscribed:
+            return cached[2] if cached is not None else None
+        now = self._clock()
+        if cached is not None and cached[0] > now:
+            return cached[2]
+
+        data = await self.backend.get_config(child_id)
+        if data is None:
+            self._configs.pop(child_id, None)
+            return None
+        return self._cache(child_id, data)
+
+    async def claim_alert(self, session_id: str, alert_type: AlertType) -> bool:
+        """
+        Atomically mark an alert as sent; False if any worker already did
+        """
+        return await self.backend.claim_flag(session_id, ALERT_FLAGS[alert_type])
+
+    @property
+    def shared(self) -> bool:
+        """
+        True if session totals are kept in the backend for all workers
+        """
+        return getattr(self.backend, "shared", False)
+
+    async def track(
+        self,
+        session_id: str,
+        now: int,
+        runs: List[RunSpec],
+        windows: List[WindowSpec]
+    ) -> Tuple[List[RunResult], List[WindowResult]]:
+        """
+        Atomically apply one event to a session's shared run and window totals
+        """
+        return await self.backend.track(session_id, now, runs, windows)
+
+    async def current_run(self, session_id: str, name: str) -> Optional[Tuple[int, int]]:
+        """
+        (seconds, start epoch) of a run if the session's latest event extended it
+        """
+        return await self.backend.current_run(session_id, name)
+
+    async def reset_session(self, session_id: str):
+        """
+        Clear a session's sent-alert flags and shared totals when it (re)starts
+        """
+        await self.backend.clear_flags(session_id)
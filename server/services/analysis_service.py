@@ -2,24 +2,227 @@
 Analysis Service - Core AI processing
 """
 
-import cv2
-import numpy as np
+import threading
+import time
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta
 import logging
 
+from core.config import settings
+from services.fair_queue import FairScheduler
 from services.gpu_detector import GPUDetector
+from services.quality_control import QualityController
 
 logger = logging.getLogger(__name__)
 
 
+def build_daily_report(child_id: str, date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a daily report for one child
+
+    Kept as a plain function so batch jobs can run it in worker processes.
+    """
+    return {
+        "child_id": child_id,
+        "date": date or datetime.now().strftime("%Y-%m-%d"),
+        "total_study_time": 14400,  # 4 hours
+        "focus_score": 72.5,
+        "activities": {
+            "studying": 14400,
+            "idle": 1800,
+            "away": 3600,
+            "playing": 1800
+        },
+        "alerts": [
+            {"type": "leave_too_long", "timestamp": "2026-02-21T10:30:00"},
+            {"type": "play_while_work", "timestamp": "2026-02-21T14:15:00"}
+        ]
+    }
+
+
+def decode_image(data: bytes):
+    """
+    Decode an uploaded JPEG/PNG into a BGR array, or None if it is not an image
+    """
+    import cv2
+    import numpy as np
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
 class AnalysisService:
-    """Main analysis service for video processing"""
+    """
+    Main analysis service for video processing
+
+    Constructing the service is cheap: torch is imported, the device
+    resolved and the detector pools built by ``warmup`` (or on first use),
+    not when ``api.routes`` is imported. Each inference device gets its
+    own detector pool, built on that device's pinned threads so the
+    MediaPipe graph threads run on the device's cores; a ``detector_pool``
+    passed in is shared by every device instead.
+    """
+    
+    def __init__(
+        self,
+        detector_pool=None,
+        device_pool=None,
+        telemetry=None,
+        quality=None,
+        scheduler=None,
+        video_jobs=None
+    ):
+        self._device = None
+        self._gpu_available: Optional[bool] = None
+        self._detector_pool = detector_pool
+        # device name -> DetectorPool, when no shared pool was passed in
+        self._detector_pools: Dict[str, Any] = {}
+        self._detector_pools_lock = threading.Lock()
+        self._device_pool = device_pool
+        self.telemetry = telemetry
+        self.warmup_stats: Dict[str, Any] = {}
+        # Frames submitted to analyze_frame and not finished yet
+        self.pending_frames = 0
+        self._scheduler = scheduler
+        # Fair share of process_video slots per child, so one household cannot starve the rest
+        self.video_jobs = video_jobs or FairScheduler()
+        self.quality = quality or QualityController(queue_depth=self.queue_depth)
+    
+    def _probe_device(self) -> Dict[str, Any]:
+        gpu_info = GPUDetector.check_gpu()
+        self._gpu_available = gpu_info["available"]
+        self._device = GPUDetector.get_device()
+        logger.info(f"AnalysisService initialized on {self._device}")
+        return gpu_info
+    
+    def warmup(self) -> Dict[str, Any]:
+        """
+        Import torch, probe the GPU and warm up the detector pool
+
+        Blocking; run it in a thread. ``ready`` is True afterwards.
+        """
+        gpu_info = self._probe_device()
+        stats = {}
+        for device in self.device_pool.devices:
+            detectors = self.detector_pool_for(device)
+            if not detectors.ready:
+                stats[device.name] = self.device_pool.call(
+                    device, detectors.warmup, settings.WARMUP_FRAMES
+                )
+        self.warmup_stats = stats
+        gpu_info["detectors"] = stats
+        return gpu_info
+    
+    @property
+    def ready(self) -> bool:
+        if self._detector_pool is not None:
+            return self._detector_pool.ready
+        if self._device_pool is None:
+            return False
+        return all(
+            self._detector_pools.get(d.name) is not None and self._detector_pools[d.name].ready
+            for d in self._device_pool.devices
+        )
+    
+    @property
+    def device(self):
+        if self._device is None:
+            self._probe_device()
+        return self._device
+    
+    @property
+    def gpu_available(self) -> bool:
+        # Reported, not probed: metadata-only workers never import torch
+        return bool(self._gpu_available)
+    
+    def detector_pool_for(self, device):
+        """
+        The detector pool serving ``device``
+        """
+        if self._detector_pool is not None:
+            return self._detector_pool
+        with self._detector_pools_lock:
+            pool = self._detector_pools.get(device.name)
+            if pool is None:
+                from services.pose_detector import DetectorPool
+                pool = self._detector_pools[device.name] = DetectorPool()
+            return pool
+    
+    @property
+    def device_pool(self):
+        if self._device_pool is None:
+            from services.device_pool import DevicePool
+            self._device_pool = DevicePool(telemetry=self.telemetry)
+        return self._device_pool
+    
+    @property
+    def scheduler(self):
+        if self._scheduler is None:
+            from services.frame_scheduler import FrameScheduler
+            self._scheduler = FrameScheduler(self.analyze_frame)
+        return self._scheduler
+    
+    def close(self):
+        """
+        Stop the device pool's threads, if it was ever built
+        """
+        if self._device_pool is not None:
+            self._device_pool.close()
+    
+    def queue_depth(self) -> int:
+        """
+        Frames being analyzed plus those waiting in the scheduler
+        """
+        waiting = self._scheduler.backlog() if self._scheduler is not None else 0
+        return self.pending_frames + waiting
     
-    def __init__(self):
-        self.device = GPUDetector.get_device()
-        self.gpu_available = GPUDetector.check_gpu()["available"]
-        logger.info(f"AnalysisService initialized on {self.device}")
+    def _analyze_frame(self, device, frame, tier=None) -> Dict[str, Any]:
+        tier = tier or self.quality.tier
+        with self.detector_pool_for(device).acquire() as detector:
+            started = time.perf_counter()
+            detection = detector.detect(frame, tier)
+            activity, confidence = detector.analyze_study_behavior(detection)
+            latency_ms = (time.perf_counter() - started) * 1000
+        self.quality.observe(latency_ms, tier.level)
+        return {
+            "activity": activity,
+            "confidence": confidence,
+            "person_detected": detection.get("person_detected", False),
+            "device": device.name,
+            "quality_tier": tier.name,
+            # Clients and the frame scheduler sample at this rate for the tier
+            "sample_fps": tier.sample_fps,
+            "latency_ms": round(latency_ms, 2)
+        }
+    
+    async def analyze_frame(self, frame, session_id: Optional[str] = None, tier=None) -> Dict[str, Any]:
+        """
+        Classify one BGR frame on the session's device with a pooled detector,
+        at ``tier`` or else the quality tier the current load allows
+        """
+        self.pending_frames += 1
+        try:
+            return await self.device_pool.run(session_id, self._analyze_frame, frame, tier)
+        finally:
+            self.pending_frames -= 1
+    
+    async def submit_live_frame(
+        self,
+        frame,
+        session_id: str,
+        age_seconds: float = 0.0
+    ) -> Dict[str, Any]:
+        """
+        Analyze a live frame through the scheduler
+
+        Returns a ``dropped`` result instead if a newer frame from the same
+        session arrives first or the frame goes stale while queued.
+        """
+        return await self.scheduler.submit_live(session_id, frame, age_seconds)
+    
+    async def submit_segment_frame(self, frame, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Analyze a recorded frame at full quality once live frames are served
+        """
+        return await self.scheduler.submit_segment(session_id, frame)
         
     async def process_metadata(self, request) -> Dict[str, Any]:
         """
@@ -42,26 +245,35 @@ class AnalysisService:
         self, 
         video_file, 
         session_id: Optional[str] = None,
-        timestamp: Optional[str] = None
+        timestamp: Optional[str] = None,
+        tenant: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Process video segment from mobile device
+
+        Runs once ``tenant`` (the child) gets its fair share of video
+        slots; cost is the upload size in megabytes. Uploads without a
+        child share one tenant, so per-session names cannot be used to
+        claim extra shares.
         """
-        logger.info(f"Processing video segment: {session_id}")
-        
-        # In production:
-        # 1. Save video file
-        # 2. Extract frames
-        # 3. Run AI analysis
-        # 4. Generate metadata
-        
-        result = {
-            "session_id": session_id,
-            "video_received": True,
-            "frames_extracted": 0,
-            "analysis_complete": False,
-            "gpu_processed": self.gpu_available
-        }
+        tenant = tenant or "anonymous"
+        size = getattr(video_file, "size", None) or 0
+        async with self.video_jobs.slot(tenant, cost=max(1.0, size / 1024**2)):
+            logger.info(f"Processing video segment: {session_id}")
+            
+            # In production:
+            # 1. Save video file
+            # 2. Extract frames
+            # 3. Run AI analysis (submit_segment_frame per frame)
+            # 4. Generate metadata
+            
+            result = {
+                "session_id": session_id,
+                "video_received": True,
+                "frames_extracted": 0,
+                "analysis_complete": False,
+                "gpu_processed": self.gpu_available
+            }
         
         return result
     
@@ -115,22 +327,7 @@ class AnalysisService:
         """
         Generate daily report
         """
-        return {
-            "child_id": child_id,
-            "date": date or datetime.now().strftime("%Y-%m-%d"),
-            "total_study_time": 14400,  # 4 hours
-            "focus_score": 72.5,
-            "activities": {
-                "studying": 14400,
-                "idle": 1800,
-                "away": 3600,
-                "playing": 1800
-            },
-            "alerts": [
-                {"type": "leave_too_long", "timestamp": "2026-02-21T10:30:00"},
-                {"type": "play_while_work", "timestamp": "2026-02-21T14:15:00"}
-            ]
-        }
+        return build_daily_report(child_id, date)
     
     async def generate_weekly_report(self, child_id: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,279 @@
+"""
+CPU Inference - Benchmark-selected CPU execution for PyTorch models
+"""
+
+import copy
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import warnings
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.imports import optional_import
+
+logger = logging.getLogger(__name__)
+
+# Candidate names, in the order they are tried
+EAGER = "eager"
+CHANNELS_LAST = "channels_last"
+INT8_DYNAMIC = "int8_dynamic"
+TORCHSCRIPT = "torchscript"
+ONNX_RUNTIME = "onnxruntime"
+
+
+def cpu_thread_count() -> int:
+    """CPUs this process may run on (respects affinity and cgroup pinning)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def tune_threads(threads: Optional[int] = None) -> Dict[str, int]:
+    """
+    Size torch's intra-op pool to the usable CPUs and keep inter-op at one
+
+    Inference runs one model call at a time per thread, so inter-op
+    parallelism only adds contention. ``set_num_interop_threads`` can
+    only be called before the first parallel op; later calls are ignored.
+    """
+    import torch
+    intra = threads or settings.CPU_INFERENCE_THREADS or cpu_thread_count()
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+    return {"intra_op": torch.get_num_threads(), "inter_op": torch.get_num_interop_threads()}
+
+
+def _channels_last(model, example_input, artifacts):
+    import torch
+
+    class ChannelsLast(torch.nn.Module):
+        """Feeds NHWC-strided input to a model converted to channels_last"""
+
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, x):
+            return self.inner(x.contiguous(memory_format=torch.channels_last))
+
+    if example_input.dim() != 4:
+        return None
+    # Module.to() converts in place; keep the caller's model untouched
+    inner = copy.deepcopy(model).to(memory_format=torch.channels_last)
+    return ChannelsLast(inner).eval()
+
+
+def _int8_dynamic(model, example_input, artifacts):
+    import torch
+    layers = {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}
+    if not any(type(m) in layers for m in model.modules()):
+        return None
+    with warnings.catch_warnings():
+        # torch.ao.quantization is deprecated in favour of torchao, which we do not ship
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(model, layers, dtype=torch.qint8).eval()
+
+
+def _torchscript(model, example_input, artifacts):
+    # Traced and frozen once, then loaded from the artifact cache
+    return artifacts.torchscript(model, example_input, "cpu")
+
+
+def _onnx_runtime(model, example_input, artifacts):
+    ort = optional_import("onnxruntime")
+    if ort is None:
+        return None
+    import numpy as np
+    import torch
+
+    path = artifacts.onnx(model, example_input, "cpu")
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = torch.get_num_threads()
+    options.inter_op_num_threads = 1
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    class OnnxRuntimeModel:
+        """Callable with the torch model's tensor-in, tensor-out interface"""
+
+        backend = ONNX_RUNTIME
+
+        def __call__(self, x):
+            output = session.run(None, {"input": np.ascontiguousarray(x.detach().cpu().numpy())})[0]
+            return torch.from_numpy(output)
+
+        def eval(self):
+            return self
+
+    return OnnxRuntimeModel()
+
+
+CANDIDATES: List[Tuple[str, Callable]] = [
+    (CHANNELS_LAST, _channels_last),
+    (INT8_DYNAMIC, _int8_dynamic),
+    (TORCHSCRIPT, _torchscript),
+    (ONNX_RUNTIME, _onnx_runtime),
+]
+
+
+class CPUInferenceOptimizer:
+    """
+    Picks the fastest CPU execution of a model and remembers the choice
+
+    Each applicable candidate (channels_last, dynamic int8, frozen
+    TorchScript, ONNX Runtime) is timed against eager execution on an example input; candidates
+    whose output drifts from eager by more than ``max_error`` (relative
+    to the largest eager output) are rejected. The winner is cached per
+    model key, weights hash, input shape, torch version and thread count
+    in a JSON file, so later starts apply it without benchmarking again
+    (retrained weights are benchmarked afresh); TorchScript and
+    ONNX exports come from the model artifact cache.
+    """
+
+    def __init__(
+        self,
+        cache_path: Optional[str] = None,
+        runs: Optional[int] = None,
+        max_error: Optional[float] = None,
+        artifacts=None
+    ):
+        self.cache_path = cache_path or settings.CPU_INFERENCE_CACHE_PATH
+        self.runs = runs or settings.CPU_INFERENCE_BENCHMARK_RUNS
+        self.max_error = settings.CPU_INFERENCE_MAX_ERROR if max_error is None else max_error
+        self._artifacts = artifacts
+        self._lock = threading.Lock()
+        self._decisions: Optional[Dict[str, Dict[str, Any]]] = None
+
+    @property
+    def artifacts(self):
+        if self._artifacts is None:
+            from services.model_cache import model_artifacts
+            self._artifacts = model_artifacts
+        return self._artifacts
+
+    # ---------- decision cache ----------
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._decisions is None:
+            self._decisions = {}
+            if os.path.exists(self.cache_path):
+                try:
+                    with open(self.cache_path, "r", encoding="utf-8") as f:
+                        self._decisions = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring CPU inference cache {self.cache_path}: {e}")
+        return self._decisions
+
+    def _save(self):
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.cache_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._decisions, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.cache_path)
+
+    def decision_key(self, model, example_input, cache_key: Optional[str] = None, artifacts=None) -> str:
+        import torch
+        name = cache_key or f"{type(model).__module__}.{type(model).__qualname__}"
+        # Weights hash and torch version: retrained weights are benchmarked again
+        weights = (artifacts or self.artifacts).key(model, "cpu")
+        shape = "x".join(str(d) for d in example_input.shape)
+        return f"{name}|{weights}|{shape}|threads-{torch.get_num_threads()}"
+
+    def cached_decision(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._load().get(key)
+
+    # ---------- benchmarking ----------
+
+    def _time(self, model, example_input) -> float:
+        import torch
+        with torch.inference_mode():
+            for _ in range(2):
+                model(example_input)
+            timings = []
+            for _ in range(self.runs):
+                started = time.perf_counter()
+                model(example_input)
+                timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    @staticmethod
+    def _error(reference, output) -> float:
+        scale = float(reference.abs().max()) or 1.0
+        return float((reference - output.to(reference.dtype)).abs().max()) / scale
+
+    def _build(self, name: str, model, example_input, artifacts):
+        if name == EAGER:
+            return model
+        for candidate, build in CANDIDATES:
+            if candidate == name:
+                return build(model, example_input, artifacts)
+        raise ValueError(f"Unknown CPU inference mode: {name}")
+
+    def benchmark(self, model, example_input, artifacts=None) -> Dict[str, Any]:
+        """
+        Time eager execution and every applicable candidate
+        """
+        import torch
+        artifacts = artifacts or self.artifacts
+        with torch.inference_mode():
+            reference = model(example_input)
+        results = {EAGER: {"ms": round(self._time(model, example_input), 3), "error": 0.0}}
+        for name, build in CANDIDATES:
+            try:
+                variant = build(model, example_input, artifacts)
+                if variant is None:
+                    continue
+                with torch.inference_mode():
+                    error = self._error(reference, variant(example_input))
+                results[name] = {"ms": round(self._time(variant, example_input), 3), "error": round(error, 5)}
+            except Exception as e:
+                logger.warning(f"CPU inference mode {name} failed: {e}")
+        return results
+
+    def optimize(self, model, example_input=None, cache_key: Optional[str] = None, artifacts=None):
+        """
+        Return the fastest accurate CPU variant of ``model``
+
+        Without an example input there is nothing to benchmark on, so only
+        the thread tuning and ``eval()`` are applied.
+        """
+        artifacts = artifacts or self.artifacts
+        threads = tune_threads()
+        model = model.eval()
+        if example_input is None:
+            logger.info(f"CPU inference: eager, threads {threads}")
+            return model
+
+        key = self.decision_key(model, example_input, cache_key, artifacts)
+        decision = self.cached_decision(key)
+        if decision is not None:
+            variant = self._build(decision["mode"], model, example_input, artifacts)
+            if variant is not None:
+                logger.info(f"CPU inference: {decision['mode']} (cached), threads {threads}")
+                return variant
+
+        results = self.benchmark(model, example_input, artifacts)
+        accurate = {n: r for n, r in results.items() if r["error"] <= self.max_error}
+        mode = min(accurate, key=lambda n: accurate[n]["ms"])
+        with self._lock:
+            self._load()[key] = {"mode": mode, "results": results, "decided_at": time.time()}
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Could not save CPU inference decision: {e}")
+        logger.info(f"CPU inference: {mode} of {results}, threads {threads}")
+        return self._build(mode, model, example_input, artifacts)
+
+
+# Singleton instance
+cpu_inference = CPUInferenceOptimizer()
@@ -0,0 +1,307 @@
+"""
+Device Pool - Least-loaded scheduling across GPUs or CPU core groups
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.config import settings
+from services.gpu_detector import GPUDetector
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+
+def affinity_cpus() -> List[int]:
+    """CPU ids this process may run on"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def pin_thread(cores: List[int]):
+    """Restrict the calling thread, and threads it starts later, to ``cores``"""
+    # On Linux, pid 0 means the calling thread, not the whole process
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+
+class PoolDevice:
+    """One schedulable device: a CUDA GPU or a group of CPU cores"""
+
+    __slots__ = (
+        "name", "kind", "index", "cores", "capacity",
+        "in_flight", "sessions", "completed", "busy_seconds",
+        "memory_total", "memory_free"
+    )
+
+    def __init__(self, name: str, kind: str, index: int, cores: Optional[List[int]] = None):
+        self.name = name
+        self.kind = kind
+        self.index = index
+        self.cores = cores or []
+        # Concurrent jobs the device absorbs before queueing: one per core
+        self.capacity = max(1, len(self.cores)) if kind == "cpu" else 1
+        self.in_flight = 0
+        self.sessions = 0
+        self.completed = 0
+        self.busy_seconds = 0.0
+        self.memory_total: Optional[float] = None
+        self.memory_free: Optional[float] = None
+
+    def memory_pressure(self) -> float:
+        if not self.memory_total:
+            return 0.0
+        return 1.0 - (self.memory_free or 0.0) / self.memory_total
+
+    def load(self, memory_weight: float) -> float:
+        """
+        Queue depth per unit of capacity plus weighted memory pressure
+        """
+        return self.in_flight / self.capacity + memory_weight * self.memory_pressure()
+
+
+class DevicePool:
+    """
+    Spreads sessions and batches over every device on the host
+
+    With CUDA, each GPU is a device. Without it, the CPUs in the affinity
+    mask are split into groups of ``cpu_group_size`` cores. Jobs started
+    with ``run`` execute on a per-device thread pool whose threads are
+    pinned to the group's cores when they are created, so threads they
+    start in turn (MediaPipe's graph threads, if the graph is built
+    there) inherit the same cores. A new session goes to the device with
+    the lowest load (in-flight jobs per unit of capacity, plus memory
+    pressure from the telemetry sampler) and stays there, so per-session
+    model state is not rebuilt on another device, until it has been idle
+    for ``session_ttl_seconds``.
+    """
+
+    def __init__(
+        self,
+        devices: Optional[List[PoolDevice]] = None,
+        cpu_group_size: Optional[int] = None,
+        telemetry=None,
+        memory_weight: Optional[float] = None,
+        session_ttl_seconds: Optional[float] = None,
+        clock=time.monotonic
+    ):
+        self.cpu_group_size = cpu_group_size or settings.DEVICE_POOL_CPU_GROUP_SIZE
+        self.telemetry = telemetry
+        self.memory_weight = (
+            settings.DEVICE_POOL_MEMORY_WEIGHT if memory_weight is None else memory_weight
+        )
+        self.devices = devices if devices is not None else self.discover()
+        self._by_name = {d.name: d for d in self.devices}
+        self.session_ttl_seconds = session_ttl_seconds or settings.SESSION_IDLE_TTL_SECONDS
+        self._clock = clock
+        # session_id -> (device, last used), least recently used first
+        self._sessions: "OrderedDict[str, Tuple[PoolDevice, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._started = clock()
+        logger.info(f"Device pool: {[d.name for d in self.devices]}")
+
+    def discover(self) -> List[PoolDevice]:
+        """
+        One device per GPU, or CPU core groups when there is none
+        """
+        # Workers that never load models should not import torch to count GPUs
+        if settings.USE_GPU and settings.MODEL_WARMUP:
+            devices = []
+            for info in GPUDetector.check_gpu()["devices"]:
+                device = PoolDevice(f"cuda:{info['index']}", "cuda", info["index"])
+                device.memory_total, device.memory_free = info["memory_total"], info["memory_free"]
+                devices.append(device)
+            if devices:
+                return devices
+        cpus = affinity_cpus()
+        size = self.cpu_group_size or len(cpus)
+        return [
+            PoolDevice(f"cpu:{i}", "cpu", i, cpus[start:start + size])
+            for i, start in enumerate(range(0, len(cpus), size))
+        ]
+
+    def _refresh_memory(self):
+        if self.telemetry is None:
+            return
+        for sample in self.telemetry.latest().get("devices", []):
+            device = self._by_name.get(f"cuda:{sample['index']}")
+            if device is not None:
+                device.memory_free = sample["memory_free"]
+                device.memory_total = sample["memory_total"]
+
+    def _least_loaded(self) -> PoolDevice:
+        self._refresh_memory()
+        return min(
+            self.devices,
+            key=lambda d: (d.load(self.memory_weight), d.sessions, d.index)
+        )
+
+    def _expire(self, now: float):
+        cutoff = now - self.session_ttl_seconds
+        while self._sessions:
+            session_id, (device, last_used) = next(iter(self._sessions.items()))
+            if last_used > cutoff:
+                break
+            del self._sessions[session_id]
+            device.sessions -= 1
+
+    def _assign(self, session_id: str) -> PoolDevice:
+        now = self._clock()
+        self._expire(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            device = self._least_loaded()
+            device.sessions += 1
+        else:
+            device = entry[0]
+            self._sessions.move_to_end(session_id)
+        self._sessions[session_id] = (device, now)
+        return device
+
+    def assign(self, session_id: str) -> PoolDevice:
+        """
+        Device for a session: its existing one, else the least loaded
+        """
+        with self._lock:
+            return self._assign(session_id)
+
+    def release(self, session_id: str):
+        """
+        Forget a finished session's assignment
+        """
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is not None:
+                entry[0].sessions -= 1
+
+    def _take(self, session_id: Optional[str]) -> PoolDevice:
+        with self._lock:
+            device = self._assign(session_id) if session_id is not None else self._least_loaded()
+            device.in_flight += 1
+            return device
+
+    def _finish(self, device: PoolDevice, elapsed: float):
+        with self._lock:
+            device.in_flight -= 1
+            device.completed += 1
+            device.busy_seconds += elapsed
+
+    @contextmanager
+    def acquire(self, session_id: Optional[str] = None) -> Iterator[PoolDevice]:
+        """
+        Count one job against the session's device (or the least loaded one)
+        """
+        device = self._take(session_id)
+        started = time.perf_counter()
+        try:
+            yield device
+        finally:
+            self._finish(device, time.perf_counter() - started)
+
+    def executor(self, device: PoolDevice) -> ThreadPoolExecutor:
+        """
+        The device's thread pool; CPU group threads are pinned as they start
+        """
+        with self._lock:
+            executor = self._executors.get(device.name)
+            if executor is None:
+                executor = self._executors[device.name] = ThreadPoolExecutor(
+                    max_workers=device.capacity,
+                    thread_name_prefix=f"device-{device.name}",
+                    initializer=pin_thread,
+                    initargs=(device.cores,)
+                )
+            return executor
+
+    def _timed(self, device: PoolDevice, fn: Callable, args: tuple) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(device, *args)
+        finally:
+            with self._lock:
+                device.busy_seconds += time.perf_counter() - started
+
+    async def run(self, session_id: Optional[str], fn: Callable, *args) -> Any:
+        """
+        Run ``fn(device, *args)`` on the session's device (or the least loaded one)
+        """
+        device = self._take(session_id)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor(device), self._timed, device, fn, args
+            )
+        finally:
+            # Busy time was recorded on the device thread, excluding queueing
+            self._finish(device, 0.0)
+
+    def call(self, device: PoolDevice, fn: Callable, *args) -> Any:
+        """
+        Run ``fn(*args)`` on one of the device's threads and wait for it (blocking)
+        """
+        return self.executor(device).submit(fn, *args).result()
+
+    def torch_device(self, device: PoolDevice) -> "torch.device":
+        """
+        The torch device jobs on ``device`` should use
+        """
+        import torch
+        if device.kind == "cuda":
+            return GPUDetector.get_device(device.index)
+        return torch.device("cpu")
+
+    def optimize(self, device: PoolDevice, model, example_input=None, cache_key: Optional[str] = None):
+        """
+        Optimize a model for inference on ``device``
+        """
+        return GPUDetector.optimize_for_inference(
+            model,
+            example_input,
+            cache_key,
+            device_id=device.index if device.kind == "cuda" else None
+        )
+
+    def close(self):
+        """
+        Stop the per-device threads
+        """
+        with self._lock:
+            executors, self._executors = list(self._executors.values()), {}
+        for executor in executors:
+            executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-device queue depth, sessions and utilization
+        """
+        elapsed = max(self._clock() - self._started, 1e-9)
+        self._refresh_memory()
+        return {
+            "devices": [
+                {
+                    "name": d.name,
+                    "kind": d.kind,
+                    "cores": d.cores,
+                    "in_flight": d.in_flight,
+                    "sessions": d.sessions,
+                    "completed": d.completed,
+                    # Share of capacity kept busy since the pool started
+                    "utilization": round(d.busy_seconds / (elapsed * d.capacity), 4),
+                    "memory_total": d.memory_total,
+                    "memory_free": d.memory_free
+                }
+                for d in self.devices
+            ],
+            "sessions": len(self._sessions)
+        }
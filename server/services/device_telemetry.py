@@ -0,0 +1,206 @@
+"""
+Device Telemetry - Cached GPU, CPU and memory samples for health endpoints
+"""
+
+import asyncio
+import logging
+import os
+import platform
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+def read_cpu_times() -> Optional[Tuple[int, int]]:
+    """(busy, total) jiffies from /proc/stat, or None off Linux"""
+    try:
+        with open("/proc/stat", "r") as f:
+            fields = [int(v) for v in f.readline().split()[1:]]
+    except (OSError, ValueError):
+        return None
+    # idle + iowait count as not busy
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)
+    total = sum(fields[:8])
+    return total - idle, total
+
+
+def read_memory() -> Optional[Dict[str, float]]:
+    """Host memory in GB from /proc/meminfo, or None off Linux"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            info = {line.split(":")[0]: int(line.split()[1]) * 1024 for line in f}
+    except (OSError, ValueError, IndexError):
+        return None
+    total = info.get("MemTotal", 0)
+    available = info.get("MemAvailable", info.get("MemFree", 0))
+    return {
+        "total": round(total / GB, 2),
+        "available": round(available / GB, 2),
+        "used": round((total - available) / GB, 2),
+        "percent": round(100.0 * (total - available) / total, 1) if total else None
+    }
+
+
+class DeviceTelemetry:
+    """
+    Background sampler behind /health and /api/v1/gpu/status
+
+    Every ``interval_seconds`` a sample is taken in a worker thread (CUDA
+    queries block) and kept in a ring of ``history_size`` entries, so the
+    endpoints return the latest sample without touching the driver. The
+    GPU fields keep the shape of ``GPUDetector.check_gpu``; CPU and memory
+    utilization are reported on every host, GPU or not.
+    """
+
+    def __init__(
+        self,
+        interval_seconds: Optional[float] = None,
+        history_size: Optional[int] = None,
+        probe_gpu: Optional[bool] = None
+    ):
+        self.interval_seconds = interval_seconds or settings.TELEMETRY_INTERVAL_SECONDS
+        self.history_size = history_size or settings.TELEMETRY_HISTORY_SIZE
+        # Workers that never load models should not import torch just to report on it
+        self.probe_gpu = (
+            settings.USE_GPU and settings.MODEL_WARMUP if probe_gpu is None else probe_gpu
+        )
+        self.samples: deque = deque(maxlen=self.history_size)
+        self._cpu_times = read_cpu_times()
+        self._task: Optional[asyncio.Task] = None
+
+    def _empty_gpu(self) -> Dict[str, Any]:
+        return {
+            "available": False,
+            "cuda_available": False,
+            "name": None,
+            "memory_total": None,
+            "memory_free": None,
+            "memory_used": None,
+            "device_count": 0,
+            "driver_version": None,
+            "cuda_version": None,
+            "platform": platform.system(),
+            "devices": []
+        }
+
+    def _sample_gpu(self) -> Dict[str, Any]:
+        result = self._empty_gpu()
+        import torch
+        if not torch.cuda.is_available():
+            return result
+        devices: List[Dict[str, Any]] = []
+        for index in range(torch.cuda.device_count()):
+            props = torch.cuda.get_device_properties(index)
+            free, total = torch.cuda.mem_get_info(index)
+            try:
+                utilization = torch.cuda.utilization(index)
+            except Exception:
+                # Needs pynvml
+                utilization = None
+            devices.append({
+                "index": index,
+                "name": props.name,
+                "memory_total": round(total / GB, 2),
+                "memory_free": round(free / GB, 2),
+                "memory_used": round((total - free) / GB, 2),
+                "utilization": utilization,
+                "capability": torch.cuda.get_device_capability(index)
+            })
+        result.update({
+            "available": True,
+            "cuda_available": True,
+            "device_count": len(devices),
+            "cuda_version": torch.version.cuda,
+            "devices": devices
+        })
+        if devices:
+            first = devices[0]
+            result.update({
+                "name": first["name"],
+                "memory_total": first["memory_total"],
+                "memory_free": first["memory_free"],
+                "memory_used": first["memory_used"],
+                "driver_version": first["capability"]
+            })
+        return result
+
+    def _sample_cpu(self) -> Dict[str, Any]:
+        percent = None
+        times = read_cpu_times()
+        if times is not None and self._cpu_times is not None:
+            busy = times[0] - self._cpu_times[0]
+            total = times[1] - self._cpu_times[1]
+            percent = round(100.0 * busy / total, 1) if total > 0 else 0.0
+        self._cpu_times = times
+        try:
+            load = [round(v, 2) for v in os.getloadavg()]
+        except OSError:
+            load = None
+        return {"count": os.cpu_count(), "percent": percent, "load_avg": load}
+
+    def sample(self) -> Dict[str, Any]:
+        """
+        Take one sample and add it to the ring (blocking; run off the loop)
+        """
+        result = self._empty_gpu()
+        if self.probe_gpu:
+            try:
+                result = self._sample_gpu()
+            except Exception as e:
+                logger.error(f"GPU telemetry sample failed: {e}")
+        result["cpu"] = self._sample_cpu()
+        result["memory"] = read_memory()
+        result["sampled_at"] = datetime.utcnow().isoformat()
+        self.samples.append(result)
+        return result
+
+    def latest(self) -> Dict[str, Any]:
+        """
+        The most recent sample, without querying any device
+        """
+        if self.samples:
+            return self.samples[-1]
+        result = self._empty_gpu()
+        result.update({"cpu": None, "memory": None, "sampled_at": None})
+        return result
+
+    def history(self) -> List[Dict[str, Any]]:
+        """
+        Samples in the ring, oldest first
+        """
+        return list(self.samples)
+
+    def start(self):
+        """
+        Start sampling in the background
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop sampling
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                logger.error(f"Telemetry sample failed: {e}")
+            await asyncio.sleep(max(0.0, self.interval_seconds - (time.monotonic() - started)))
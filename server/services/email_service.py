@@ -5,11 +5,12 @@ Email Service - Alert notifications
 import logging
 from typing import Optional, List
 from datetime import datetime
-import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 from core.config import settings
+from services.email_templates import EmailTemplates, email_templates
+from services.smtp_pool import SMTPConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -17,12 +18,23 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Email notification service"""
     
-    def __init__(self):
+    def __init__(self, templates: Optional[EmailTemplates] = None):
+        self.templates = templates or email_templates
         self.smtp_host = settings.SMTP_HOST
         self.smtp_port = settings.SMTP_PORT
         self.smtp_user = settings.SMTP_USER
         self.smtp_password = settings.SMTP_PASSWORD
         self.from_email = settings.EMAIL_FROM
+        self.pool = SMTPConnectionPool(
+            self.smtp_host,
+            self.smtp_port,
+            username=self.smtp_user,
+            password=self.smtp_password,
+            start_tls=settings.SMTP_START_TLS,
+            size=settings.SMTP_POOL_SIZE,
+            max_messages_per_connection=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+            idle_check_seconds=settings.SMTP_IDLE_CHECK_SECONDS
+        )
         
     async def send_email(
         self,
@@ -34,6 +46,19 @@ class EmailService:
         """
         Send email notification
         """
+        html_part = MIMEText(html, "html") if html else None
+        return await self._send_parts(to_email, subject, MIMEText(body, "plain"), html_part)
+    
+    async def _send_parts(
+        self,
+        to_email: str,
+        subject: str,
+        text_part: MIMEText,
+        html_part: Optional[MIMEText] = None
+    ) -> bool:
+        """
+        Send a message assembled from prepared MIME parts
+        """
         if not self.smtp_user or not self.smtp_password:
             logger.warning("Email not configured - skipping send")
             return False
@@ -45,22 +70,13 @@ class EmailService:
             message["To"] = to_email
             
             # Plain text part
-            text_part = MIMEText(body, "plain")
             message.attach(text_part)
             
             # HTML part (if provided)
-            if html:
-                html_part = MIMEText(html, "html")
+            if html_part is not None:
                 message.attach(html_part)
             
-            await aiosmtplib.send(
-                message,
-                hostname=self.smtp_host,
-                port=self.smtp_port,
-                username=self.smtp_user,
-                password=self.smtp_password,
-                start_tls=True
-            )
+            await self.pool.send_message(message)
             
             logger.info(f"Email sent to {to_email}: {subject}")
             return True
@@ -69,91 +85,98 @@ class EmailService:
             logger.error(f"Error sending email: {e}")
             return False
     
+    async def close(self):
+        """
+        Close pooled SMTP connections
+        """
+        await self.pool.close()
+    
     async def send_alert(
         self,
         to_email: str,
         alert_type: str,
         child_name: str,
-        details: str
+        details: str,
+        locale: Optional[str] = None
     ) -> bool:
         """
         Send alert notification
         """
-        subject_map = {
-            "leave_too_long": f"⚠️ {child_name} 离开时间过长",
-            "play_while_work": f"📱 {child_name} 边玩边学",
-            "session_start": f"✅ {child_name} 开始学习了",
-            "session_end": f"🏁 {child_name} 学习结束"
-        }
+        rendered = self.templates.render_alert(alert_type, child_name, details, locale)
+        html = rendered.html(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         
-        body_map = {
-            "leave_too_long": f"提醒：{child_name} 已经离开超过15分钟了。请关注。",
-            "play_while_work": f"提醒：检测到{child_name}一边学习一边玩耍超过5分钟。",
-            "session_start": f"{child_name}已开始学习。学习时长统计已开始。",
-            "session_end": f"{child_name}今日学习已结束。详情请查看学习报告。"
-        }
+        return await self._send_parts(
+            to_email,
+            rendered.subject,
+            rendered.text_part(),
+            MIMEText(html, "html")
+        )
+    
+    async def send_alert_digest(
+        self,
+        to_email: str,
+        alerts: List[dict],
+        locale: Optional[str] = None
+    ) -> bool:
+        """
+        Send several alerts for one recipient as a single email
+        """
+        render = self.templates.render
+        subject = render("digest.subject", locale, count=len(alerts))
         
-        subject = subject_map.get(alert_type, f"HomeworkGuardian 提醒")
-        body = body_map.get(alert_type, details)
+        lines = []
+        items = []
+        for alert in alerts:
+            alert_subject, alert_body = self.templates.alert_text(
+                alert["alert_type"], alert["child_name"], alert["details"], locale
+            )
+            values = {
+                "subject": alert_subject,
+                "body": alert_body,
+                "details": alert["details"]
+            }
+            lines.append(render("digest.line", locale, **values))
+            items.append(render("digest.item_html", locale, **values))
         
-        html = f"""
-        <html>
-        <body>
-            <h2>{subject}</h2>
-            <p>{body}</p>
-            <p>时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-            <hr>
-            <p><small>来自 HomeworkGuardian 家庭作业监控系统</small></p>
-        </body>
-        </html>
-        """
+        html = render(
+            "digest.html",
+            locale,
+            subject=subject,
+            items="".join(items),
+            sent_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
         
-        return await self.send_email(to_email, subject, body, html)
+        return await self.send_email(to_email, subject, "\n".join(lines), html)
     
     async def send_daily_report(
         self,
         to_email: str,
         child_name: str,
-        report_data: dict
+        report_data: dict,
+        locale: Optional[str] = None
     ) -> bool:
         """
         Send daily learning report
         """
-        subject = f"📊 {child_name} 今日学习报告"
-        
-        study_hours = report_data.get("total_study_time", 0) / 3600
-        focus_score = report_data.get("focus_score", 0)
-        
-        body = f"""
-        {child_name} 今日学习报告
-        
-        学习时长: {study_hours:.1f} 小时
-        专注度: {focus_score:.1f}%
-        
-        详细活动统计:
-        - 学习: {report_data.get('activities', {}).get('studying', 0) // 60} 分钟
-        - 发呆: {report_data.get('activities', {}).get('idle', 0) // 60} 分钟
-        - 离开: {report_data.get('activities', {}).get('away', 0) // 60} 分钟
-        - 玩耍: {report_data.get('activities', {}).get('playing', 0) // 60} 分钟
-        
-        发送时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        """
-        
-        html = f"""
-        <html>
-        <body>
-            <h2>📊 {child_name} 今日学习报告</h2>
-            <table>
-                <tr><td><b>学习时长</b></td><td>{study_hours:.1f} 小时</td></tr>
-                <tr><td><b>专注度</b></td><td>{focus_score:.1f}%</td></tr>
-            </table>
-            <hr>
-            <p><small>来自 HomeworkGuardian</small></p>
-        </body>
-        </html>
-        """
+        activities = report_data.get("activities", {})
+        values = {
+            "child_name": child_name,
+            "study_hours": f"{report_data.get('total_study_time', 0) / 3600:.1f}",
+            "focus_score": f"{report_data.get('focus_score', 0):.1f}",
+            "studying_minutes": activities.get("studying", 0) // 60,
+            "idle_minutes": activities.get("idle", 0) // 60,
+            "away_minutes": activities.get("away", 0) // 60,
+            "playing_minutes": activities.get("playing", 0) // 60,
+            "sent_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
         
-        return await self.send_email(to_email, subject, body, html)
+        render = self.templates.render
+        return await self.send_email(
+            to_email,
+            render("report.subject", locale, **values),
+            render("report.body", locale, **values),
+            render("report.html", locale, **values)
+        )
     
     async def send_test_email(self, to_email: str) -> bool:
         """
@@ -161,6 +184,6 @@ class EmailService:
         """
         return await self.send_email(
             to_email,
-            "✅ HomeworkGuardian 测试邮件",
-            "这是一封测试邮件，确认邮件推送功能正常。"
+            self.templates.render("test.subject"),
+            self.templates.render("test.body")
         )
@@ -0,0 +1,200 @@
+"""
+Email Templates - Compiled, localizable email content with a render cache
+"""
+
+import logging
+from collections import OrderedDict
+from email.mime.text import MIMEText
+from string import Template
+from typing import Dict, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALERT_TYPES = ("leave_too_long", "play_while_work", "session_start", "session_end")
+# Alert types whose text includes the details (which rule fired, how long)
+DETAILED_ALERT_TYPES = ("custom",)
+
+# Built-in catalog; other locales may override any subset of these keys
+ZH_CN_CATALOG: Dict[str, str] = {
+    "alert.leave_too_long.subject": "⚠️ $child_name 离开时间过长",
+    "alert.leave_too_long.body": "提醒：$child_name 已经离开超过15分钟了。请关注。",
+    "alert.play_while_work.subject": "📱 $child_name 边玩边学",
+    "alert.play_while_work.body": "提醒：检测到${child_name}一边学习一边玩耍超过5分钟。",
+    "alert.session_start.subject": "✅ $child_name 开始学习了",
+    "alert.session_start.body": "${child_name}已开始学习。学习时长统计已开始。",
+    "alert.session_end.subject": "🏁 $child_name 学习结束",
+    "alert.session_end.body": "${child_name}今日学习已结束。详情请查看学习报告。",
+    "alert.custom.subject": "🔔 $child_name 触发了提醒规则",
+    "alert.custom.body": "提醒：${child_name}触发了您设置的提醒规则（$details）。",
+    "alert.default.subject": "HomeworkGuardian 提醒",
+    "alert.default.body": "$details",
+    "alert.html": """
+        <html>
+        <body>
+            <h2>$subject</h2>
+            <p>$body</p>
+            <p>时间: $sent_at</p>
+            <hr>
+            <p><small>来自 HomeworkGuardian 家庭作业监控系统</small></p>
+        </body>
+        </html>
+        """,
+    "digest.subject": "🔔 HomeworkGuardian $count 条提醒",
+    "digest.line": "- $subject: $body $details",
+    "digest.item_html": "<li><b>$subject</b><br>$body<br>$details</li>",
+    "digest.html": """
+        <html>
+        <body>
+            <h2>$subject</h2>
+            <ul>$items</ul>
+            <p>时间: $sent_at</p>
+            <hr>
+            <p><small>来自 HomeworkGuardian 家庭作业监控系统</small></p>
+        </body>
+        </html>
+        """,
+    "report.subject": "📊 $child_name 今日学习报告",
+    "report.body": """
+        $child_name 今日学习报告
+
+        学习时长: $study_hours 小时
+        专注度: $focus_score%
+
+        详细活动统计:
+        - 学习: $studying_minutes 分钟
+        - 发呆: $idle_minutes 分钟
+        - 离开: $away_minutes 分钟
+        - 玩耍: $playing_minutes 分钟
+
+        发送时间: $sent_at
+        """,
+    "report.html": """
+        <html>
+        <body>
+            <h2>📊 $child_name 今日学习报告</h2>
+            <table>
+                <tr><td><b>学习时长</b></td><td>$study_hours 小时</td></tr>
+                <tr><td><b>专注度</b></td><td>$focus_score%</td></tr>
+            </table>
+            <hr>
+            <p><small>来自 HomeworkGuardian</small></p>
+        </body>
+        </html>
+        """,
+    "test.subject": "✅ HomeworkGuardian 测试邮件",
+    "test.body": "这是一封测试邮件，确认邮件推送功能正常。",
+}
+
+
+class RenderedAlert:
+    """
+    Cached rendering of one (alert type, child, locale) alert
+
+    Everything except the send time is rendered once. MIME parts are
+    mutable and belong to the message they are attached to, so each
+    message gets a fresh part built from the cached strings.
+    """
+
+    __slots__ = ("subject", "body", "_html")
+
+    def __init__(self, subject: str, body: str, html: Template):
+        self.subject = subject
+        self.body = body
+        self._html = html
+
+    def text_part(self) -> MIMEText:
+        return MIMEText(self.body, "plain")
+
+    def html(self, sent_at: str) -> str:
+        return self._html.substitute(sent_at=sent_at)
+
+
+class EmailTemplates:
+    """
+    Registry of compiled templates per locale
+
+    Catalogs are compiled to ``string.Template`` objects when registered,
+    so sending only substitutes values. Lookups fall back to the default
+    locale for unknown locales and for keys a catalog does not define.
+    """
+
+    def __init__(self, default_locale: Optional[str] = None, cache_size: int = 4096):
+        self.default_locale = default_locale or settings.EMAIL_LOCALE
+        self.cache_size = cache_size
+        self._locales: Dict[str, Dict[str, Template]] = {}
+        self._alert_cache: "OrderedDict[tuple, RenderedAlert]" = OrderedDict()
+        self.register_locale("zh_CN", ZH_CN_CATALOG)
+
+    def register_locale(self, locale: str, catalog: Dict[str, str]):
+        """
+        Compile and register a locale catalog
+        """
+        self._locales[locale] = {key: Template(text) for key, text in catalog.items()}
+        # Drop cached renders that may have used the previous catalog
+        self._alert_cache.clear()
+        logger.info(f"Email templates registered for locale {locale}")
+
+    def template(self, key: str, locale: Optional[str] = None) -> Template:
+        catalog = self._locales.get(locale or self.default_locale)
+        if catalog is not None and key in catalog:
+            return catalog[key]
+        return self._locales[self.default_locale][key]
+
+    def render(self, key: str, locale: Optional[str] = None, **values) -> str:
+        return self.template(key, locale).substitute(values)
+
+    def render_alert(
+        self,
+        alert_type: str,
+        child_name: str,
+        details: str,
+        locale: Optional[str] = None
+    ) -> RenderedAlert:
+        """
+        Render an alert, reusing the cached result for repeated tuples
+        """
+        alert_type = getattr(alert_type, "value", alert_type)
+        known = alert_type in ALERT_TYPES
+        # Only the fallback body depends on details
+        cache_key = (alert_type, child_name, locale, None if known else details)
+        rendered = self._alert_cache.get(cache_key)
+        if rendered is not None:
+            self._alert_cache.move_to_end(cache_key)
+            return rendered
+
+        subject, body = self.alert_text(alert_type, child_name, details, locale)
+        # Pre-fill everything but the send time; escape "$" so it survives
+        html = Template(self.template("alert.html", locale).safe_substitute(
+            subject=subject.replace("$", "$$"), body=body.replace("$", "$$")
+        ))
+        rendered = RenderedAlert(subject, body, html)
+
+        self._alert_cache[cache_key] = rendered
+        if len(self._alert_cache) > self.cache_size:
+            self._alert_cache.popitem(last=False)
+        return rendered
+
+    def alert_text(
+        self,
+        alert_type: str,
+        child_name: str,
+        details: str,
+        locale: Optional[str] = None
+    ):
+        """
+        Subject and body for one alert
+        """
+        alert_type = getattr(alert_type, "value", alert_type)
+        templated = alert_type in ALERT_TYPES or alert_type in DETAILED_ALERT_TYPES
+        prefix = f"alert.{alert_type}" if templated else "alert.default"
+        values = {"child_name": child_name, "details": details}
+        return (
+            self.render(f"{prefix}.subject", locale, **values),
+            self.render(f"{prefix}.body", locale, **values)
+        )
+
+
+# Singleton
+email_templates = EmailTemplates()
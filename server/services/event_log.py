@@ -0,0 +1,536 @@
+"""
+Event Log - Partitioned ingestion log with consumer groups
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.leader_lock import FileLeaderLock, RedisLeaderLock
+
+logger = logging.getLogger(__name__)
+
+# Try to import the asyncio Redis client
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import ResponseError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    logger.warning("redis not available - event log limited to the file backend")
+
+Message = Tuple[str, Dict[str, Any]]
+# A replayed message with how many times it has been delivered
+Delivery = Tuple[str, Dict[str, Any], int]
+
+
+def partition_for(session_id: str, partitions: int) -> int:
+    """Stable partition for a session, so its events stay in order"""
+    digest = hashlib.blake2b(session_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % partitions
+
+
+class FileEventLog:
+    """
+    Append-only JSON-lines files, one per partition
+
+    Message ids are line numbers. Each (group, partition) keeps its
+    read position and pending (delivered, unacknowledged) entries in a
+    small JSON file rewritten atomically, so a restarted consumer
+    resumes where the group left off and can replay what was pending.
+    Dead-lettered entries are appended to ``dead-letter.log``.
+
+    Line offsets are indexed in memory, so only the process that
+    appends sees new entries: use it with a single API worker.
+    """
+
+    def __init__(self, directory: str, partitions: int):
+        self.directory = directory
+        self.partitions = partitions
+        self.on_append: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._offsets: List[List[int]] = []
+        self._groups: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        os.makedirs(os.path.join(directory, "groups"), exist_ok=True)
+        for partition in range(partitions):
+            offsets = []
+            path = self._partition_path(partition)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    position = 0
+                    for line in f:
+                        if line.endswith(b"\n"):
+                            offsets.append(position)
+                        position += len(line)
+            self._offsets.append(offsets)
+
+    def _partition_path(self, partition: int) -> str:
+        return os.path.join(self.directory, f"partition-{partition:03d}.log")
+
+    def _group_path(self, group: str, partition: int) -> str:
+        return os.path.join(self.directory, "groups", f"{group}-{partition:03d}.json")
+
+    def partition_lock(self, group: str, partition: int) -> FileLeaderLock:
+        return FileLeaderLock(f"{group}-{partition:03d}", os.path.join(self.directory, "locks"))
+
+    def _group(self, group: str, partition: int) -> Dict[str, Any]:
+        key = (group, partition)
+        state = self._groups.get(key)
+        if state is None:
+            path = self._group_path(group, partition)
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            else:
+                state = {"next": 0, "pending": {}}
+            self._groups[key] = state
+        return state
+
+    def _save_group(self, group: str, partition: int):
+        path = self._group_path(group, partition)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._groups[(group, partition)], f)
+        os.replace(tmp, path)
+
+    def _load(self, partition: int, seqs: List[int]) -> List[Message]:
+        messages = []
+        with open(self._partition_path(partition), "rb") as f:
+            for seq in seqs:
+                f.seek(self._offsets[partition][seq])
+                messages.append((str(seq), json.loads(f.readline())))
+        return messages
+
+    async def append(self, event: Dict[str, Any]) -> Tuple[int, str]:
+        partition = partition_for(event["session_id"], self.partitions)
+        line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self._partition_path(partition), "ab") as f:
+                position = f.tell()
+                f.write(line)
+            offsets = self._offsets[partition]
+            offsets.append(position)
+            seq = len(offsets) - 1
+        if self.on_append is not None:
+            self.on_append()
+        return partition, str(seq)
+
+    async def read(self, group: str, consumer: str, partition: int, count: int) -> List[Message]:
+        with self._lock:
+            state = self._group(group, partition)
+            start = state["next"]
+            end = min(start + count, len(self._offsets[partition]))
+            if end <= start:
+                return []
+            now = time.time()
+            for seq in range(start, end):
+                state["pending"][str(seq)] = [consumer, now, 1]
+            state["next"] = end
+            self._save_group(group, partition)
+            return self._load(partition, list(range(start, end)))
+
+    async def ack(self, group: str, partition: int, ids: List[str]):
+        if not ids:
+            return
+        with self._lock:
+            state = self._group(group, partition)
+            for message_id in ids:
+                state["pending"].pop(message_id, None)
+            self._save_group(group, partition)
+
+    async def claim_pending(
+        self,
+        group: str,
+        consumer: str,
+        partition: int,
+        min_idle_seconds: float,
+        count: int
+    ) -> List[Delivery]:
+        with self._lock:
+            state = self._group(group, partition)
+            now = time.time()
+            seqs = sorted(
+                int(message_id) for message_id, (_, delivered_at, _) in state["pending"].items()
+                if now - delivered_at >= min_idle_seconds
+            )[:count]
+            if not seqs:
+                return []
+            for seq in seqs:
+                entry = state["pending"][str(seq)]
+                state["pending"][str(seq)] = [consumer, now, entry[2] + 1]
+            self._save_group(group, partition)
+            return [
+                (message_id, event, state["pending"][message_id][2])
+                for message_id, event in self._load(partition, seqs)
+            ]
+
+    async def pending_count(self, group: str, partition: int) -> int:
+        with self._lock:
+            return len(self._group(group, partition)["pending"])
+
+    async def dead_letter(self, group: str, partition: int, message_id: str, event: Dict[str, Any]):
+        record = {"group": group, "partition": partition, "id": message_id, "event": event}
+        line = (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            with open(os.path.join(self.directory, "dead-letter.log"), "ab") as f:
+                f.write(line)
+        await self.ack(group, partition, [message_id])
+
+    async def lag(self, group: str) -> Dict[int, Dict[str, int]]:
+        with self._lock:
+            result = {}
+            for partition in range(self.partitions):
+                state = self._group(group, partition)
+                result[partition] = {
+                    "lag": len(self._offsets[partition]) - state["next"],
+                    "pending": len(state["pending"])
+                }
+            return result
+
+
+class RedisEventLog:
+    """
+    Redis Streams backend, one stream per partition
+
+    Consumer groups track delivery and acknowledgement in Redis, so any
+    node can append and any consumer in the group can take over a
+    partition, replaying its pending entries with XAUTOCLAIM.
+    Dead-lettered entries go to the ``{prefix}:dead`` stream.
+    """
+
+    def __init__(self, client, partitions: int, max_len: int, prefix: str = "events"):
+        self.client = client
+        self.partitions = partitions
+        self.max_len = max_len
+        self.prefix = prefix
+        self.on_append: Optional[Callable[[], None]] = None
+        self._groups_ready = set()
+
+    @classmethod
+    def from_url(cls, url: str, partitions: int, max_len: int) -> "RedisEventLog":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for the redis event log")
+        return cls(aioredis.from_url(url), partitions, max_len)
+
+    def _key(self, partition: int) -> str:
+        return f"{self.prefix}:{partition}"
+
+    def partition_lock(self, group: str, partition: int) -> RedisLeaderLock:
+        return RedisLeaderLock(self.client, f"{self.prefix}:{group}:{partition}")
+
+    async def _ensure_group(self, group: str, partition: int):
+        if (group, partition) in self._groups_ready:
+            return
+        try:
+            await self.client.xgroup_create(self._key(partition), group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups_ready.add((group, partition))
+
+    @staticmethod
+    def _decode(entries) -> List[Message]:
+        return [
+            (message_id.decode("utf-8"), json.loads(fields[b"data"]))
+            for message_id, fields in entries
+            if fields
+        ]
+
+    async def append(self, event: Dict[str, Any]) -> Tuple[int, str]:
+        partition = partition_for(event["session_id"], self.partitions)
+        message_id = await self.client.xadd(
+            self._key(partition),
+            {"data": json.dumps(event, ensure_ascii=False, default=str)},
+            maxlen=self.max_len,
+            approximate=True
+        )
+        if self.on_append is not None:
+            self.on_append()
+        return partition, message_id.decode("utf-8")
+
+    async def read(self, group: str, consumer: str, partition: int, count: int) -> List[Message]:
+        await self._ensure_group(group, partition)
+        response = await self.client.xreadgroup(
+            group, consumer, {self._key(partition): ">"}, count=count
+        )
+        if not response:
+            return []
+        return self._decode(response[0][1])
+
+    async def ack(self, group: str, partition: int, ids: List[str]):
+        if ids:
+            await self.client.xack(self._key(partition), group, *ids)
+
+    async def claim_pending(
+        self,
+        group: str,
+        consumer: str,
+        partition: int,
+        min_idle_seconds: float,
+        count: int
+    ) -> List[Message]:
+        await self._ensure_group(group, partition)
+        response = await self.client.xautoclaim(
+            self._key(partition),
+            group,
+            consumer,
+            min_idle_time=int(min_idle_seconds * 1000),
+            start_id="0-0",
+            count=count
+        )
+        messages = self._decode(response[1])
+        if not messages:
+            return []
+        details = await self.client.xpending_range(
+            self._key(partition), group,
+            min=messages[0][0], max=messages[-1][0], count=len(messages)
+        )
+        deliveries = {
+            entry["message_id"].decode("utf-8"): entry["times_delivered"] for entry in details
+        }
+        return [
+            (message_id, event, deliveries.get(message_id, 1))
+            for message_id, event in messages
+        ]
+
+    async def pending_count(self, group: str, partition: int) -> int:
+        await self._ensure_group(group, partition)
+        summary = await self.client.xpending(self._key(partition), group)
+        return summary["pending"]
+
+    async def dead_letter(self, group: str, partition: int, message_id: str, event: Dict[str, Any]):
+        await self.client.xadd(
+            f"{self.prefix}:dead",
+            {
+                "group": group,
+                "partition": partition,
+                "id": message_id,
+                "data": json.dumps(event, ensure_ascii=False, default=str)
+            },
+            maxlen=self.max_len,
+            approximate=True
+        )
+        await self.ack(group, partition, [message_id])
+
+    async def lag(self, group: str) -> Dict[int, Dict[str, int]]:
+        result = {}
+        for partition in range(self.partitions):
+            await self._ensure_group(group, partition)
+            info = {"lag": 0, "pending": 0}
+            for entry in await self.client.xinfo_groups(self._key(partition)):
+                name = entry["name"]
+                if (name.decode("utf-8") if isinstance(name, bytes) else name) == group:
+                    info = {"lag": entry.get("lag") or 0, "pending": entry["pending"]}
+            result[partition] = info
+        return result
+
+
+def create_event_log():
+    """
+    Event log configured by EVENT_LOG_BACKEND, or None when disabled
+    """
+    if settings.EVENT_LOG_BACKEND == "redis":
+        return RedisEventLog.from_url(
+            settings.REDIS_URL,
+            settings.EVENT_LOG_PARTITIONS,
+            settings.EVENT_LOG_MAX_LEN
+        )
+    if settings.EVENT_LOG_BACKEND == "file":
+        if settings.WORKERS > 1:
+            raise RuntimeError(
+                "EVENT_LOG_BACKEND=file only supports WORKERS=1; use the redis backend"
+            )
+        return FileEventLog(settings.EVENT_LOG_DIR, settings.EVENT_LOG_PARTITIONS)
+    return None
+
+
+class EventLogConsumer:
+    """
+    Consumes a set of partitions for one consumer group
+
+    Every partition has a single owner, so its entries are handled in
+    order. An explicit ``partitions`` list is a static assignment trusted
+    not to overlap with other consumers'. Otherwise the consumer competes
+    for every partition through a per-partition lock from the log and
+    consumes only the ones it holds; a dead owner's partitions are taken
+    over once its lock lapses.
+
+    Each round first reclaims entries left pending (by a crashed
+    consumer or a failed handler) for longer than ``claim_idle_seconds``,
+    then reads new ones. Entries are acknowledged only after the handler
+    succeeds; on a failure the rest of that partition's batch stays
+    pending, and no new entries are read from the partition until
+    everything pending there is acknowledged, so events for a session
+    are never handled out of order. ``claim_idle_seconds`` is thus also
+    the retry delay. An entry delivered more than ``max_deliveries``
+    times is moved to the log's dead-letter stream instead.
+    """
+
+    def __init__(
+        self,
+        log,
+        handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+        group: Optional[str] = None,
+        consumer: Optional[str] = None,
+        partitions: Optional[List[int]] = None,
+        batch_size: int = 100,
+        claim_idle_seconds: Optional[float] = None,
+        poll_interval: float = 0.5,
+        max_deliveries: Optional[int] = None
+    ):
+        self.log = log
+        self.handler = handler
+        self.group = group or settings.EVENT_LOG_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.partitions = partitions if partitions is not None else []
+        self._locks = (
+            None if partitions is not None
+            else {p: log.partition_lock(self.group, p) for p in range(log.partitions)}
+        )
+        self.batch_size = batch_size
+        self.claim_idle_seconds = (
+            settings.EVENT_LOG_CLAIM_IDLE_SECONDS if claim_idle_seconds is None else claim_idle_seconds
+        )
+        self.poll_interval = poll_interval
+        self.max_deliveries = max_deliveries or settings.EVENT_LOG_MAX_DELIVERIES
+        self.processed = 0
+        self.failed = 0
+        self.replayed = 0
+        self.dead_lettered = 0
+        # Partitions whose oldest pending entry failed; retried one at a time
+        self._retrying = set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        log.on_append = self._wakeup.set
+
+    def start(self):
+        """
+        Start consuming in the background
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the consumer and give up its partitions; unacknowledged entries stay pending
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._locks is not None:
+            for lock in self._locks.values():
+                await lock.release()
+            self.partitions = []
+
+    async def _claim_partitions(self):
+        """
+        Take (or renew) the locks of free partitions and drop lost ones
+        """
+        owned = []
+        for partition, lock in self._locks.items():
+            try:
+                if await lock.acquire():
+                    owned.append(partition)
+            except Exception as e:
+                logger.error(f"Event log partition {partition} lock failed: {e}")
+        if owned != self.partitions:
+            logger.info(f"Event log consumer {self.consumer} owns partitions {owned}")
+            self.partitions = owned
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            handled = 0
+            try:
+                handled = await self.consume_once()
+            except Exception as e:
+                logger.error(f"Event log consumer failed: {e}")
+            if handled:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def consume_once(self) -> int:
+        """
+        One pass over the owned partitions; returns entries handled
+        """
+        if self._locks is not None:
+            await self._claim_partitions()
+        handled = 0
+        for partition in self.partitions:
+            while True:
+                # While the head fails, claim only it: entries behind it are
+                # not attempted, so their delivery counts should not grow
+                retrying = partition in self._retrying
+                replay = await self.log.claim_pending(
+                    self.group, self.consumer, partition, self.claim_idle_seconds,
+                    1 if retrying else self.batch_size
+                )
+                self.replayed += len(replay)
+                handled += await self._handle(partition, replay)
+                if not (retrying and replay and partition not in self._retrying):
+                    break
+            # Older entries still pending here must go first
+            if await self.log.pending_count(self.group, partition):
+                continue
+            fresh = await self.log.read(self.group, self.consumer, partition, self.batch_size)
+            handled += await self._handle(
+                partition, [(message_id, event, 1) for message_id, event in fresh]
+            )
+        return handled
+
+    async def _handle(self, partition: int, deliveries: List[Delivery]) -> int:
+        """
+        Handle entries in order up to the first failure; returns entries acked
+        """
+        done = []
+        for message_id, event, delivered in deliveries:
+            if delivered > self.max_deliveries:
+                await self.log.dead_letter(self.group, partition, message_id, event)
+                self.dead_lettered += 1
+                self._retrying.discard(partition)
+                logger.error(
+                    f"Event {message_id} on partition {partition} dead-lettered "
+                    f"after {delivered - 1} deliveries"
+                )
+                continue
+            try:
+                await self.handler(event)
+            except Exception as e:
+                self.failed += 1
+                self._retrying.add(partition)
+                logger.error(f"Event {message_id} on partition {partition} failed: {e}")
+                break
+            self._retrying.discard(partition)
+            done.append(message_id)
+        await self.log.ack(self.group, partition, done)
+        self.processed += len(done)
+        return len(done)
+
+    async def stats(self) -> Dict[str, Any]:
+        lag = await self.log.lag(self.group)
+        return {
+            "group": self.group,
+            "consumer": self.consumer,
+            "partitions": self.partitions,
+            "processed": self.processed,
+            "failed": self.failed,
+            "replayed": self.replayed,
+            "dead_lettered": self.dead_lettered,
+            "total_lag": sum(p["lag"] for p in lag.values()),
+            "total_pending": sum(p["pending"] for p in lag.values()),
+            "lag": lag
+        }
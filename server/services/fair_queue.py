@@ -0,0 +1,184 @@
+"""
+Fair Queue - Weighted fair sharing of analysis slots across tenants
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TenantQueue:
+    """Waiting jobs and counters for one tenant (a child or account)"""
+
+    __slots__ = ("name", "weight", "waiting", "running", "completed", "finish_tag", "waits")
+
+    def __init__(self, name: str, weight: float, window: int):
+        self.name = name
+        self.weight = weight
+        # (start tag, finish tag, enqueued at, grant future), FIFO
+        self.waiting: Deque[Tuple[float, float, float, asyncio.Future]] = deque()
+        self.running = 0
+        self.completed = 0
+        # Virtual finish time of the tenant's last queued job
+        self.finish_tag = 0.0
+        self.waits: deque = deque(maxlen=window)
+
+
+class FairScheduler:
+    """
+    Start-time fair queuing of job slots across tenants
+
+    Each job gets a virtual start tag: the later of the scheduler's
+    virtual time and the finish tag of the tenant's previous job. Its
+    finish tag adds ``cost / weight``. A free slot goes to the queued
+    job with the smallest start tag whose tenant is under its
+    concurrency cap, and virtual time advances to that tag. A tenant
+    with a long backlog pushes only its own tags forward, so a tenant
+    that arrives with one job starts at current virtual time and waits
+    behind at most one job per running slot, whatever the heavy tenant
+    has queued. Cost is in whatever unit the caller measures work in
+    (megabytes of video here), so long uploads count for more than
+    short ones.
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        tenant_concurrency: Optional[int] = None,
+        weights: Optional[Dict[str, float]] = None,
+        window: int = 200,
+        clock=time.monotonic
+    ):
+        self.concurrency = concurrency or settings.VIDEO_JOBS_CONCURRENCY
+        self.tenant_concurrency = tenant_concurrency or settings.VIDEO_JOBS_TENANT_CONCURRENCY
+        self.weights = settings.VIDEO_JOBS_TENANT_WEIGHTS if weights is None else weights
+        self.window = window
+        self._clock = clock
+        self._tenants: Dict[str, TenantQueue] = {}
+        self.virtual_time = 0.0
+        self.running = 0
+        self.completed = 0
+        # Completion times, for the drain rate behind admission Retry-After hints
+        self._completions: deque = deque(maxlen=window)
+
+    def _tenant(self, name: str) -> TenantQueue:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            weight = self.weights.get(name, 1.0)
+            tenant = self._tenants[name] = TenantQueue(name, weight, self.window)
+        return tenant
+
+    def _evict_idle(self, tenant: TenantQueue):
+        # Idle tenants are forgotten so one-off tenant names do not pile up;
+        # a returning tenant starts at virtual time, which its old finish
+        # tag could not have been far ahead of once all its jobs ran
+        if not tenant.waiting and tenant.running == 0:
+            self._tenants.pop(tenant.name, None)
+
+    def depth(self) -> int:
+        return sum(len(t.waiting) for t in self._tenants.values())
+
+    def _dispatch(self):
+        while self.running < self.concurrency:
+            tenant = min(
+                (t for t in self._tenants.values() if t.waiting and t.running < self.tenant_concurrency),
+                key=lambda t: t.waiting[0][0],
+                default=None
+            )
+            if tenant is None:
+                return
+            start_tag, _, enqueued_at, grant = tenant.waiting.popleft()
+            self.virtual_time = max(self.virtual_time, start_tag)
+            tenant.running += 1
+            self.running += 1
+            tenant.waits.append(self._clock() - enqueued_at)
+            grant.set_result(None)
+
+    def _release(self, tenant: TenantQueue, completed: bool):
+        tenant.running -= 1
+        self.running -= 1
+        if completed:
+            tenant.completed += 1
+            self.completed += 1
+            self._completions.append(self._clock())
+        self._evict_idle(tenant)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tenant_name: str, cost: float = 1.0) -> AsyncIterator[None]:
+        """
+        Wait for this tenant's fair turn, then hold one slot for the block
+        """
+        tenant = self._tenant(tenant_name)
+        start_tag = max(self.virtual_time, tenant.finish_tag)
+        tenant.finish_tag = start_tag + max(cost, 1e-9) / tenant.weight
+        grant = asyncio.get_running_loop().create_future()
+        entry = (start_tag, tenant.finish_tag, self._clock(), grant)
+        tenant.waiting.append(entry)
+        self._dispatch()
+        try:
+            await grant
+        except asyncio.CancelledError:
+            if grant.done() and not grant.cancelled():
+                # Granted just as the caller gave up; hand the slot on
+                self._release(tenant, completed=False)
+            else:
+                tenant.waiting.remove(entry)
+                self._evict_idle(tenant)
+            raise
+        try:
+            yield
+        finally:
+            self._release(tenant, completed=True)
+
+    def drain_rate(self, window_seconds: float = 60.0) -> float:
+        """
+        Jobs completed per second over the last ``window_seconds``
+        """
+        now = self._clock()
+        recent = [t for t in self._completions if t >= now - window_seconds]
+        if not recent:
+            return 0.0
+        # Young servers have not been up for a whole window yet
+        return len(recent) / max(now - recent[0], min(window_seconds, 1.0))
+
+    @staticmethod
+    def _p95(values) -> Optional[float]:
+        if not values:
+            return None
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)], 3)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Per-tenant queue depth, running jobs and wait times
+
+        Only tenants with queued or running jobs are listed.
+        """
+        return {
+            "concurrency": self.concurrency,
+            "tenant_concurrency": self.tenant_concurrency,
+            "running": self.running,
+            "queued": self.depth(),
+            "completed": self.completed,
+            "drain_rate": round(self.drain_rate(), 3),
+            "tenants": {
+                t.name: {
+                    "weight": t.weight,
+                    "queued": len(t.waiting),
+                    "running": t.running,
+                    "completed": t.completed,
+                    "wait_p95_seconds": self._p95(t.waits),
+                    "wait_max_seconds": round(max(t.waits), 3) if t.waits else None
+                }
+                for t in self._tenants.values()
+            }
+        }
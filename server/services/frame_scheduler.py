@@ -0,0 +1,229 @@
+"""
+Frame Scheduler - Deadline-aware ordering of live frames and report segments
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.config import settings
+from services.quality_control import TIERS
+
+logger = logging.getLogger(__name__)
+
+# Work item kinds, in priority order
+LIVE = "live"
+SEGMENT = "segment"
+
+# Why a live frame was not analyzed
+SUPERSEDED = "superseded"
+STALE = "stale"
+
+
+class WorkItem:
+    """One frame waiting for analysis, with its capture time and deadline"""
+
+    __slots__ = ("kind", "session_id", "frame", "captured_at", "deadline", "sequence", "future")
+
+    def __init__(
+        self,
+        kind: str,
+        session_id: Optional[str],
+        frame,
+        captured_at: float,
+        deadline: Optional[float],
+        sequence: int,
+        future: asyncio.Future
+    ):
+        self.kind = kind
+        self.session_id = session_id
+        self.frame = frame
+        self.captured_at = captured_at
+        # None for segments: report frames are never dropped
+        self.deadline = deadline
+        self.sequence = sequence
+        self.future = future
+
+
+class FrameScheduler:
+    """
+    Feeds analysis workers live frames first, latest-first per session
+
+    Each session keeps at most one pending live frame: a newer frame
+    supersedes the queued one, whose caller gets a ``dropped`` result
+    straight away, so a session that sends faster than it can be
+    analyzed never builds a backlog. Across sessions the frame with the
+    earliest deadline (capture time plus ``staleness_seconds``) runs
+    next, and a frame whose deadline passed while it waited is dropped
+    as stale rather than analyzed. That bounds alert latency at the
+    staleness budget plus one analysis, however overloaded the server is.
+
+    Segment frames (uploaded video analyzed for reports) are never
+    dropped. They queue FIFO and run, at full quality, only when no live
+    frame is waiting.
+    """
+
+    def __init__(
+        self,
+        analyze: Callable[[Any, Optional[str], Any], Awaitable[Dict[str, Any]]],
+        workers: Optional[int] = None,
+        staleness_seconds: Optional[float] = None,
+        window: int = 200,
+        clock=time.monotonic
+    ):
+        self.analyze = analyze
+        self.workers = workers or settings.FRAME_SCHEDULER_WORKERS
+        self.staleness_seconds = staleness_seconds or settings.FRAME_STALENESS_SECONDS
+        self._clock = clock
+        self._sequence = itertools.count()
+        # session_id -> its one pending live frame
+        self._live: Dict[Optional[str], WorkItem] = {}
+        # (deadline, sequence, item); entries for superseded items are skipped on pop
+        self._deadlines: List[Tuple[float, int, WorkItem]] = []
+        self._segments: Deque[WorkItem] = deque()
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._ages: deque = deque(maxlen=window)
+        self.counts = {"submitted": 0, "processed": 0, SUPERSEDED: 0, STALE: 0, "segments": 0, "failed": 0}
+
+    def backlog(self) -> int:
+        return len(self._live) + len(self._segments)
+
+    def start(self):
+        """
+        Start the analysis workers (also done by the first submission)
+        """
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        """
+        Stop the workers and drop whatever is still queued
+        """
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for item in list(self._live.values()) + list(self._segments):
+            if not item.future.done():
+                item.future.cancel()
+        self._live.clear()
+        self._deadlines.clear()
+        self._segments.clear()
+
+    # ---------- submission ----------
+
+    def _item(self, kind: str, session_id: Optional[str], frame, age_seconds: float) -> WorkItem:
+        captured_at = self._clock() - max(0.0, age_seconds)
+        deadline = captured_at + self.staleness_seconds if kind == LIVE else None
+        future = asyncio.get_running_loop().create_future()
+        if len(self._tasks) < self.workers:
+            self.start()
+        self.counts["submitted"] += 1
+        return WorkItem(kind, session_id, frame, captured_at, deadline, next(self._sequence), future)
+
+    def _dropped(self, item: WorkItem, reason: str):
+        self.counts[reason] += 1
+        if not item.future.done():
+            item.future.set_result({
+                "session_id": item.session_id,
+                "dropped": True,
+                "reason": reason,
+                "age_seconds": round(self._clock() - item.captured_at, 3)
+            })
+
+    def submit_live(self, session_id: str, frame, age_seconds: float = 0.0) -> asyncio.Future:
+        """
+        Queue a live frame ``age_seconds`` old; supersedes the session's pending one
+        """
+        if session_id is None:
+            raise ValueError("live frames need a session_id")
+        item = self._item(LIVE, session_id, frame, age_seconds)
+        previous = self._live.get(session_id)
+        if previous is not None:
+            self._dropped(previous, SUPERSEDED)
+        self._live[session_id] = item
+        heapq.heappush(self._deadlines, (item.deadline, item.sequence, item))
+        self._wakeup.set()
+        return item.future
+
+    def submit_segment(self, session_id: Optional[str], frame, age_seconds: float = 0.0) -> asyncio.Future:
+        """
+        Queue a report frame for full-quality analysis when live work allows
+        """
+        item = self._item(SEGMENT, session_id, frame, age_seconds)
+        self._segments.append(item)
+        self._wakeup.set()
+        return item.future
+
+    # ---------- workers ----------
+
+    def _next(self) -> Optional[WorkItem]:
+        while self._deadlines:
+            deadline, _, item = heapq.heappop(self._deadlines)
+            if self._live.get(item.session_id) is not item:
+                continue
+            del self._live[item.session_id]
+            if self._clock() > deadline:
+                self._dropped(item, STALE)
+                continue
+            return item
+        if self._segments:
+            return self._segments.popleft()
+        return None
+
+    async def _worker(self):
+        while True:
+            item = self._next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._process(item)
+
+    async def _process(self, item: WorkItem):
+        # Live frames follow the load-adaptive tier; report frames always run at full quality
+        tier = TIERS[0] if item.kind == SEGMENT else None
+        try:
+            result = await self.analyze(item.frame, item.session_id, tier)
+        except Exception as e:
+            self.counts["failed"] += 1
+            logger.error(f"Frame analysis failed for {item.session_id}: {e}")
+            if not item.future.done():
+                item.future.set_exception(e)
+            return
+        age = self._clock() - item.captured_at
+        if item.kind == LIVE:
+            self.counts["processed"] += 1
+            self._ages.append(age)
+        else:
+            self.counts["segments"] += 1
+        result["age_seconds"] = round(age, 3)
+        if not item.future.done():
+            item.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depths, drop counts and how old live frames were when analyzed
+        """
+        ages = sorted(self._ages)
+        p95 = ages[min(len(ages) - 1, math.ceil(0.95 * len(ages)) - 1)] if ages else None
+        return {
+            "workers": len(self._tasks),
+            "staleness_seconds": self.staleness_seconds,
+            "live_backlog": len(self._live),
+            "segment_backlog": len(self._segments),
+            "live_age_p95_seconds": round(p95, 3) if p95 is not None else None,
+            "live_age_max_seconds": round(ages[-1], 3) if ages else None,
+            **self.counts
+        }
@@ -3,16 +3,24 @@ GPU Detection and Management Service
 Detects and manages NVIDIA GPU resources
 """
 
-import torch
 import platform
 import logging
-from typing import Dict, Any, Optional
+from typing import TYPE_CHECKING, Dict, Any, Optional
+
+if TYPE_CHECKING:
+    import torch
 
 logger = logging.getLogger(__name__)
 
 
 class GPUDetector:
-    """GPU detection and management utility"""
+    """
+    GPU detection and management utility
+
+    torch is imported inside each method rather than at module level, so
+    processes that never touch a model (metadata and alert workers) do
+    not pay for it at start-up.
+    """
     
     @staticmethod
     def check_gpu() -> Dict[str, Any]:
@@ -21,6 +29,7 @@ class GPUDetector:
         
         Returns:
             dict: GPU information including availability, name, memory, etc.
+                of the first GPU, and the same per GPU under ``devices``
         """
         result = {
             "available": False,
@@ -32,8 +41,10 @@ class GPUDetector:
             "device_count": 0,
             "driver_version": None,
             "cuda_version": None,
-            "platform": platform.system()
+            "platform": platform.system(),
+            "devices": []
         }
+        import torch
         
         # Check CUDA availability
         if torch.cuda.is_available():
@@ -42,24 +53,36 @@ class GPUDetector:
             result["device_count"] = torch.cuda.device_count()
             result["cuda_version"] = torch.version.cuda
             
-            # Get GPU details
-            if result["device_count"] > 0:
-                gpu = torch.cuda.get_device_properties(0)
-                result["name"] = gpu.name
-                result["memory_total"] = round(gpu.total_memory / 1024**3, 2)  # GB
-                result["memory_free"] = round(torch.cuda.mem_get_info()[0] / 1024**3, 2)
-                result["memory_used"] = round(torch.cuda.mem_get_info()[1] / 1024**3, 2)
-                result["driver_version"] = torch.cuda.get_device_capability(0)
-                
-                logger.info(f"GPU detected: {result['name']}")
-                logger.info(f"Memory: {result['memory_free']}GB free / {result['memory_total']}GB total")
+            # Get details of every GPU
+            for index in range(result["device_count"]):
+                gpu = torch.cuda.get_device_properties(index)
+                free, total = torch.cuda.mem_get_info(index)
+                result["devices"].append({
+                    "index": index,
+                    "name": gpu.name,
+                    "memory_total": round(gpu.total_memory / 1024**3, 2),  # GB
+                    "memory_free": round(free / 1024**3, 2),
+                    "memory_used": round((total - free) / 1024**3, 2),
+                    "capability": torch.cuda.get_device_capability(index)
+                })
+                logger.debug(f"GPU {index} detected: {gpu.name}")
+            
+            # Top-level fields describe the first GPU
+            if result["devices"]:
+                first = result["devices"][0]
+                result["name"] = first["name"]
+                result["memory_total"] = first["memory_total"]
+                result["memory_free"] = first["memory_free"]
+                result["memory_used"] = first["memory_used"]
+                result["driver_version"] = first["capability"]
+                logger.debug(f"Memory: {result['memory_free']}GB free / {result['memory_total']}GB total")
         else:
-            logger.warning("No GPU detected - running on CPU")
+            logger.debug("No GPU detected - running on CPU")
             
         return result
     
     @staticmethod
-    def get_device(device_id: int = 0) -> torch.device:
+    def get_device(device_id: int = 0) -> "torch.device":
         """
         Get torch device
         
@@ -69,23 +92,45 @@ class GPUDetector:
         Returns:
             torch.device: CPU or CUDA device
         """
+        import torch
         if torch.cuda.is_available():
             return torch.device(f"cuda:{device_id}")
         return torch.device("cpu")
     
     @staticmethod
-    def optimize_for_inference(model):
+    def optimize_for_inference(
+        model,
+        example_input=None,
+        cache_key: Optional[str] = None,
+        artifacts=None,
+        device_id: Optional[int] = None
+    ):
         """
         Optimize model for inference using TensorRT (if available)
         
+        On CPU, threads are tuned and the fastest of eager, channels_last,
+        dynamic int8, TorchScript and ONNX Runtime is picked by benchmarking
+        on ``example_input`` (the choice is cached per ``cache_key``).
+        Compiled kernels and exports are kept in the model artifact cache,
+        so warm workers skip recompiling.
+        
         Args:
             model: PyTorch model
+            example_input: Representative input tensor for CPU benchmarking
+            cache_key: Name under which the CPU decision is cached
+            artifacts: ModelArtifactCache (defaults to MODEL_ARTIFACT_DIR)
+            device_id: GPU to load the model onto (default: the current one)
             
         Returns:
             Optimized model
         """
+        import torch
+        from services.model_cache import model_artifacts
+        artifacts = artifacts or model_artifacts
         if torch.cuda.is_available():
-                   # Use torch.compile for optimization (PyTorch 2.0+)
+            # Reuse kernels compiled by earlier starts or the image build
+            artifacts.enable_compile_cache()
+            # Use torch.compile for optimization (PyTorch 2.0+)
             try:
                 model = torch.compile(model, mode="reduce-overhead")
                 logger.info("Model optimized with torch.compile")
@@ -93,16 +138,20 @@ class GPUDetector:
                 logger.warning(f"torch.compile not available: {e}")
                 
             # Move to GPU
-            model = model.to(torch.cuda.current_device())
-            logger.info("Model moved to GPU")
+            if device_id is None:
+                device_id = torch.cuda.current_device()
+            model = model.to(GPUDetector.get_device(device_id))
+            logger.info(f"Model moved to GPU {device_id}")
         else:
-            logger.warning("No GPU available - running on CPU")
+            from services.cpu_inference import cpu_inference
+            model = cpu_inference.optimize(model, example_input, cache_key, artifacts)
             
         return model
     
     @staticmethod
     def clear_cache():
         """Clear GPU cache"""
+        import torch
         if torch.cuda.is_available():
             torch.cuda.empty_cache()
             logger.info("GPU cache cleared")
@@ -0,0 +1,351 @@
+"""
+Ingest Shards - Session-affine ingestion across worker processes
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from models.schemas import AlertConfig
+from services.shard_ring import HashRing
+
+logger = logging.getLogger(__name__)
+
+# Recent activities kept per session by a shard worker
+HISTORY_SIZE = 100
+
+
+class _ShardWorker:
+    """
+    Owns the alert state and activity history of the sessions on one shard
+
+    Runs in its own process; every event for a session is handled here
+    in arrival order, so nothing on the hot path needs a lock.
+    """
+
+    def __init__(self, worker_id: str, outbox_path: Optional[str]):
+        # Imported here so the coordinator process does not build these
+        from services.alert_service import AlertService
+        from services.notification_outbox import NotificationOutbox
+
+        self.worker_id = worker_id
+        self.alert_service = AlertService(NotificationOutbox(outbox_path or settings.OUTBOX_PATH))
+        self.histories: Dict[str, deque] = {}
+        self.ring = HashRing(vnodes=settings.INGEST_SHARD_VNODES)
+
+    async def handle(self, kind: str, body: Any) -> Any:
+        if kind == "event":
+            history = self.histories.get(body["session_id"])
+            if history is None:
+                history = self.histories[body["session_id"]] = deque(maxlen=HISTORY_SIZE)
+            history.append((body["activity"], body.get("confidence")))
+            alerts = await self.alert_service.check_and_trigger(
+                body["session_id"],
+                body["child_id"],
+                body["activity"],
+                body["duration_seconds"]
+            )
+            return {"alerts_triggered": alerts, "worker": self.worker_id}
+        if kind == "config":
+            await self.alert_service.update_config(AlertConfig.model_validate_json(body))
+            return True
+        if kind == "status":
+            status = await self.alert_service.get_status(body)
+            history = self.histories.get(body)
+            status["history"] = [a for a, _ in history] if history else []
+            return status
+        if kind == "rebalance":
+            return self.rebalance(body)
+        if kind == "import":
+            for session_id, (state, history) in body.items():
+                if state is not None:
+                    self.alert_service.import_session(session_id, state)
+                if history:
+                    self.histories[session_id] = deque(history, maxlen=HISTORY_SIZE)
+            return len(body)
+        if kind == "stats":
+            return {
+                "worker": self.worker_id,
+                "sessions": self.alert_service.get_session_stats(),
+                "histories": len(self.histories)
+            }
+        raise ValueError(f"Unknown shard message: {kind}")
+
+    def rebalance(self, nodes: List[str]) -> Dict[str, Any]:
+        """
+        Adopt a new ring and hand back the sessions this shard no longer owns
+        """
+        self.ring = HashRing(nodes, vnodes=settings.INGEST_SHARD_VNODES)
+        session_ids = set(self.alert_service.session_states) | set(self.histories)
+        moved = {}
+        for session_id in session_ids:
+            if self.ring.owner(session_id) == self.worker_id:
+                continue
+            history = self.histories.pop(session_id, None)
+            moved[session_id] = (
+                self.alert_service.export_session(session_id),
+                list(history) if history else None
+            )
+        return moved
+
+
+def _worker_main(worker_id: str, inbox, replies, outbox_path: Optional[str]):
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(_serve(worker_id, inbox, replies, outbox_path))
+
+
+async def _serve(worker_id: str, inbox, replies, outbox_path: Optional[str]):
+    worker = _ShardWorker(worker_id, outbox_path)
+    worker.alert_service.start()
+    loop = asyncio.get_running_loop()
+    logger.info(f"Ingest shard {worker_id} ready")
+    try:
+        while True:
+            message = await loop.run_in_executor(None, inbox.get)
+            if message is None:
+                break
+            request_id, kind, body = message
+            try:
+                replies.put((request_id, True, await worker.handle(kind, body)))
+            except Exception as e:
+                logger.error(f"Shard {worker_id} failed on {kind}: {e}")
+                replies.put((request_id, False, str(e)))
+    finally:
+        await worker.alert_service.stop()
+
+
+class ShardCoordinator:
+    """
+    Routes each session to one worker process via a consistent-hash ring
+
+    Events are hashed on session_id, so a session's alert state and
+    history live in exactly one process. Adding or removing a worker
+    pauses routing, asks every shard to export the sessions it no longer
+    owns under the new ring, and imports them on their new owners before
+    traffic resumes. A worker that dies loses its sessions; they start
+    fresh on their new owner, and requests still waiting on it fail at
+    once. Session state held by shards is not covered by StateSnapshotter
+    (which only persists the API process's AlertService), so a restart
+    also starts every sharded session fresh.
+    """
+
+    def __init__(self, workers: Optional[int] = None, outbox_path: Optional[str] = None):
+        self.initial_workers = workers if workers is not None else settings.INGEST_SHARDS
+        self.outbox_path = outbox_path
+        self.ring = HashRing(vnodes=settings.INGEST_SHARD_VNODES)
+        self._ctx = multiprocessing.get_context("spawn")
+        self._replies = None
+        self._workers: Dict[str, Any] = {}
+        self._inboxes: Dict[str, Any] = {}
+        self._configs: Dict[str, str] = {}
+        self._ids = itertools.count()
+        self._worker_ids = itertools.count()
+        # request id -> (worker id, reply future)
+        self._pending: Dict[int, Tuple[str, asyncio.Future]] = {}
+        self._routing = asyncio.Event()
+        self._routing.set()
+        self._reshard_lock = asyncio.Lock()
+        self._reader: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.resharded_sessions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.initial_workers > 0
+
+    async def start(self):
+        """
+        Spawn the initial workers
+        """
+        self._loop = asyncio.get_running_loop()
+        self._replies = self._ctx.Queue()
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
+        for _ in range(self.initial_workers):
+            await self.add_worker()
+
+    async def stop(self):
+        """
+        Stop all workers
+        """
+        for worker_id in list(self._workers):
+            self._inboxes[worker_id].put(None)
+        for worker_id, process in list(self._workers.items()):
+            await asyncio.get_running_loop().run_in_executor(None, process.join, 10)
+            if process.is_alive():
+                process.terminate()
+        self._workers.clear()
+        self._inboxes.clear()
+        self.ring = HashRing(vnodes=settings.INGEST_SHARD_VNODES)
+        if self._reader is not None:
+            self._replies.put(None)
+            self._reader.join(timeout=5)
+            self._reader = None
+
+    def _read_replies(self):
+        while True:
+            reply = self._replies.get()
+            if reply is None:
+                return
+            self._loop.call_soon_threadsafe(self._resolve, *reply)
+
+    def _resolve(self, request_id: int, ok: bool, result: Any):
+        entry = self._pending.pop(request_id, None)
+        if entry is None or entry[1].done():
+            return
+        future = entry[1]
+        if ok:
+            future.set_result(result)
+        else:
+            future.set_exception(RuntimeError(result))
+
+    async def _call(self, worker_id: str, kind: str, body: Any, timeout: float = 30) -> Any:
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (worker_id, future)
+        self._inboxes[worker_id].put((request_id, kind, body))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _fail_pending(self, worker_id: str):
+        """
+        Fail every request waiting on a dead worker instead of letting it time out
+        """
+        for request_id, (target, future) in list(self._pending.items()):
+            if target == worker_id:
+                del self._pending[request_id]
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Ingest shard {worker_id} died"))
+
+    async def _owner(self, session_id: str) -> str:
+        await self._routing.wait()
+        worker_id = self.ring.owner(session_id)
+        if worker_id is None:
+            raise RuntimeError("No ingest shards running")
+        process = self._workers.get(worker_id)
+        if process is None or not process.is_alive():
+            # Concurrent callers may all see the death; remove_worker only acts once
+            await self.remove_worker(worker_id, graceful=False)
+            return await self._owner(session_id)
+        return worker_id
+
+    async def submit(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Process one metadata event on the shard owning its session
+        """
+        worker_id = await self._owner(event["session_id"])
+        return await self._call(worker_id, "event", event)
+
+    async def get_status(self, session_id: str) -> Dict[str, Any]:
+        return await self._call(await self._owner(session_id), "status", session_id)
+
+    async def update_config(self, config: AlertConfig):
+        """
+        Send a config to every shard (and to shards that join later)
+        """
+        data = config.model_dump_json()
+        self._configs[config.child_id] = data
+        await asyncio.gather(*[
+            self._call(worker_id, "config", data) for worker_id in list(self._workers)
+        ])
+
+    async def stats(self) -> Dict[str, Any]:
+        results = await asyncio.gather(*[
+            self._call(worker_id, "stats", None) for worker_id in list(self._workers)
+        ])
+        return {
+            "workers": self.ring.nodes,
+            "resharded_sessions": self.resharded_sessions,
+            "shards": results
+        }
+
+    async def add_worker(self) -> str:
+        """
+        Start a worker and move the sessions it now owns onto it
+        """
+        worker_id = f"shard-{next(self._worker_ids)}"
+        inbox = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, inbox, self._replies, self.outbox_path),
+            name=f"homework-guardian-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self._workers[worker_id] = process
+        self._inboxes[worker_id] = inbox
+        for data in self._configs.values():
+            await self._call(worker_id, "config", data, timeout=120)
+
+        async with self._reshard_lock:
+            ring = HashRing(self.ring.nodes + [worker_id], vnodes=settings.INGEST_SHARD_VNODES)
+            await self._reshard(ring, sources=self.ring.nodes)
+        logger.info(f"Ingest shard {worker_id} joined ({len(self.ring)} workers)")
+        return worker_id
+
+    async def remove_worker(self, worker_id: str, graceful: bool = True):
+        """
+        Stop a worker, handing its sessions to the remaining ones if it is alive
+        """
+        async with self._reshard_lock:
+            # Checked under the lock: a concurrent caller may have removed it already
+            process = self._workers.get(worker_id)
+            if process is None:
+                return
+            if not graceful:
+                logger.error(f"Ingest shard {worker_id} died; resharding")
+                self._fail_pending(worker_id)
+            ring = HashRing(
+                [n for n in self.ring.nodes if n != worker_id],
+                vnodes=settings.INGEST_SHARD_VNODES
+            )
+            await self._reshard(ring, sources=[worker_id] if graceful else [])
+            self._workers.pop(worker_id, None)
+            inbox = self._inboxes.pop(worker_id, None)
+        if process.is_alive() and inbox is not None:
+            inbox.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, process.join, 10)
+        logger.info(f"Ingest shard {worker_id} left ({len(self.ring)} workers)")
+
+    async def _reshard(self, ring: HashRing, sources: List[str]):
+        """
+        Move sessions onto ``ring`` and adopt it (hold ``_reshard_lock``)
+        """
+        self._routing.clear()
+        try:
+            # Let requests already routed under the old ring finish
+            while any(not f.done() for _, f in self._pending.values()):
+                await asyncio.sleep(0.01)
+
+            nodes = ring.nodes
+            exports = await asyncio.gather(*[
+                self._call(worker_id, "rebalance", nodes)
+                for worker_id in sources if worker_id in self._workers
+            ])
+            # Shards not asked to export still need the new ring
+            for worker_id in nodes:
+                if worker_id not in sources:
+                    await self._call(worker_id, "rebalance", nodes, timeout=120)
+
+            incoming: Dict[str, Dict[str, Any]] = {}
+            for moved in exports:
+                for session_id, data in moved.items():
+                    incoming.setdefault(ring.owner(session_id), {})[session_id] = data
+                    self.resharded_sessions += 1
+            await asyncio.gather(*[
+                self._call(worker_id, "import", sessions)
+                for worker_id, sessions in incoming.items()
+            ])
+            self.ring = ring
+        finally:
+            self._routing.set()
@@ -0,0 +1,177 @@
+"""
+Leader Lock - Elect one process to run singleton background jobs
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Try to import the asyncio Redis client
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+class LeadershipLost(Exception):
+    """Raised out of a ``leadership`` block whose lock could not be renewed"""
+
+
+class FileLeaderLock:
+    """
+    Exclusive ``flock`` on a file, for workers on one host
+
+    The kernel drops the lock when the holder exits, so a crashed
+    leader never blocks the others.
+    """
+
+    def __init__(self, name: str, directory: Optional[str] = None):
+        self.path = os.path.join(directory or settings.LEADER_LOCK_DIR, f"{name}.lock")
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    async def acquire(self) -> bool:
+        """
+        Take the lock if free (or already ours); never waits
+        """
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    async def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+class RedisLeaderLock:
+    """
+    ``SET NX PX`` lock in Redis, for workers on any node
+
+    The holder's random token is the value, so only the holder can
+    extend or delete it; a crashed leader's lock lapses after
+    ``ttl_seconds``.
+    """
+
+    RENEW_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    end
+    return 0
+    """
+
+    RELEASE_SCRIPT = """
+    if redis.call('GET', KEYS[1]) == ARGV[1] then
+        return redis.call('DEL', KEYS[1])
+    end
+    return 0
+    """
+
+    def __init__(self, client, name: str, ttl_seconds: Optional[float] = None):
+        self.client = client
+        self.key = f"leader:{name}"
+        self.ttl_seconds = ttl_seconds or settings.LEADER_LOCK_TTL_SECONDS
+        self.token = uuid.uuid4().hex
+        self.held = False
+        self._renew = client.register_script(self.RENEW_SCRIPT)
+        self._release = client.register_script(self.RELEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        """
+        Take the lock if free, or extend it if already ours
+        """
+        ttl_ms = int(self.ttl_seconds * 1000)
+        try:
+            if self.held and await self._renew(keys=[self.key], args=[self.token, ttl_ms]):
+                return True
+            self.held = bool(await self.client.set(self.key, self.token, nx=True, px=ttl_ms))
+        except Exception:
+            # Unreachable Redis: the lock may lapse, so stop acting as its holder
+            self.held = False
+            raise
+        return self.held
+
+    async def release(self):
+        if self.held:
+            await self._release(keys=[self.key], args=[self.token])
+            self.held = False
+
+
+def leader_lock(name: str):
+    """
+    The lock for a singleton job, matching the alert state backend
+    """
+    if settings.ALERT_STATE_BACKEND == "redis":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for the redis leader lock")
+        return RedisLeaderLock(aioredis.from_url(settings.REDIS_URL), name)
+    return FileLeaderLock(name)
+
+
+@asynccontextmanager
+async def leadership(lock) -> AsyncIterator[bool]:
+    """
+    Hold ``lock`` for the block, renewing it while the block runs
+
+    Yields False (and holds nothing) if another process is the leader.
+    If a renewal fails, another process may take over, so the task
+    running the block is cancelled and LeadershipLost raised from it.
+    """
+    if not await lock.acquire():
+        yield False
+        return
+
+    guarded = asyncio.current_task()
+    lost = False
+
+    async def renew():
+        nonlocal lost
+        while True:
+            await asyncio.sleep(getattr(lock, "ttl_seconds", 60.0) / 3)
+            try:
+                renewed = await lock.acquire()
+            except Exception as e:
+                logger.error(f"Leader lock renewal failed: {e}")
+                renewed = False
+            if not renewed:
+                logger.warning("Lost leader lock - stopping the singleton job")
+                lost = True
+                guarded.cancel()
+                return
+
+    renewer = asyncio.create_task(renew())
+    try:
+        yield True
+    except asyncio.CancelledError:
+        if lost:
+            guarded.uncancel()
+            raise LeadershipLost("leader lock lost while running a singleton job") from None
+        raise
+    finally:
+        renewer.cancel()
+        try:
+            await renewer
+        except asyncio.CancelledError:
+            pass
+        await lock.release()
@@ -0,0 +1,236 @@
+"""
+Model Artifact Cache - Compiled and exported models persisted across restarts
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import warnings
+import weakref
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def model_hash(model) -> str:
+    """
+    Content hash of a model's class, parameters and buffers
+
+    Two processes loading the same weights get the same hash, so they
+    share artifacts; retrained weights get a new one.
+    """
+    import torch
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{type(model).__module__}.{type(model).__qualname__}".encode("utf-8"))
+    for name, tensor in model.state_dict().items():
+        tensor = tensor.detach().cpu().contiguous()
+        digest.update(f"{name}:{tensor.dtype}:{tuple(tensor.shape)}".encode("utf-8"))
+        # Raw bytes, whatever the dtype (bfloat16 has no numpy equivalent)
+        digest.update(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+    return digest.hexdigest()
+
+
+class ModelArtifactCache:
+    """
+    On-disk artifacts under ``root``, one directory per model and device
+
+    Directory names combine the model hash, torch version and device
+    (``<hash>-torch<version>-<device>``), so an upgrade or a different
+    device type never loads a stale artifact. Artifacts are written to a
+    temporary file and renamed into place, so concurrent workers either
+    see a complete file or build their own. ``torch.compile`` kernels go
+    to a shared inductor cache directory under the same root.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or settings.MODEL_ARTIFACT_DIR
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._hashes: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _torch_version() -> str:
+        import torch
+        return torch.__version__.split("+")[0]
+
+    def key(self, model, device: str) -> str:
+        # Hashing walks every weight; do it once per model object
+        digest = self._hashes.get(model)
+        if digest is None:
+            digest = self._hashes[model] = model_hash(model)
+        device_type = str(device).split(":")[0]
+        return f"{digest}-torch{self._torch_version()}-{device_type}"
+
+    def enable_compile_cache(self) -> str:
+        """
+        Point TorchInductor's persistent caches at the artifact root
+
+        Must run before the first ``torch.compile``; warm starts then
+        reuse compiled kernels and FX graphs instead of recompiling.
+        """
+        directory = os.path.join(self.root, "inductor")
+        os.makedirs(directory, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", directory)
+        os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+        os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+        return os.environ["TORCHINDUCTOR_CACHE_DIR"]
+
+    def get_or_create(self, model, device: str, name: str, create: Callable[[str], None]) -> str:
+        """
+        Path of artifact ``name`` for this model, calling ``create(path)`` on a miss
+        """
+        directory = os.path.join(self.root, self.key(model, device))
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        self.misses += 1
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        started = time.perf_counter()
+        try:
+            create(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        with self._lock:
+            self._write_manifest(directory, name, model, time.perf_counter() - started)
+        logger.info(f"Cached model artifact {path}")
+        return path
+
+    def _write_manifest(self, directory: str, name: str, model, elapsed: float):
+        path = os.path.join(directory, "manifest.json")
+        manifest = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        manifest["model"] = f"{type(model).__module__}.{type(model).__qualname__}"
+        manifest.setdefault("artifacts", {})[name] = {
+            "created_at": time.time(),
+            "build_seconds": round(elapsed, 3),
+            "bytes": os.path.getsize(os.path.join(directory, name))
+        }
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def torchscript(self, model, example_input, device: str = "cpu"):
+        """
+        Traced, frozen TorchScript module, loaded from disk when cached
+        """
+        import torch
+
+        def export(path: str):
+            with torch.inference_mode():
+                traced = torch.jit.trace(model.eval(), example_input)
+            torch.jit.save(torch.jit.freeze(traced), path)
+
+        with warnings.catch_warnings():
+            # TorchScript is deprecated upstream but still the fastest load path here
+            warnings.simplefilter("ignore", FutureWarning)
+            path = self.get_or_create(model, device, "model.ts", export)
+            return torch.jit.optimize_for_inference(torch.jit.load(path, map_location=device))
+
+    def onnx(self, model, example_input, device: str = "cpu") -> str:
+        """
+        Path of an ONNX export with one ``input`` and one ``output``
+        """
+        import torch
+
+        def export(path: str):
+            torch.onnx.export(
+                model.eval(), (example_input,), path,
+                input_names=["input"], output_names=["output"]
+            )
+
+        return self.get_or_create(model, device, "model.onnx", export)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        Cached model directories and their manifests
+        """
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.root)):
+            manifest = os.path.join(self.root, name, "manifest.json")
+            if os.path.exists(manifest):
+                with open(manifest, "r", encoding="utf-8") as f:
+                    result.append({"key": name, **json.load(f)})
+        return result
+
+    def clear(self):
+        """
+        Remove every cached artifact
+        """
+        shutil.rmtree(self.root, ignore_errors=True)
+        self._hashes.clear()
+
+
+# Singleton instance
+model_artifacts = ModelArtifactCache()
+
+
+def _load_factory(spec: str):
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"Expected module:callable, got {spec}")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Pre-populate, list or clear the artifact cache (e.g. at image build time)
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m services.model_cache",
+        description="Manage the persistent compiled-model artifact cache"
+    )
+    parser.add_argument("--root", help=f"cache directory (default {settings.MODEL_ARTIFACT_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    warm = commands.add_parser("warm", help="build artifacts for a model")
+    warm.add_argument("model", help="module:callable returning the model, e.g. models.pose:build")
+    warm.add_argument("--shape", required=True, help="example input shape, e.g. 1,3,224,224")
+    warm.add_argument("--key", help="CPU decision cache key (default: model class)")
+    commands.add_parser("list", help="show cached artifacts")
+    commands.add_parser("clear", help="delete all cached artifacts")
+    args = parser.parse_args(argv)
+
+    cache = ModelArtifactCache(args.root) if args.root else model_artifacts
+    if args.command == "list":
+        print(json.dumps(cache.entries(), indent=2))
+        return 0
+    if args.command == "clear":
+        cache.clear()
+        return 0
+
+    import torch
+    from services.gpu_detector import GPUDetector
+
+    model = _load_factory(args.model)()
+    example = torch.randn(*[int(d) for d in args.shape.split(",")])
+    started = time.perf_counter()
+    optimized = GPUDetector.optimize_for_inference(model, example, args.key, artifacts=cache)
+    if torch.cuda.is_available():
+        example = example.to(torch.cuda.current_device())
+    with torch.inference_mode():
+        # torch.compile is lazy: the first call is what fills the inductor cache
+        optimized(example)
+    print(f"Warmed {args.model} in {time.perf_counter() - started:.1f}s into {cache.root}")
+    print(json.dumps(cache.entries(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(main())
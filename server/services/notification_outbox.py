@@ -0,0 +1,495 @@
+"""
+Notification Outbox - Durable queue for outbound emails
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Notification kinds understood by the dispatcher
+KIND_ALERT = "alert"
+KIND_ALERT_DIGEST = "alert_digest"
+KIND_DAILY_REPORT = "daily_report"
+
+STATUS_PENDING = "pending"
+STATUS_SENDING = "sending"
+STATUS_DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    coalesce_key TEXT,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+"""
+
+_COALESCE_INDEX = (
+    "CREATE INDEX IF NOT EXISTS outbox_coalesce ON outbox (coalesce_key, status)"
+)
+
+
+class NotificationOutbox:
+    """
+    SQLite-backed outbox
+
+    Producers only pay for a local insert; delivery happens later in
+    NotificationDispatcher. Delivered rows are deleted, rows that keep
+    failing are kept with status "dead" for inspection.
+
+    Alerts queued with a coalesce key are claimed together: when one of
+    them becomes due, every pending alert sharing the key is delivered
+    with it as a single digest.
+
+    Several processes may share one outbox file. Claimed rows carry a
+    lease (``claimed_by``/``claimed_at``); only rows whose lease has
+    expired, i.e. whose claimer presumably crashed mid-send, are handed
+    out again.
+    """
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: Optional[float] = None):
+        self.path = path or settings.OUTBOX_PATH
+        self.lease_seconds = lease_seconds or settings.OUTBOX_LEASE_SECONDS
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.on_enqueue: Optional[Callable[[], None]] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(outbox)")]
+            for column, kind in (("coalesce_key", "TEXT"), ("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+            conn.execute(_COALESCE_INDEX)
+            self._conn = conn
+        return self._conn
+
+    def enqueue(
+        self,
+        kind: str,
+        recipient: str,
+        payload: Dict[str, Any],
+        delay: float = 0,
+        coalesce_key: Optional[str] = None
+    ) -> int:
+        """
+        Durably queue a notification and return its id
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT INTO outbox "
+                "(kind, recipient, payload, status, next_attempt_at, created_at, coalesce_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    recipient,
+                    json.dumps(payload, ensure_ascii=False),
+                    STATUS_PENDING,
+                    now + delay,
+                    now,
+                    coalesce_key
+                )
+            )
+        if self.on_enqueue is not None and delay <= 0:
+            self.on_enqueue()
+        return cursor.lastrowid
+
+    def enqueue_many(self, kind: str, items: List[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Durably queue (recipient, payload) notifications in one transaction
+        """
+        if not items:
+            return 0
+        now = time.time()
+        rows = [
+            (kind, recipient, json.dumps(payload, ensure_ascii=False), STATUS_PENDING, now, now)
+            for recipient, payload in items
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT INTO outbox "
+                    "(kind, recipient, payload, status, next_attempt_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if self.on_enqueue is not None:
+            self.on_enqueue()
+        return len(rows)
+
+    def queue_alert(
+        self,
+        recipient: str,
+        alert_type: str,
+        child_name: str,
+        details: str,
+        locale: Optional[str] = None,
+        delay: float = 0,
+        coalesce_key: Optional[str] = None
+    ) -> int:
+        """
+        Queue an alert email
+        """
+        return self.enqueue(KIND_ALERT, recipient, {
+            "alert_type": alert_type,
+            "child_name": child_name,
+            "details": details,
+            "locale": locale
+        }, delay=delay, coalesce_key=coalesce_key)
+
+    def count_pending(self, coalesce_key: str) -> int:
+        """
+        Count pending notifications sharing a coalesce key
+        """
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COUNT(*) FROM outbox WHERE coalesce_key = ? AND status = ?",
+                (coalesce_key, STATUS_PENDING)
+            ).fetchone()
+        return row[0]
+
+    def expedite(self, coalesce_key: str):
+        """
+        Make every pending notification sharing a coalesce key due now
+        """
+        with self._lock:
+            self._connection().execute(
+                "UPDATE outbox SET next_attempt_at = MIN(next_attempt_at, ?) "
+                "WHERE coalesce_key = ? AND status = ?",
+                (time.time(), coalesce_key, STATUS_PENDING)
+            )
+        if self.on_enqueue is not None:
+            self.on_enqueue()
+
+    def queue_daily_report(self, recipient: str, child_name: str, report_data: Dict[str, Any]) -> int:
+        """
+        Queue a daily report email
+        """
+        return self.enqueue(KIND_DAILY_REPORT, recipient, {
+            "child_name": child_name,
+            "report_data": report_data
+        })
+
+    def queue_daily_reports(self, reports: List[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        Queue (recipient, child_name, report_data) daily report emails in bulk
+        """
+        return self.enqueue_many(KIND_DAILY_REPORT, [
+            (recipient, {"child_name": child_name, "report_data": report_data})
+            for recipient, child_name, report_data in reports
+        ])
+
+    def claim_due(self, limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Mark up to ``limit`` due notifications as sending and return them
+
+        Each returned item carries the ``ids`` of all rows it covers; a
+        coalesced group of alerts comes back as one alert_digest item.
+        """
+        now = time.time() if now is None else now
+        columns = "id, kind, recipient, payload, attempts, coalesce_key"
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Rows whose claimer let the lease run out (it crashed mid-send) go back to pending
+                conn.execute(
+                    "UPDATE outbox SET status = ?, claimed_by = NULL, claimed_at = NULL "
+                    "WHERE status = ? AND claimed_at < ?",
+                    (STATUS_PENDING, STATUS_SENDING, now - self.lease_seconds)
+                )
+                rows = conn.execute(
+                    f"SELECT {columns} FROM outbox "
+                    "WHERE status = ? AND next_attempt_at <= ? "
+                    "ORDER BY next_attempt_at LIMIT ?",
+                    (STATUS_PENDING, now, limit)
+                ).fetchall()
+
+                groups: Dict[Any, List[tuple]] = {}
+                for row in rows:
+                    key = row[5] if row[5] is not None else ("id", row[0])
+                    groups.setdefault(key, []).append(row)
+                for key, group in groups.items():
+                    if isinstance(key, str):
+                        # Pull in alerts still waiting out their coalescing window,
+                        # but leave failed ones to their retry backoff
+                        claimed = {row[0] for row in group}
+                        group.extend(
+                            row for row in conn.execute(
+                                f"SELECT {columns} FROM outbox "
+                                "WHERE coalesce_key = ? AND status = ? "
+                                "AND (attempts = 0 OR next_attempt_at <= ?) ORDER BY id",
+                                (key, STATUS_PENDING, now)
+                            ).fetchall()
+                            if row[0] not in claimed
+                        )
+
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [
+                        (STATUS_SENDING, self.owner, now, row[0])
+                        for group in groups.values() for row in group
+                    ]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return [self._to_item(group) for group in groups.values()]
+
+    @staticmethod
+    def _to_item(group: List[tuple]) -> Dict[str, Any]:
+        group.sort(key=lambda row: row[0])
+        item = {
+            "ids": [row[0] for row in group],
+            "kind": group[0][1],
+            "recipient": group[0][2],
+            "attempts": max(row[4] for row in group)
+        }
+        if len(group) == 1:
+            item["payload"] = json.loads(group[0][3])
+        else:
+            item["kind"] = KIND_ALERT_DIGEST
+            item["payload"] = {"alerts": [json.loads(row[3]) for row in group]}
+        return item
+
+    def mark_sent(self, item_ids: List[int]):
+        with self._lock:
+            self._connection().executemany(
+                "DELETE FROM outbox WHERE id = ?", [(item_id,) for item_id in item_ids]
+            )
+
+    def mark_failed(self, item_ids: List[int], attempts: int, error: str, retry_at: Optional[float]):
+        """
+        Record a failed attempt; ``retry_at`` of None dead-letters the rows
+        """
+        status = STATUS_DEAD if retry_at is None else STATUS_PENDING
+        with self._lock:
+            self._connection().executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, next_attempt_at = ?, "
+                "claimed_by = NULL, claimed_at = NULL WHERE id = ?",
+                [
+                    (status, attempts, error, retry_at or time.time(), item_id)
+                    for item_id in item_ids
+                ]
+            )
+
+    def next_due_at(self) -> Optional[float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?",
+                (STATUS_PENDING,)
+            ).fetchone()
+        return row[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Count notifications by status
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status"
+            ).fetchall()
+        counts = {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_DEAD: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class NotificationDispatcher:
+    """
+    Background sender draining the outbox
+
+    Failed sends (exceptions or a False result from EmailService) are
+    retried with exponential backoff and jitter; after ``max_attempts``
+    the notification is dead-lettered.
+
+    The enqueue wakeup only fires within this process. Notifications
+    queued by other processes sharing the outbox file (shard workers,
+    other uvicorn workers) are picked up on the next poll, so they wait
+    at most ``poll_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        outbox: NotificationOutbox,
+        email_service,
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        poll_interval: float = 5.0
+    ):
+        self.outbox = outbox
+        self.email_service = email_service
+        self.concurrency = concurrency or settings.OUTBOX_CONCURRENCY
+        self.max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        self.base_delay = base_delay or settings.OUTBOX_BASE_DELAY_SECONDS
+        self.max_delay = max_delay or settings.OUTBOX_MAX_DELAY_SECONDS
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        outbox.on_enqueue = self._notify
+
+    def _notify(self):
+        # Bulk enqueues run in worker threads; wake the loop safely from there
+        if self._loop is None:
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._wakeup.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def start(self):
+        """
+        Start draining the outbox in the background
+        """
+        if self._task is None or self._task.done():
+            self._loop = asyncio.get_running_loop()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background sender
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def drain_once(self) -> int:
+        """
+        Deliver everything currently due and return how many were attempted
+        """
+        attempted = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(item: Dict[str, Any]):
+            async with semaphore:
+                await self._deliver(item)
+
+        while True:
+            items = await asyncio.to_thread(self.outbox.claim_due, self.concurrency * 4)
+            if not items:
+                return attempted
+            attempted += len(items)
+            await asyncio.gather(*[deliver(item) for item in items])
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+
+            timeout = self.poll_interval
+            next_due = await asyncio.to_thread(self.outbox.next_due_at)
+            if next_due is not None:
+                timeout = min(timeout, max(0.0, next_due - time.time()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _deliver(self, item: Dict[str, Any]):
+        error = None
+        try:
+            sent = await self._send(item)
+            if not sent:
+                error = "send returned False"
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+
+        if error is None:
+            await asyncio.to_thread(self.outbox.mark_sent, item["ids"])
+            return
+
+        attempts = item["attempts"] + 1
+        if attempts >= self.max_attempts:
+            logger.error(
+                f"Notification {item['ids']} dead-lettered after {attempts} attempts: {error}"
+            )
+            retry_at = None
+        else:
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            retry_at = time.time() + delay * random.uniform(0.5, 1.0)
+            logger.warning(f"Notification {item['ids']} failed (attempt {attempts}): {error}")
+        await asyncio.to_thread(self.outbox.mark_failed, item["ids"], attempts, error, retry_at)
+
+    async def _send(self, item: Dict[str, Any]) -> bool:
+        payload = item["payload"]
+        if item["kind"] == KIND_ALERT:
+            return await self.email_service.send_alert(
+                item["recipient"],
+                payload["alert_type"],
+                payload["child_name"],
+                payload["details"],
+                locale=payload.get("locale")
+            )
+        if item["kind"] == KIND_ALERT_DIGEST:
+            return await self.email_service.send_alert_digest(
+                item["recipient"],
+                payload["alerts"],
+                locale=payload["alerts"][0].get("locale")
+            )
+        if item["kind"] == KIND_DAILY_REPORT:
+            return await self.email_service.send_daily_report(
+                item["recipient"],
+                payload["child_name"],
+                payload["report_data"]
+            )
+        raise ValueError(f"Unknown notification kind: {item['kind']}")
+
+
+# Singleton
+notification_outbox = NotificationOutbox()
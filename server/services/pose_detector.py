@@ -3,43 +3,65 @@ MediaPipe Integration Service
 Based on tonyliugd/monitoringStudy reference
 """
 
-import cv2
 import numpy as np
-from typing import Dict, Any, Tuple, Optional
+import queue
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Iterator, List, Tuple, Optional
 import logging
 
-logger = logging.getLogger(__name__)
+from core.config import settings
+from core.imports import optional_import
+from services.quality_control import TIERS, QualityTier
 
-# Try to import MediaPipe
-try:
-    import mediapipe as mp
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
-    logger.warning("MediaPipe not available - using fallback detection")
+logger = logging.getLogger(__name__)
 
 
 class PoseDetector:
-    """Pose and gesture detection using MediaPipe"""
+    """
+    Pose and gesture detection using MediaPipe
+
+    MediaPipe (and cv2) are imported and the graphs built by ``warmup``
+    or the first ``detect`` call, so importing this module is cheap.
+    ``detect`` takes a QualityTier choosing pose model complexity, hand
+    detection and input width; one pose graph is kept per complexity.
+    With ``static_image_mode`` every frame is detected from scratch;
+    without it MediaPipe tracks landmarks from the previous frame, which
+    is only valid when the detector sees a single video stream.
+    """
     
-    def __init__(self):
+    def __init__(self, static_image_mode: bool = False):
+        self.static_image_mode = static_image_mode
         self.mp_pose = None
         self.mp_hands = None
         self.pose = None
+        self.poses: Dict[int, Any] = {}
         self.hands = None
-        
-        if MEDIAPIPE_AVAILABLE:
+        # None until warmup decides between MediaPipe and the fallback
+        self.available: Optional[bool] = None
+    
+    def warmup(self) -> bool:
+        """
+        Build the MediaPipe graphs; returns False when using the fallback
+        """
+        if self.available is not None:
+            return self.available
+        mp = optional_import("mediapipe")
+        self.available = mp is not None
+        if self.available:
             self.mp_pose = mp.solutions.pose
             self.mp_hands = mp.solutions.hands
             
-            self.pose = self.mp_pose.Pose(
-                static_image_mode=False,
-                model_complexity=1,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            for complexity in sorted({t.model_complexity for t in TIERS}, reverse=True):
+                self.poses[complexity] = self.mp_pose.Pose(
+                    static_image_mode=self.static_image_mode,
+                    model_complexity=complexity,
+                    min_detection_confidence=0.5,
+                    min_tracking_confidence=0.5
+                )
+            self.pose = self.poses[TIERS[0].model_complexity]
             self.hands = self.mp_hands.Hands(
-                static_image_mode=False,
+                static_image_mode=self.static_image_mode,
                 max_num_hands=2,
                 min_detection_confidence=0.5,
                 min_tracking_confidence=0.5
@@ -48,27 +70,47 @@ class PoseDetector:
             logger.info("MediaPipe initialized successfully")
         else:
             logger.warning("Using fallback detection - install mediapipe for better results")
+        return self.available
     
-    def detect(self, frame: np.ndarray) -> Dict[str, Any]:
+    def detect(self, frame: np.ndarray, tier: Optional[QualityTier] = None) -> Dict[str, Any]:
         """
         Detect person, pose, and hands in frame
         
+        Args:
+            frame: BGR image
+            tier: Quality tier to run at (default: full quality)
+        
         Returns:
             dict: Detection results including:
                 - person_detected: bool
                 - pose_landmarks: list or None
                 - hands_detected: list
                 - hand_positions: dict
+                - quality_tier: name of the tier used
         """
-        if not MEDIAPIPE_AVAILABLE:
-            return self._fallback_detect(frame)
+        tier = tier or TIERS[0]
+        if not self.warmup():
+            results = self._fallback_detect(frame)
+            results["quality_tier"] = tier.name
+            return results
+        
+        import cv2
+        
+        # Landmarks are normalized, so downscaling does not change coordinates
+        height, width = frame.shape[:2]
+        if width > tier.max_width:
+            frame = cv2.resize(
+                frame,
+                (tier.max_width, max(1, height * tier.max_width // width)),
+                interpolation=cv2.INTER_AREA
+            )
         
         # Convert to RGB
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = {}
+        results = {"quality_tier": tier.name}
         
         # Detect pose
-        pose_results = self.pose.process(rgb_frame)
+        pose_results = self.poses[tier.model_complexity].process(rgb_frame)
         results["person_detected"] = pose_results.pose_landmarks is not None
         
         if pose_results.pose_landmarks:
@@ -76,11 +118,11 @@ class PoseDetector:
         else:
             results["pose_landmarks"] = None
         
-        # Detect hands
-        hand_results = self.hands.process(rgb_frame)
+        # Detect hands (skipped at low quality tiers)
+        hand_results = self.hands.process(rgb_frame) if tier.detect_hands else None
         hands_list = []
         
-        if hand_results.multi_hand_landmarks:
+        if hand_results is not None and hand_results.multi_hand_landmarks:
             for hand_landmarks in hand_results.multi_hand_landmarks:
                 # Get key points
                 wrist = hand_landmarks.landmark[0]
@@ -162,16 +204,103 @@ class PoseDetector:
     
     def release(self):
         """Release MediaPipe resources"""
-        if self.pose:
-            self.pose.close()
+        for pose in self.poses.values():
+            pose.close()
         if self.hands:
             self.hands.close()
 
 
+def parse_resolution(value: str) -> Tuple[int, int]:
+    """Parse "WIDTHxHEIGHT" into (width, height)"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+class DetectorPool:
+    """
+    Fixed set of PoseDetectors shared by inference threads
+
+    MediaPipe graphs are not thread-safe, so each thread borrows a whole
+    detector. Any detector serves frames from any session, so pooled
+    detectors run in static image mode: tracking state carried from one
+    session's frame into another's would be wrong. ``warmup`` builds
+    every graph and pushes synthetic frames at each expected resolution
+    through it, so the first real frame does not pay for initialization.
+    """
+    
+    def __init__(
+        self,
+        size: Optional[int] = None,
+        resolutions: Optional[List[str]] = None,
+        factory: Optional[Callable[[], PoseDetector]] = None
+    ):
+        self.size = size or settings.DETECTOR_POOL_SIZE
+        self.resolutions = [
+            parse_resolution(r) for r in (resolutions or settings.WARMUP_RESOLUTIONS)
+        ]
+        # Pooled detectors serve frames from many streams, so none may track
+        factory = factory or (lambda: PoseDetector(static_image_mode=True))
+        self.detectors = [factory() for _ in range(self.size)]
+        self._idle: queue.Queue = queue.Queue()
+        for detector in self.detectors:
+            self._idle.put(detector)
+        self.ready = False
+        self.warmup_stats: Dict[str, Any] = {}
+    
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[PoseDetector]:
+        """
+        Borrow a detector, blocking until one is free
+        """
+        try:
+            detector = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("No pose detector free")
+        try:
+            yield detector
+        finally:
+            self._idle.put(detector)
+    
+    def warmup(self, frames: int = 2) -> Dict[str, Any]:
+        """
+        Initialize every detector and run ``frames`` synthetic frames per resolution and tier
+        """
+        started = time.perf_counter()
+        timings = {}
+        for detector in self.detectors:
+            detector.warmup()
+        for width, height in self.resolutions:
+            frame = np.zeros((height, width, 3), dtype=np.uint8)
+            # Every tier, so a QoS downgrade under load does not pay init either
+            for tier in TIERS:
+                tier_started = time.perf_counter()
+                for detector in self.detectors:
+                    for _ in range(frames):
+                        detector.detect(frame, tier)
+                timings[f"{tier.name}@{width}x{height}"] = round(
+                    (time.perf_counter() - tier_started) * 1000 / (frames * self.size), 2
+                )
+        self.warmup_stats = {
+            "detectors": self.size,
+            "mediapipe": all(d.available for d in self.detectors),
+            "ms_per_frame": timings,
+            "elapsed_ms": int((time.perf_counter() - started) * 1000)
+        }
+        self.ready = True
+        logger.info(f"Detector pool warmed up: {self.warmup_stats}")
+        return self.warmup_stats
+    
+    def release(self):
+        """Release every detector's MediaPipe resources"""
+        for detector in self.detectors:
+            detector.release()
+
+
 class BehaviorAnalyzer:
     """Analyze study behavior over time"""
     
     def __init__(self):
+        # One stream per analyzer, so landmarks can be tracked across frames
         self.pose_detector = PoseDetector()
         self.activity_history = []
         self.max_history = 100  # Keep last 100 frames
@@ -0,0 +1,163 @@
+"""
+Quality Control - Load-adaptive quality tiers for the detection pipeline
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QualityTier:
+    """Detection settings for one quality level (0 = full quality)"""
+
+    __slots__ = ("level", "name", "model_complexity", "detect_hands", "sample_fps", "max_width")
+
+    def __init__(
+        self,
+        level: int,
+        name: str,
+        model_complexity: int,
+        detect_hands: bool,
+        sample_fps: float,
+        max_width: int
+    ):
+        self.level = level
+        self.name = name
+        self.model_complexity = model_complexity
+        self.detect_hands = detect_hands
+        self.sample_fps = sample_fps
+        self.max_width = max_width
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+# Ordered from full quality to the cheapest setting still useful for alerts
+TIERS: List[QualityTier] = [
+    QualityTier(0, "full", 1, True, 10.0, 1280),
+    QualityTier(1, "reduced", 1, True, 5.0, 960),
+    QualityTier(2, "low", 0, True, 2.0, 640),
+    QualityTier(3, "minimal", 0, False, 1.0, 480),
+]
+
+
+class QualityController:
+    """
+    Moves between quality tiers based on frame latency and queue depth
+
+    Every ``interval_seconds`` the p95 latency of the last ``window``
+    frames and the current analysis queue depth are checked. The tier
+    steps down one level after ``degrade_after`` consecutive overloaded
+    checks (p95 over the SLO, or queue above ``queue_high``). It steps
+    back up only after ``recover_after`` consecutive calm checks (p95
+    under ``recover_ratio`` of the SLO and queue at most ``queue_low``).
+    Overloaded and calm thresholds leave a band with no change, and
+    recovery takes longer than degrading, so the tier does not flap.
+    Every change clears the latency window, so the next decision is
+    based only on frames processed at the new tier.
+    """
+
+    def __init__(
+        self,
+        queue_depth: Callable[[], int] = lambda: 0,
+        tiers: Optional[List[QualityTier]] = None,
+        slo_ms: Optional[float] = None,
+        queue_high: Optional[int] = None,
+        queue_low: Optional[int] = None,
+        degrade_after: Optional[int] = None,
+        recover_after: Optional[int] = None,
+        recover_ratio: float = 0.6,
+        window: int = 50,
+        interval_seconds: Optional[float] = None,
+        enabled: Optional[bool] = None,
+        clock=time.monotonic
+    ):
+        self.queue_depth = queue_depth
+        self.tiers = tiers or TIERS
+        self.slo_ms = slo_ms or settings.QOS_LATENCY_SLO_MS
+        self.queue_high = queue_high or settings.QOS_QUEUE_HIGH
+        self.queue_low = settings.QOS_QUEUE_LOW if queue_low is None else queue_low
+        self.degrade_after = degrade_after or settings.QOS_DEGRADE_AFTER
+        self.recover_after = recover_after or settings.QOS_RECOVER_AFTER
+        self.recover_ratio = recover_ratio
+        self.interval_seconds = (
+            settings.QOS_EVAL_INTERVAL_SECONDS if interval_seconds is None else interval_seconds
+        )
+        self.enabled = settings.QOS_ENABLED if enabled is None else enabled
+        self._clock = clock
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._next_check = clock() + self.interval_seconds
+        self._overloaded = 0
+        self._calm = 0
+        self.level = 0
+        self.transitions = 0
+        self.frames_by_tier = [0] * len(self.tiers)
+
+    @property
+    def tier(self) -> QualityTier:
+        return self.tiers[self.level]
+
+    def p95(self) -> Optional[float]:
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def observe(self, latency_ms: float, level: int):
+        """
+        Record a processed frame and re-evaluate the tier when due
+        """
+        with self._lock:
+            self.frames_by_tier[level] += 1
+            if level == self.level:
+                self._latencies.append(latency_ms)
+            now = self._clock()
+            if self.enabled and now >= self._next_check:
+                self._next_check = now + self.interval_seconds
+                self._evaluate()
+
+    def _evaluate(self):
+        p95 = self.p95()
+        queue = self.queue_depth()
+        overloaded = queue > self.queue_high or (p95 is not None and p95 > self.slo_ms)
+        calm = queue <= self.queue_low and (p95 is None or p95 < self.slo_ms * self.recover_ratio)
+        self._overloaded = self._overloaded + 1 if overloaded else 0
+        self._calm = self._calm + 1 if calm else 0
+
+        if self._overloaded >= self.degrade_after and self.level < len(self.tiers) - 1:
+            self._move(self.level + 1, p95, queue)
+        elif self._calm >= self.recover_after and self.level > 0:
+            self._move(self.level - 1, p95, queue)
+
+    def _move(self, level: int, p95: Optional[float], queue: int):
+        previous = self.tier
+        self.level = level
+        self.transitions += 1
+        self._overloaded = 0
+        self._calm = 0
+        self._latencies.clear()
+        logger.info(
+            f"Detection quality {previous.name} -> {self.tier.name} "
+            f"(p95 {p95 if p95 is None else round(p95, 1)}ms, queue {queue})"
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            p95 = self.p95()
+            return {
+                "enabled": self.enabled,
+                "tier": self.tier.as_dict(),
+                "p95_ms": round(p95, 2) if p95 is not None else None,
+                "slo_ms": self.slo_ms,
+                "queue_depth": self.queue_depth(),
+                "transitions": self.transitions,
+                "frames_by_tier": {t.name: n for t, n in zip(self.tiers, self.frames_by_tier)}
+            }
@@ -0,0 +1,300 @@
+"""
+Report Batch - Nightly daily-report generation and email queueing
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from services.leader_lock import LeadershipLost, leader_lock, leadership
+
+logger = logging.getLogger(__name__)
+
+
+def compute_report_chunk(child_ids: List[str], date: str) -> List[Dict[str, Any]]:
+    """
+    Compute daily reports for one chunk of children (runs in a worker process)
+    """
+    # Imported here so the parent process does not pay for it per chunk
+    from services.analysis_service import build_daily_report
+
+    return [build_daily_report(child_id, date) for child_id in child_ids]
+
+
+def _write_json(path: str, data: Any):
+    """Write JSON atomically so a crash never leaves a half-written file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+class DailyReportBatch:
+    """
+    Batch job producing every active child's daily report
+
+    A run for a date is split into fixed chunks recorded in a manifest.
+    Each computed chunk is stored as its own file and a marker is written
+    once its emails are in the notification outbox, so a crashed run
+    resumes from the first chunk that is missing either. Every worker
+    runs the schedule, but only the holder of the leader lock runs a
+    batch, so each report is emailed once.
+    """
+
+    def __init__(
+        self,
+        outbox,
+        children_provider: Callable[[], Iterable[Tuple[str, str]]],
+        output_dir: Optional[str] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        lock=None
+    ):
+        self.outbox = outbox
+        self.children_provider = children_provider
+        self.output_dir = output_dir or settings.REPORT_BATCH_DIR
+        self.workers = workers or settings.REPORT_BATCH_WORKERS or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings.REPORT_BATCH_CHUNK_SIZE
+        self.lock = lock or leader_lock("report-batch")
+        # Set while a scheduled run holds the lock; checked before every email write
+        self._fenced = False
+        self._progress: Dict[str, Any] = {"running": False}
+        self._scheduler_task: Optional[asyncio.Task] = None
+
+    # ==================== Run ====================
+
+    async def run(self, date: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Run (or resume) the batch for a date and return final progress
+        """
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        run_dir = os.path.join(self.output_dir, date)
+        os.makedirs(run_dir, exist_ok=True)
+
+        chunks = self._load_or_create_manifest(run_dir, date)
+        to_compute = [
+            i for i in range(len(chunks))
+            if not os.path.exists(self._chunk_path(run_dir, i))
+        ]
+        to_email = [
+            i for i in range(len(chunks))
+            if i not in to_compute and not os.path.exists(self._sent_path(run_dir, i))
+        ]
+
+        started = time.monotonic()
+        self._progress = {
+            "running": True,
+            "date": date,
+            "total_children": sum(len(chunk) for chunk in chunks),
+            "chunks_total": len(chunks),
+            "chunks_done": len(chunks) - len(to_compute),
+            "chunks_resumed": len(chunks) - len(to_compute),
+            "children_done": 0,
+            "emails_queued": 0,
+            "started_at": datetime.now().isoformat(),
+            "children_per_hour": 0.0
+        }
+        logger.info(
+            f"Daily report batch {date}: {len(to_compute)} of {len(chunks)} chunks to compute"
+        )
+
+        for i in to_email:
+            await self._queue_emails(run_dir, i, chunks[i], None)
+
+        if to_compute:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                pending = {
+                    loop.run_in_executor(
+                        pool,
+                        compute_report_chunk,
+                        [child_id for child_id, _ in chunks[i]],
+                        date
+                    ): i
+                    for i in to_compute
+                }
+                while pending:
+                    done, _ = await asyncio.wait(
+                        pending.keys(), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        index = pending.pop(future)
+                        reports = future.result()
+                        _write_json(self._chunk_path(run_dir, index), reports)
+
+                        self._progress["chunks_done"] += 1
+                        self._progress["children_done"] += len(reports)
+                        elapsed = time.monotonic() - started
+                        if elapsed > 0:
+                            self._progress["children_per_hour"] = round(
+                                self._progress["children_done"] * 3600 / elapsed, 1
+                            )
+                        await self._queue_emails(run_dir, index, chunks[index], reports)
+
+        self._progress["running"] = False
+        self._progress["elapsed_seconds"] = round(time.monotonic() - started, 2)
+        logger.info(f"Daily report batch {date} finished: {self._progress}")
+        return dict(self._progress)
+
+    def progress(self) -> Dict[str, Any]:
+        """
+        Get progress of the current or last run
+        """
+        return dict(self._progress)
+
+    # ==================== Scheduling ====================
+
+    def start_scheduler(self):
+        """
+        Start the nightly schedule in the background
+        """
+        if self._scheduler_task is None or self._scheduler_task.done():
+            self._scheduler_task = asyncio.create_task(self._schedule_loop())
+
+    async def stop_scheduler(self):
+        """
+        Stop the nightly schedule
+        """
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            try:
+                await self._scheduler_task
+            except asyncio.CancelledError:
+                pass
+            self._scheduler_task = None
+
+    async def _schedule_loop(self):
+        # Resume unfinished runs left behind by a crash or restart, which
+        # may be from before midnight or from days the server was down
+        for date in self._incomplete_dates():
+            logger.info(f"Resuming unfinished daily report batch for {date}")
+            await self._run_safely(date)
+
+        while True:
+            next_run = self._next_run_time(datetime.now())
+            await asyncio.sleep((next_run - datetime.now()).total_seconds())
+            await self._run_safely(next_run.strftime("%Y-%m-%d"))
+
+    async def _run_safely(self, date: str):
+        try:
+            async with leadership(self.lock) as leader:
+                if not leader:
+                    logger.info(f"Daily report batch {date} left to the worker holding the lock")
+                    return
+                self._fenced = True
+                try:
+                    await self.run(date)
+                finally:
+                    self._fenced = False
+        except Exception as e:
+            self._progress["running"] = False
+            logger.error(f"Daily report batch {date} failed: {e}")
+
+    @staticmethod
+    def _next_run_time(now: datetime) -> datetime:
+        next_run = now.replace(
+            hour=settings.REPORT_BATCH_HOUR,
+            minute=settings.REPORT_BATCH_MINUTE,
+            second=0,
+            microsecond=0
+        )
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return next_run
+
+    # ==================== Checkpoints ====================
+
+    def _load_or_create_manifest(self, run_dir: str, date: str) -> List[List[List[str]]]:
+        manifest_path = os.path.join(run_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                return json.load(f)["chunks"]
+
+        # Snapshot the child list so chunk indices stay stable across resumes
+        children = [[child_id, email] for child_id, email in self.children_provider()]
+        chunks = [
+            children[i:i + self.chunk_size]
+            for i in range(0, len(children), self.chunk_size)
+        ]
+        _write_json(manifest_path, {
+            "date": date,
+            "chunk_size": self.chunk_size,
+            "created_at": datetime.now().isoformat(),
+            "chunks": chunks
+        })
+        return chunks
+
+    def _incomplete_dates(self) -> List[str]:
+        """
+        Dates with a manifest whose emails were not all queued, oldest first
+        """
+        if not os.path.isdir(self.output_dir):
+            return []
+        return [
+            date for date in sorted(os.listdir(self.output_dir))
+            if os.path.isdir(os.path.join(self.output_dir, date)) and self._is_incomplete(date)
+        ]
+
+    def _is_incomplete(self, date: str) -> bool:
+        run_dir = os.path.join(self.output_dir, date)
+        manifest_path = os.path.join(run_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return False
+        with open(manifest_path, encoding="utf-8") as f:
+            chunk_count = len(json.load(f)["chunks"])
+        return any(
+            not os.path.exists(self._sent_path(run_dir, i))
+            for i in range(chunk_count)
+        )
+
+    def _check_leader(self):
+        # A run cancelled on lock loss may still be writing in a thread
+        if self._fenced and not self.lock.held:
+            raise LeadershipLost("leader lock lost during the daily report batch")
+
+    @staticmethod
+    def _chunk_path(run_dir: str, index: int) -> str:
+        return os.path.join(run_dir, f"chunk-{index:05d}.json")
+
+    @staticmethod
+    def _sent_path(run_dir: str, index: int) -> str:
+        return os.path.join(run_dir, f"chunk-{index:05d}.sent")
+
+    # ==================== Emails ====================
+
+    async def _queue_emails(
+        self,
+        run_dir: str,
+        index: int,
+        chunk: List[List[str]],
+        reports: Optional[List[Dict[str, Any]]]
+    ):
+        # One outbox transaction per chunk, off the event loop
+        queued = await asyncio.to_thread(self._write_emails, run_dir, index, chunk, reports)
+        self._progress["emails_queued"] = self._progress.get("emails_queued", 0) + queued
+
+    def _write_emails(
+        self,
+        run_dir: str,
+        index: int,
+        chunk: List[List[str]],
+        reports: Optional[List[Dict[str, Any]]]
+    ) -> int:
+        if reports is None:
+            with open(self._chunk_path(run_dir, index), encoding="utf-8") as f:
+                reports = json.load(f)
+
+        self._check_leader()
+        self.outbox.queue_daily_reports([
+            (email, report["child_id"], report)
+            for (_, email), report in zip(chunk, reports)
+        ])
+        self._check_leader()
+        _write_json(self._sent_path(run_dir, index), {"sent_at": datetime.now().isoformat()})
+        return len(reports)
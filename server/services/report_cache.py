@@ -0,0 +1,294 @@
+"""
+Report Cache - Serialized daily/weekly reports with ETag support
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Try to import the asyncio Redis client
+try:
+    import redis.asyncio as aioredis
+    from redis.exceptions import WatchError
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+    logger.warning("redis not available - report cache limited to in-process backend")
+
+
+REPORT_DAILY = "daily"
+REPORT_WEEKLY = "weekly"
+
+
+def local_time(moment: datetime) -> datetime:
+    """
+    ``moment`` in server local time; reports are keyed by local dates
+
+    Naive datetimes are taken to be local already.
+    """
+    if moment.tzinfo is not None:
+        return moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+def week_start(day: datetime) -> str:
+    """Monday of the ISO week containing ``day`` (YYYY-MM-DD)"""
+    day = local_time(day)
+    monday = day - timedelta(days=day.weekday())
+    return monday.strftime("%Y-%m-%d")
+
+
+class CachedReport:
+    """Serialized report payload and its ETag"""
+
+    __slots__ = ("etag", "body")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "CachedReport":
+        """
+        Serialize a payload once and derive a strong ETag from the bytes
+        """
+        body = json.dumps(
+            payload, ensure_ascii=False, separators=(",", ":"), default=str
+        ).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return cls(etag, body)
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        Check an If-None-Match header value against this report's ETag
+        """
+        if not if_none_match:
+            return False
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate == "*":
+                return True
+            # Weak comparison is fine for GET revalidation
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == self.etag:
+                return True
+        return False
+
+
+class InMemoryReportBackend:
+    """
+    Per-process LRU cache with TTL
+
+    Invalidating a key stamps it with a new value of a global counter.
+    Only the ``max_entries`` most recent stamps are kept; a key whose
+    stamp was dropped reads as the newest dropped stamp, which can only
+    make a write be skipped, never let a stale one through.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, CachedReport]]" = OrderedDict()
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+
+    async def get(self, key: str) -> Optional[CachedReport]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, report = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return report
+
+    async def generation(self, key: str) -> int:
+        return self._generations.get(key, self._floor)
+
+    async def set(self, key: str, report: CachedReport, generation: Optional[int] = None) -> bool:
+        if generation is not None and self._generations.get(key, self._floor) != generation:
+            return False
+        self._entries[key] = (self._clock() + self.ttl_seconds, report)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self._entries.pop(key, None)
+            self._counter += 1
+            self._generations[key] = self._counter
+            self._generations.move_to_end(key)
+        while len(self._generations) > self.max_entries:
+            _, dropped = self._generations.popitem(last=False)
+            self._floor = max(self._floor, dropped)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisReportBackend:
+    """
+    Redis-backed cache shared by all workers
+
+    Entries expire via Redis TTL; an access-time sorted set bounds the
+    number of cached reports so the oldest-used ones are dropped first.
+    Invalidation increments a per-key generation counter, and writes
+    WATCH it so a report built before an invalidation is not stored.
+    """
+
+    LRU_KEY = "report:lru"
+
+    def __init__(self, client, max_entries: int, ttl_seconds: int):
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_url(cls, url: str, max_entries: int, ttl_seconds: int) -> "RedisReportBackend":
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis package is required for the redis report cache")
+        return cls(aioredis.from_url(url), max_entries, ttl_seconds)
+
+    async def get(self, key: str) -> Optional[CachedReport]:
+        etag, body = await self.client.hmget(key, "etag", "body")
+        if etag is None or body is None:
+            return None
+        await self.client.zadd(self.LRU_KEY, {key: time.time()})
+        return CachedReport(etag.decode("utf-8"), body)
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:gen"
+
+    async def generation(self, key: str) -> int:
+        return int(await self.client.get(self._generation_key(key)) or 0)
+
+    async def set(self, key: str, report: CachedReport, generation: Optional[int] = None) -> bool:
+        now = time.time()
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                if generation is not None:
+                    await pipe.watch(self._generation_key(key))
+                    if int(await pipe.get(self._generation_key(key)) or 0) != generation:
+                        return False
+                    pipe.multi()
+                pipe.hset(key, mapping={"etag": report.etag, "body": report.body})
+                pipe.expire(key, self.ttl_seconds)
+                # Members not touched for a whole TTL have expired
+                pipe.zremrangebyscore(self.LRU_KEY, "-inf", now - self.ttl_seconds)
+                pipe.zadd(self.LRU_KEY, {key: now})
+                pipe.zcard(self.LRU_KEY)
+                results = await pipe.execute()
+            except WatchError:
+                return False
+
+        overflow = results[-1] - self.max_entries
+        if overflow > 0:
+            evicted = await self.client.zpopmin(self.LRU_KEY, overflow)
+            if evicted:
+                await self.client.delete(*[member for member, _ in evicted])
+        return True
+
+    async def delete(self, keys: List[str]):
+        if not keys:
+            return
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(*keys)
+            pipe.zrem(self.LRU_KEY, *keys)
+            for key in keys:
+                pipe.incr(self._generation_key(key))
+                pipe.expire(self._generation_key(key), self.ttl_seconds)
+            await pipe.execute()
+
+
+class ReportCache:
+    """
+    Report result cache keyed by (kind, child_id, period)
+
+    Daily reports use the report date as period, weekly reports the
+    Monday of the week. Entries are invalidated only when an event for
+    that child falls inside the cached period.
+
+    Callers read ``generation`` before building a report and pass it to
+    ``put``, which skips the write if an invalidation happened meanwhile.
+    """
+
+    def __init__(self, backend=None):
+        if backend is None:
+            backend = self._backend_from_settings()
+        self.backend = backend
+
+    @staticmethod
+    def _backend_from_settings():
+        if settings.REPORT_CACHE_BACKEND == "redis":
+            return RedisReportBackend.from_url(
+                settings.REDIS_URL,
+                settings.REPORT_CACHE_MAX_ENTRIES,
+                settings.REPORT_CACHE_TTL_SECONDS
+            )
+        return InMemoryReportBackend(
+            settings.REPORT_CACHE_MAX_ENTRIES,
+            settings.REPORT_CACHE_TTL_SECONDS
+        )
+
+    @staticmethod
+    def make_key(kind: str, child_id: str, period: str) -> str:
+        return f"report:{kind}:{child_id}:{period}"
+
+    async def get(self, kind: str, child_id: str, period: str) -> Optional[CachedReport]:
+        """
+        Get a cached report, or None on miss/expiry
+        """
+        return await self.backend.get(self.make_key(kind, child_id, period))
+
+    async def generation(self, kind: str, child_id: str, period: str) -> int:
+        """
+        Invalidation generation of an entry, to pass to ``put``
+        """
+        return await self.backend.generation(self.make_key(kind, child_id, period))
+
+    async def put(
+        self,
+        kind: str,
+        child_id: str,
+        period: str,
+        payload: Dict[str, Any],
+        generation: Optional[int] = None
+    ) -> CachedReport:
+        """
+        Serialize and store a report payload
+
+        With a ``generation``, the report is returned but not stored if
+        the entry has been invalidated since that generation was read.
+        """
+        report = CachedReport.from_payload(payload)
+        key = self.make_key(kind, child_id, period)
+        if not await self.backend.set(key, report, generation):
+            logger.debug(f"Report cache write skipped for {key}: invalidated while building")
+        return report
+
+    async def invalidate_event(self, child_id: str, timestamp: datetime):
+        """
+        Drop the daily and weekly reports covering an ingested event
+        """
+        timestamp = local_time(timestamp)
+        keys = [
+            self.make_key(REPORT_DAILY, child_id, timestamp.strftime("%Y-%m-%d")),
+            self.make_key(REPORT_WEEKLY, child_id, week_start(timestamp))
+        ]
+        await self.backend.delete(keys)
+        logger.debug(f"Report cache invalidated for {child_id} at {timestamp}")
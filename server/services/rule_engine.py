@@ -0,0 +1,173 @@
+"""
+Rule Engine - Declarative alert rules compiled to per-activity dispatch tables
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from models.schemas import AlertRule
+from services.sliding_window import SlidingWindowCounter
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledRule:
+    """An AlertRule with its thresholds pre-converted to seconds"""
+
+    __slots__ = ("rule", "key", "threshold", "window", "bucket", "cooldown")
+
+    def __init__(self, child_id: str, rule: AlertRule):
+        self.rule = rule
+        self.key = (child_id, rule.rule_id)
+        self.threshold = rule.threshold_minutes * 60
+        self.window = rule.window_minutes * 60 if rule.window_minutes else None
+        self.bucket = rule.bucket_seconds
+        self.cooldown = rule.cooldown_minutes * 60
+
+
+class RuleState:
+    """Per-session progress of one rule, tied to the compilation it was built for"""
+
+    __slots__ = ("compiled", "run_seconds", "last_seq", "counter", "last_fired", "fired_in_run")
+
+    def __init__(self, compiled: CompiledRule):
+        self.compiled = compiled
+        self.run_seconds = 0.0
+        self.last_seq = -1
+        self.counter = (
+            SlidingWindowCounter(compiled.window, compiled.bucket)
+            if compiled.window else None
+        )
+        self.last_fired: Optional[float] = None
+        self.fired_in_run = False
+
+
+class SessionRules:
+    """Rule state for one session; ``seq`` numbers the session's events"""
+
+    __slots__ = ("seq", "states")
+
+    def __init__(self):
+        self.seq = 0
+        self.states: Dict[Tuple[str, str], RuleState] = {}
+
+
+class RuleMatch:
+    """A rule that fired for an event"""
+
+    __slots__ = ("rule", "minutes")
+
+    def __init__(self, rule: AlertRule, minutes: float):
+        self.rule = rule
+        self.minutes = minutes
+
+
+class RuleEngine:
+    """
+    Evaluates alert rules indexed by (child, activity)
+
+    Each child's rules are compiled into a table mapping an activity to
+    the rules that count it, so an event only touches the rules listed
+    under its own activity. Consecutive-run rules detect interruptions
+    lazily: every event bumps the session's sequence number, and a rule
+    whose last counted event is not the immediately preceding one starts
+    a new run. No rule is visited for activities it does not count.
+    Replacing a child's rules does not touch session state: progress
+    built against an older compilation is discarded on its next use.
+    """
+
+    def __init__(self):
+        self._tables: Dict[str, Dict[str, Tuple[CompiledRule, ...]]] = {}
+        self._sessions: Dict[str, SessionRules] = {}
+
+    def set_rules(self, child_id: str, rules: List[AlertRule]):
+        """
+        Compile and install the rules for one child
+        """
+        table: Dict[str, List[CompiledRule]] = {}
+        for rule in rules:
+            compiled = CompiledRule(child_id, rule)
+            for activity in set(rule.activities):
+                table.setdefault(activity.value, []).append(compiled)
+        if table:
+            self._tables[child_id] = {a: tuple(r) for a, r in table.items()}
+        else:
+            self._tables.pop(child_id, None)
+        logger.info(f"Compiled {len(rules)} alert rules for {child_id}")
+
+    def rule_count(self) -> int:
+        return sum(
+            len({c.key for rules in table.values() for c in rules})
+            for table in self._tables.values()
+        )
+
+    def rules_for(self, child_id: str, activity: str) -> Tuple[CompiledRule, ...]:
+        """
+        The child's compiled rules that count an activity
+        """
+        table = self._tables.get(child_id)
+        if table is None:
+            return ()
+        return table.get(getattr(activity, "value", activity), ())
+
+    def reset_session(self, session_id: str):
+        """
+        Forget all rule progress for a session
+        """
+        self._sessions.pop(session_id, None)
+
+    def evaluate(
+        self,
+        session_id: str,
+        child_id: str,
+        activity: str,
+        duration_seconds: float,
+        now: Optional[float] = None
+    ) -> List[RuleMatch]:
+        """
+        Apply one event and return the rules that fired
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = SessionRules()
+        session.seq += 1
+
+        table = self._tables.get(child_id)
+        if table is None:
+            return []
+        rules = table.get(getattr(activity, "value", activity))
+        if not rules:
+            return []
+
+        now = time.monotonic() if now is None else now
+        seq = session.seq
+        matches = []
+        for compiled in rules:
+            state = session.states.get(compiled.key)
+            # Progress against replaced rules no longer applies
+            if state is None or state.compiled is not compiled:
+                state = session.states[compiled.key] = RuleState(compiled)
+
+            if state.counter is not None:
+                state.counter.add(now, duration_seconds)
+                total = state.counter.total(now)
+            else:
+                if state.last_seq != seq - 1:
+                    # Another activity came in between: a new run starts
+                    state.run_seconds = 0.0
+                    state.fired_in_run = False
+                state.run_seconds += duration_seconds
+                total = state.run_seconds
+            state.last_seq = seq
+
+            if total < compiled.threshold or state.fired_in_run:
+                continue
+            if state.last_fired is not None and now - state.last_fired < compiled.cooldown:
+                continue
+
+            state.last_fired = now
+            # Consecutive rules fire at most once per run
+            state.fired_in_run = state.counter is None
+            matches.append(RuleMatch(compiled.rule, total / 60))
+        return matches
@@ -0,0 +1,236 @@
+"""
+Session State - Compact per-session alert state with idle eviction
+"""
+
+import logging
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.config import settings
+from models.schemas import AlertType
+
+logger = logging.getLogger(__name__)
+
+FLAG_ACTIVE = 1
+# One bit per alert already sent in the session
+ALERT_FLAGS = {
+    AlertType.LEAVE_TOO_LONG: 1 << 1,
+    AlertType.PLAY_WHILE_WORK: 1 << 2,
+    AlertType.SESSION_START: 1 << 3,
+    AlertType.SESSION_END: 1 << 4,
+}
+
+
+class SessionState:
+    """
+    Alert-tracking state for one monitoring session
+
+    Timestamps are integer epoch seconds (0 when unset) and booleans are
+    packed into ``flags``, so a session costs a single slotted object
+    instead of a dict of boxed values.
+    """
+
+    __slots__ = (
+        "child_id", "flags", "start_time", "last_seen",
+        "leave_time", "leave_duration", "play_time", "play_duration",
+        "leave_timer", "play_timer", "windows"
+    )
+
+    def __init__(self, child_id: str, now: int, active: bool = True):
+        self.child_id = child_id
+        self.flags = FLAG_ACTIVE if active else 0
+        self.start_time = now
+        self.last_seen = now
+        self.leave_time = 0
+        self.leave_duration = 0
+        self.play_time = 0
+        self.play_duration = 0
+        self.leave_timer = None
+        self.play_timer = None
+        # (config, counters, armed) for AlertConfig.window_rules
+        self.windows = None
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.flags & FLAG_ACTIVE)
+
+    @is_active.setter
+    def is_active(self, value: bool):
+        if value:
+            self.flags |= FLAG_ACTIVE
+        else:
+            self.flags &= ~FLAG_ACTIVE
+
+    def alert_sent(self, alert_type: AlertType) -> bool:
+        return bool(self.flags & ALERT_FLAGS[alert_type])
+
+    def mark_sent(self, alert_type: AlertType):
+        self.flags |= ALERT_FLAGS[alert_type]
+
+    @property
+    def alerts_sent(self) -> List[str]:
+        return [t.value for t, bit in ALERT_FLAGS.items() if self.flags & bit]
+
+    def timers(self) -> List[Any]:
+        return [h for h in (self.leave_timer, self.play_timer) if h is not None]
+
+    def footprint(self) -> int:
+        """
+        Approximate bytes held by this session, excluding shared objects
+        """
+        size = sys.getsizeof(self)
+        for name in ("leave_timer", "play_timer"):
+            handle = getattr(self, name)
+            if handle is not None:
+                size += sys.getsizeof(handle)
+        if self.windows is not None:
+            _, counters, armed = self.windows
+            size += sys.getsizeof(counters) + sys.getsizeof(armed)
+            size += sum(sys.getsizeof(c) + sys.getsizeof(c._buckets) for c in counters)
+        return size
+
+    @staticmethod
+    def to_datetime(epoch: int) -> Optional[datetime]:
+        return datetime.fromtimestamp(epoch) if epoch else None
+
+
+class SessionStore:
+    """
+    Sessions ordered by last activity, evicted after an idle TTL
+
+    Touching a session moves it to the end of an OrderedDict, so the
+    idle ones are always at the front. Eviction pops from the front at
+    most ``evict_batch`` sessions per call and runs on every touch and
+    timer tick, keeping the cost incremental and the store bounded by
+    the sessions seen within the TTL.
+    """
+
+    def __init__(
+        self,
+        idle_ttl_seconds: Optional[int] = None,
+        evict_batch: Optional[int] = None,
+        on_evict: Optional[Callable[[str, SessionState], None]] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.idle_ttl_seconds = idle_ttl_seconds or settings.SESSION_IDLE_TTL_SECONDS
+        self.evict_batch = evict_batch or settings.SESSION_EVICT_BATCH
+        self.on_evict = on_evict
+        self.clock = clock
+        self._sessions: "OrderedDict[str, SessionState]" = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __getitem__(self, session_id: str) -> SessionState:
+        return self._sessions[session_id]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._sessions)
+
+    def now(self) -> int:
+        return int(self.clock())
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        """
+        Look up a session without refreshing it
+        """
+        return self._sessions.get(session_id)
+
+    def start(self, session_id: str, child_id: str) -> SessionState:
+        """
+        Create (or replace) an active session
+        """
+        now = self.now()
+        state = SessionState(child_id, now)
+        self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+        self.evict(now)
+        return state
+
+    def touch(self, session_id: str, child_id: str) -> SessionState:
+        """
+        Get a session for an incoming event, creating it if needed
+        """
+        now = self.now()
+        state = self._sessions.get(session_id)
+        if state is None:
+            state = self._sessions[session_id] = SessionState(child_id, now)
+        else:
+            state.last_seen = now
+            self._sessions.move_to_end(session_id)
+        self.evict(now)
+        return state
+
+    def put(self, session_id: str, state: SessionState, touch: bool = True):
+        """
+        Insert a session handed over from elsewhere or restored from disk
+
+        With ``touch`` the handover counts as activity; restores keep the
+        recorded ``last_seen`` and must be inserted oldest first.
+        """
+        if touch:
+            state.last_seen = self.now()
+        self._sessions[session_id] = state
+        self._sessions.move_to_end(session_id)
+
+    def reorder(self):
+        """
+        Restore least-recently-seen-first order after out-of-order inserts
+        """
+        self._sessions = OrderedDict(
+            sorted(self._sessions.items(), key=lambda item: item[1].last_seen)
+        )
+
+    def pop(self, session_id: str) -> Optional[SessionState]:
+        """
+        Remove a session without calling ``on_evict``
+        """
+        return self._sessions.pop(session_id, None)
+
+    def evict(self, now: Optional[int] = None) -> int:
+        """
+        Drop up to ``evict_batch`` sessions idle longer than the TTL
+        """
+        now = self.now() if now is None else now
+        cutoff = now - self.idle_ttl_seconds
+        evicted = 0
+        while self._sessions and evicted < self.evict_batch:
+            session_id, state = next(iter(self._sessions.items()))
+            if state.last_seen > cutoff:
+                break
+            del self._sessions[session_id]
+            if self.on_evict is not None:
+                self.on_evict(session_id, state)
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def memory_stats(self, sample: int = 1000) -> Dict[str, Any]:
+        """
+        Session count and approximate memory per session (sampled)
+        """
+        sessions = len(self._sessions)
+        per_session = 0
+        if sessions:
+            sampled = 0
+            total = 0
+            for session_id, state in self._sessions.items():
+                total += sys.getsizeof(session_id) + state.footprint()
+                sampled += 1
+                if sampled >= sample:
+                    break
+            per_session = total // sampled
+        return {
+            "sessions": sessions,
+            "bytes_per_session": per_session,
+            "approx_total_bytes": per_session * sessions,
+            "evicted": self.evicted,
+            "idle_ttl_seconds": self.idle_ttl_seconds
+        }
@@ -0,0 +1,69 @@
+"""
+Shard Ring - Consistent hashing of session ids onto worker nodes
+"""
+
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional
+
+
+def _hash(key: str) -> int:
+    # Stable across processes and restarts, unlike hash()
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes
+
+    Each node is placed at ``vnodes`` points on the ring and a key is
+    owned by the first point clockwise from its hash. Adding or removing
+    a node only moves the keys on the arcs it gains or loses, roughly
+    1/N of them, and virtual nodes keep the split even.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._nodes: Dict[str, List[int]] = {}
+        for node in nodes:
+            self.add_node(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    def add_node(self, node: str):
+        if node in self._nodes:
+            return
+        points = [_hash(f"{node}#{i}") for i in range(self.vnodes)]
+        self._nodes[node] = points
+        for point in points:
+            index = bisect.bisect_left(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node: str):
+        if self._nodes.pop(node, None) is None:
+            return
+        keep = [i for i, owner in enumerate(self._owners) if owner != node]
+        self._points = [self._points[i] for i in keep]
+        self._owners = [self._owners[i] for i in keep]
+
+    def owner(self, key: str) -> Optional[str]:
+        """
+        Node owning ``key``, or None if the ring is empty
+        """
+        if not self._points:
+            return None
+        index = bisect.bisect_right(self._points, _hash(key))
+        if index == len(self._points):
+            index = 0
+        return self._owners[index]
@@ -0,0 +1,61 @@
+"""
+Sliding Window - Bucketed circular counters for windowed alert rules
+"""
+
+import math
+from typing import List
+
+
+class SlidingWindowCounter:
+    """
+    Seconds accumulated over the last ``window_seconds``
+
+    The window is split into fixed-size buckets kept in a circular array
+    together with a running total. Adding time only touches the current
+    bucket, and moving forward clears each expired bucket once, so
+    updates are O(1) amortized regardless of the window length.
+    """
+
+    __slots__ = ("bucket_seconds", "size", "_buckets", "_head", "_total")
+
+    def __init__(self, window_seconds: float, bucket_seconds: float = 60.0):
+        self.bucket_seconds = bucket_seconds
+        self.size = max(1, math.ceil(window_seconds / bucket_seconds))
+        self._buckets: List[float] = [0.0] * self.size
+        # Absolute index of the newest bucket; None until the first event
+        self._head = None
+        self._total = 0.0
+
+    def _advance(self, now: float):
+        index = math.floor(now / self.bucket_seconds)
+        if self._head is None:
+            self._head = index
+            return
+        if index <= self._head:
+            return
+        if index - self._head >= self.size:
+            # The whole window has expired
+            self._buckets = [0.0] * self.size
+            self._total = 0.0
+        else:
+            for expired in range(self._head + 1, index + 1):
+                slot = expired % self.size
+                self._total -= self._buckets[slot]
+                self._buckets[slot] = 0.0
+        self._head = index
+
+    def add(self, now: float, seconds: float):
+        """
+        Record ``seconds`` of activity at time ``now``
+        """
+        self._advance(now)
+        self._buckets[self._head % self.size] += seconds
+        self._total += seconds
+
+    def total(self, now: float) -> float:
+        """
+        Seconds recorded within the window ending at ``now``
+        """
+        self._advance(now)
+        # Guard against float drift from repeated add/subtract
+        return max(self._total, 0.0)
@@ -0,0 +1,152 @@
+"""
+SMTP Connection Pool - Long-lived authenticated SMTP clients
+"""
+
+import asyncio
+import logging
+import time
+from email.message import Message
+from typing import List, Optional
+
+import aiosmtplib
+
+logger = logging.getLogger(__name__)
+
+# Errors after which a connection cannot be reused
+CONNECTION_ERRORS = (
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPTimeoutError,
+    ConnectionError,
+    asyncio.TimeoutError
+)
+
+
+class PooledConnection:
+    """An SMTP client plus its reuse bookkeeping"""
+
+    __slots__ = ("client", "messages_sent", "last_used")
+
+    def __init__(self, client: aiosmtplib.SMTP):
+        self.client = client
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Pool of connected, authenticated SMTP clients
+
+    Connections are opened on demand up to ``size`` and reused across
+    messages, so TCP setup, STARTTLS and AUTH are paid once per
+    connection instead of once per email. ``size`` also caps the number
+    of concurrent sends.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: Optional[bool] = True,
+        size: int = 4,
+        max_messages_per_connection: int = 100,
+        idle_check_seconds: float = 30,
+        timeout: float = 30
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.size = size
+        self.max_messages_per_connection = max_messages_per_connection
+        self.idle_check_seconds = idle_check_seconds
+        self.timeout = timeout
+
+        self._idle: List[PooledConnection] = []
+        self._semaphore = asyncio.Semaphore(size)
+        self.connections_opened = 0
+
+    async def send_message(self, message: Message):
+        """
+        Send a message on a pooled connection
+
+        A connection-level failure discards that connection and the send is
+        retried once on a fresh one. Other SMTP errors are raised as-is.
+        """
+        async with self._semaphore:
+            conn = await self._acquire()
+            try:
+                await conn.client.send_message(message)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f"SMTP connection lost ({e}) - reconnecting")
+                await self._discard(conn)
+                conn = await self._connect()
+                try:
+                    await conn.client.send_message(message)
+                except BaseException:
+                    await self._discard(conn)
+                    raise
+            except BaseException:
+                await self._discard(conn)
+                raise
+            await self._release(conn)
+
+    async def close(self):
+        """
+        Close all idle connections
+        """
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._discard(conn)
+
+    async def _acquire(self) -> PooledConnection:
+        while self._idle:
+            conn = self._idle.pop()
+            if await self._is_healthy(conn):
+                return conn
+            await self._discard(conn)
+        return await self._connect()
+
+    async def _release(self, conn: PooledConnection):
+        conn.messages_sent += 1
+        conn.last_used = time.monotonic()
+        if conn.messages_sent >= self.max_messages_per_connection:
+            await self._discard(conn)
+        else:
+            self._idle.append(conn)
+
+    async def _is_healthy(self, conn: PooledConnection) -> bool:
+        if not conn.client.is_connected:
+            return False
+        # Only probe connections that sat idle long enough to be dropped
+        if time.monotonic() - conn.last_used < self.idle_check_seconds:
+            return True
+        try:
+            await conn.client.noop()
+            return True
+        except (aiosmtplib.SMTPException, ConnectionError, asyncio.TimeoutError):
+            return False
+
+    async def _connect(self) -> PooledConnection:
+        client = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await client.connect()
+        self.connections_opened += 1
+        logger.debug(f"SMTP connection opened to {self.hostname}:{self.port}")
+        return PooledConnection(client)
+
+    async def _discard(self, conn: PooledConnection):
+        try:
+            if conn.client.is_connected:
+                await conn.client.quit()
+        except Exception:
+            conn.client.close()
@@ -8,19 +8,18 @@ import logging
 from typing import Optional, List
 from pathlib import Path
 
-logger = logging.getLogger(__name__)
+from core.imports import optional_import
 
-# Try to import pygame
-try:
-    import pygame
-    PYGAME_AVAILABLE = True
-except ImportError:
-    PYGAME_AVAILABLE = False
-    logger.warning("Pygame not available - sound alerts disabled")
+logger = logging.getLogger(__name__)
 
 
 class SoundAlert:
-    """Sound alert system for monitoring"""
+    """
+    Sound alert system for monitoring
+
+    pygame is imported and the mixer initialized by ``warmup`` or the
+    first alert played, not when the module is imported.
+    """
     
     # Alert types
     ALERT_LEAVE = "leave"
@@ -30,22 +29,34 @@ class SoundAlert:
     
     def __init__(self, sounds_dir: str = "/app/sounds"):
         self.sounds_dir = Path(sounds_dir)
-        self.enabled = PYGAME_AVAILABLE
+        self.sounds = {}
+        self._pygame = None
+        # None until warmup has tried to initialize the mixer
+        self.enabled: Optional[bool] = None
+    
+    def warmup(self) -> bool:
+        """
+        Initialize the mixer and pre-load sounds; returns False if disabled
+        """
+        if self.enabled is not None:
+            return self.enabled
+        self._pygame = optional_import("pygame")
+        self.enabled = self._pygame is not None
         
         if self.enabled:
-            pygame.mixer.init()
+            self._pygame.mixer.init()
             logger.info("Sound alert system initialized")
         else:
             logger.warning("Sound alerts disabled - install pygame")
         
-        # Pre-load sounds
-        self.sounds = {}
         self._load_sounds()
+        return self.enabled
     
     def _load_sounds(self):
         """Load alert sounds"""
         if not self.enabled:
             return
+        pygame = self._pygame
         
         # Default sounds (in production, add actual sound files)
         sound_files = {
@@ -74,7 +85,7 @@ class SoundAlert:
             alert_type: Type of alert (ALERT_LEAVE, ALERT_PLAY, etc.)
             volume: Volume level 0.0-1.0
         """
-        if not self.enabled:
+        if not self.warmup():
             logger.warning(f"Sound alert ({alert_type}) - Pygame not available")
             return
         
@@ -112,12 +123,12 @@ class SoundAlert:
     def stop(self):
         """Stop all sounds"""
         if self.enabled:
-            pygame.mixer.stop()
+            self._pygame.mixer.stop()
     
     def set_volume(self, volume: float):
         """Set global volume"""
-        if self.enabled:
-            pygame.mixer.music.set_volume(volume)
+        if self.warmup():
+            self._pygame.mixer.music.set_volume(volume)
 
 
 class AlertManager:
@@ -0,0 +1,421 @@
+"""
+State Snapshot - Binary snapshots and a delta journal of alert session state
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from models.schemas import AlertConfig, AlertType
+from services.leader_lock import FileLeaderLock
+from services.session_state import SessionState
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HGSS"
+VERSION = 2
+
+# magic, version, session count, config blob length, string table length,
+# created at, generation
+HEADER = struct.Struct("<4sHIIQdQ")
+# session id (offset, length), child id (offset, length), flags, start_time,
+# last_seen, leave_time, leave_duration, play_time, play_duration,
+# leave/play deadlines as epoch seconds (0 = no pending timer)
+RECORD = struct.Struct("<IHIHiqqqiqidd")
+# journal entry: kind, payload length, generation of the snapshot it follows
+ENTRY = struct.Struct("<BIQ")
+
+ENTRY_SESSION = 1
+ENTRY_DELETE = 2
+ENTRY_CONFIG = 3
+
+DEADLINE_TYPES = {"leave": AlertType.LEAVE_TOO_LONG, "play": AlertType.PLAY_WHILE_WORK}
+
+
+class StateSnapshotter:
+    """
+    Persists AlertService configs and sessions across restarts
+
+    A snapshot is a header, a JSON config blob, an array of fixed-size
+    session records and one string table, so restore is a single
+    ``struct.iter_unpack`` over an mmap. Between snapshots, sessions and
+    configs changed since the last flush are appended to a journal every
+    ``flush_interval`` seconds; restore replays it on top of the
+    snapshot. Pending leave/play deadlines are stored as wall-clock times
+    and rescheduled, so restarts no longer reset alert timers.
+
+    Each worker process holds its own sessions, so each writes its own
+    pair of files: it claims the lowest free slot with a file lock in
+    the snapshot directory (freed by the kernel when the process exits)
+    and a restarted worker takes over a dead one's slot and state.
+    Snapshots are numbered by generation and every journal entry carries
+    the generation it follows; entries older than the snapshot are
+    skipped, so a crash between writing a snapshot and truncating the
+    journal cannot replay stale changes over it.
+    """
+
+    def __init__(
+        self,
+        alert_service,
+        directory: Optional[str] = None,
+        snapshot_interval: Optional[float] = None,
+        flush_interval: Optional[float] = None,
+        slot: Optional[int] = None
+    ):
+        self.alert_service = alert_service
+        self.directory = directory or settings.STATE_SNAPSHOT_DIR
+        self.snapshot_interval = snapshot_interval or settings.STATE_SNAPSHOT_INTERVAL_SECONDS
+        self.flush_interval = flush_interval or settings.STATE_JOURNAL_FLUSH_SECONDS
+        # An explicit slot is trusted to be unique; otherwise one is claimed on first use
+        self.slot = slot
+        self._slot_lock: Optional[FileLeaderLock] = None
+        self.generation = 0
+        self._lock = asyncio.Lock()
+        self._journal = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, f"sessions-{self.slot}.snap")
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.directory, f"sessions-{self.slot}.journal")
+
+    async def _claim_slot(self):
+        if self.slot is not None:
+            return
+        for slot in itertools.count():
+            lock = FileLeaderLock(f"sessions-{slot}", self.directory)
+            if await lock.acquire():
+                self.slot, self._slot_lock = slot, lock
+                logger.info(f"State snapshots use slot {slot} in {self.directory}")
+                return
+
+    # ---------- encoding ----------
+
+    def _deadline(self, handle, now_wall: float, now_mono: float) -> float:
+        if handle is None or not handle.active:
+            return 0.0
+        return now_wall + (self.alert_service.timer_wheel.deadline(handle) - now_mono)
+
+    def _capture(self, session_id: str, state: SessionState, now_wall: float, now_mono: float) -> Tuple:
+        """
+        Plain-value copy of a session, cheap enough to take on the event loop
+        """
+        return (
+            session_id, state.child_id,
+            state.flags, state.start_time, state.last_seen,
+            state.leave_time, state.leave_duration,
+            state.play_time, state.play_duration,
+            self._deadline(state.leave_timer, now_wall, now_mono),
+            self._deadline(state.play_timer, now_wall, now_mono)
+        )
+
+    @staticmethod
+    def _pack(row: Tuple, strings: bytearray) -> bytes:
+        sid = row[0].encode("utf-8")
+        cid = row[1].encode("utf-8")
+        sid_offset = len(strings)
+        strings += sid
+        cid_offset = len(strings)
+        strings += cid
+        return RECORD.pack(sid_offset, len(sid), cid_offset, len(cid), *row[2:])
+
+    def _configs_blob(self, child_ids=None) -> bytes:
+        configs = self.alert_service.configs
+        ids = configs.keys() if child_ids is None else child_ids
+        return json.dumps(
+            [configs[c].model_dump(mode="json") for c in ids if c in configs],
+            ensure_ascii=False
+        ).encode("utf-8")
+
+    def _capture_snapshot(self) -> Tuple[List[Tuple], List[AlertConfig], float]:
+        """
+        Copy sessions and configs (call from the event loop thread)
+        """
+        now_wall, now_mono = time.time(), time.monotonic()
+        store = self.alert_service.session_states
+        # Store order is least recently seen first, which restore relies on
+        rows = [self._capture(session_id, store[session_id], now_wall, now_mono) for session_id in store]
+        return rows, list(self.alert_service.configs.values()), now_wall
+
+    @staticmethod
+    def _encode_snapshot(rows: List[Tuple], configs: List[AlertConfig], created_at: float, generation: int) -> bytes:
+        """
+        Pack captured state into the snapshot format (safe off the event loop)
+        """
+        strings = bytearray()
+        records = b"".join(StateSnapshotter._pack(row, strings) for row in rows)
+        blob = json.dumps(
+            [config.model_dump(mode="json") for config in configs], ensure_ascii=False
+        ).encode("utf-8")
+        header = HEADER.pack(
+            MAGIC, VERSION, len(rows), len(blob), len(strings), created_at, generation
+        )
+        return header + blob + records + bytes(strings)
+
+    def build_snapshot(self) -> bytes:
+        """
+        Encode the current state (call from the event loop thread)
+        """
+        rows, configs, created_at = self._capture_snapshot()
+        return self._encode_snapshot(rows, configs, created_at, self.generation + 1)
+
+    def _journal_entries(self) -> bytes:
+        service = self.alert_service
+        now_wall, now_mono = time.time(), time.monotonic()
+        chunks = []
+        if service.dirty_configs:
+            blob = self._configs_blob(service.dirty_configs)
+            chunks.append(ENTRY.pack(ENTRY_CONFIG, len(blob), self.generation) + blob)
+            service.dirty_configs.clear()
+        for session_id in service.dirty_sessions:
+            state = service.session_states.get(session_id)
+            if state is None:
+                sid = session_id.encode("utf-8")
+                chunks.append(ENTRY.pack(ENTRY_DELETE, len(sid), self.generation) + sid)
+                continue
+            strings = bytearray()
+            record = self._pack(self._capture(session_id, state, now_wall, now_mono), strings)
+            payload = record + bytes(strings)
+            chunks.append(ENTRY.pack(ENTRY_SESSION, len(payload), self.generation) + payload)
+        service.dirty_sessions.clear()
+        return b"".join(chunks)
+
+    # ---------- writing ----------
+
+    def _write_snapshot(self, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = f"{self.snapshot_path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        self.generation += 1
+        # Everything journaled so far is now in the snapshot (and older
+        # entries are skipped on restore should we crash right here)
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_path, "wb")
+
+    def _append_journal(self, data: bytes):
+        if self._journal is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._journal = open(self.journal_path, "ab")
+        self._journal.write(data)
+        self._journal.flush()
+
+    async def snapshot(self) -> int:
+        """
+        Write a full snapshot and truncate the journal
+        """
+        async with self._lock:
+            await self._claim_slot()
+            self.alert_service.dirty_sessions.clear()
+            self.alert_service.dirty_configs.clear()
+            rows, configs, created_at = self._capture_snapshot()
+            data = await asyncio.to_thread(
+                self._encode_snapshot, rows, configs, created_at, self.generation + 1
+            )
+            await asyncio.to_thread(self._write_snapshot, data)
+        logger.info(f"State snapshot written: {len(self.alert_service.session_states)} sessions, {len(data)} bytes")
+        return len(data)
+
+    async def flush(self) -> int:
+        """
+        Append changes since the last flush to the journal
+        """
+        async with self._lock:
+            await self._claim_slot()
+            data = self._journal_entries()
+            if data:
+                await asyncio.to_thread(self._append_journal, data)
+        return len(data)
+
+    # ---------- restore ----------
+
+    def _restore_session(self, session_id: str, child_id: str, fields: Tuple, now_wall: float, now_mono: float):
+        service = self.alert_service
+        previous = service.session_states.pop(session_id)
+        if previous is not None:
+            for handle in previous.timers():
+                service.timer_wheel.cancel(handle)
+        (flags, start_time, last_seen, leave_time, leave_duration,
+         play_time, play_duration, leave_deadline, play_deadline) = fields
+        state = SessionState(child_id, start_time)
+        state.flags = flags
+        state.last_seen = last_seen
+        state.leave_time = leave_time
+        state.leave_duration = leave_duration
+        state.play_time = play_time
+        state.play_duration = play_duration
+        for prefix, deadline in (("leave", leave_deadline), ("play", play_deadline)):
+            if deadline:
+                setattr(state, f"{prefix}_timer", service.timer_wheel.schedule(
+                    now_mono + (deadline - now_wall),
+                    (session_id, prefix, DEADLINE_TYPES[prefix])
+                ))
+        service.session_states.put(session_id, state, touch=False)
+
+    def _load_snapshot(self) -> Tuple[int, List[Dict]]:
+        if not os.path.exists(self.snapshot_path) or os.path.getsize(self.snapshot_path) < HEADER.size:
+            return 0, []
+        now_wall, now_mono = time.time(), time.monotonic()
+        with open(self.snapshot_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version = HEADER.unpack_from(mm, 0)[:2]
+            if magic != MAGIC or version != VERSION:
+                logger.warning(f"Ignoring unrecognized state snapshot {self.snapshot_path}")
+                return 0, []
+            _, _, count, config_len, strings_len, _, self.generation = HEADER.unpack_from(mm, 0)
+            offset = HEADER.size
+            configs = json.loads(mm[offset:offset + config_len])
+            records_start = offset + config_len
+            records_end = records_start + count * RECORD.size
+            strings = mm[records_end:records_end + strings_len]
+            view = memoryview(mm)
+            try:
+                for record in RECORD.iter_unpack(view[records_start:records_end]):
+                    sid_offset, sid_len, cid_offset, cid_len = record[:4]
+                    self._restore_session(
+                        strings[sid_offset:sid_offset + sid_len].decode("utf-8"),
+                        strings[cid_offset:cid_offset + cid_len].decode("utf-8"),
+                        record[4:],
+                        now_wall,
+                        now_mono
+                    )
+            finally:
+                view.release()
+        return count, configs
+
+    def _replay_journal(self) -> Tuple[int, List[Dict]]:
+        if not os.path.exists(self.journal_path):
+            return 0, []
+        now_wall, now_mono = time.time(), time.monotonic()
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+        configs = []
+        entries = 0
+        offset = 0
+        snapshot_generation = self.generation
+        # Latest entry per session: its record, or None once deleted
+        latest: Dict[str, Optional[Tuple[str, Tuple]]] = {}
+        while offset + ENTRY.size <= len(data):
+            kind, length, generation = ENTRY.unpack_from(data, offset)
+            start = offset + ENTRY.size
+            if start + length > len(data):
+                # Torn write at the tail from a crash mid-flush
+                break
+            payload = data[start:start + length]
+            offset = start + length
+            if generation < snapshot_generation:
+                # Already in the snapshot; left behind by a crash before truncation
+                continue
+            self.generation = max(self.generation, generation)
+            entries += 1
+            if kind == ENTRY_SESSION:
+                record = RECORD.unpack_from(payload, 0)
+                strings = payload[RECORD.size:]
+                sid_offset, sid_len, cid_offset, cid_len = record[:4]
+                session_id = strings[sid_offset:sid_offset + sid_len].decode("utf-8")
+                latest[session_id] = (strings[cid_offset:cid_offset + cid_len].decode("utf-8"), record[4:])
+            elif kind == ENTRY_DELETE:
+                latest[payload.decode("utf-8")] = None
+            elif kind == ENTRY_CONFIG:
+                configs.extend(json.loads(payload))
+
+        store = self.alert_service.session_states
+        for session_id, entry in latest.items():
+            if entry is None:
+                state = store.pop(session_id)
+                if state is not None:
+                    for handle in state.timers():
+                        self.alert_service.timer_wheel.cancel(handle)
+        # Eviction relies on oldest-first order, so insert by last_seen
+        # (field 2 of the record after the string offsets)
+        replayed = sorted(
+            ((session_id, entry) for session_id, entry in latest.items() if entry is not None),
+            key=lambda item: item[1][1][2]
+        )
+        for session_id, (child_id, fields) in replayed:
+            self._restore_session(session_id, child_id, fields, now_wall, now_mono)
+        if replayed:
+            # Merge with the snapshot's sessions, which may have been seen later
+            store.reorder()
+        return entries, configs
+
+    async def restore(self) -> Dict[str, int]:
+        """
+        Load the snapshot and replay the journal into the AlertService
+        """
+        started = time.perf_counter()
+        async with self._lock:
+            await self._claim_slot()
+            sessions, configs = self._load_snapshot()
+            entries, journal_configs = self._replay_journal()
+            for data in configs + journal_configs:
+                # Configs stored since the snapshot was taken take precedence
+                if await self.alert_service.shared_state.get_config(data["child_id"]) is None:
+                    await self.alert_service.update_config(AlertConfig(**data))
+            self.alert_service.dirty_sessions.clear()
+            self.alert_service.dirty_configs.clear()
+        result = {
+            "slot": self.slot,
+            "sessions": len(self.alert_service.session_states),
+            "snapshot_sessions": sessions,
+            "journal_entries": entries,
+            "configs": len(self.alert_service.configs),
+            "elapsed_ms": int((time.perf_counter() - started) * 1000)
+        }
+        logger.info(f"Alert state restored: {result}")
+        return result
+
+    # ---------- background ----------
+
+    def start(self):
+        """
+        Start periodic journal flushes and snapshots
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stop the background task and write a final snapshot
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        if self._slot_lock is not None:
+            await self._slot_lock.release()
+            self._slot_lock = None
+            self.slot = None
+
+    async def _run(self):
+        next_snapshot = time.monotonic() + self.snapshot_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if time.monotonic() >= next_snapshot:
+                    await self.snapshot()
+                    next_snapshot = time.monotonic() + self.snapshot_interval
+                else:
+                    await self.flush()
+            except Exception as e:
+                logger.error(f"State snapshot failed: {e}")
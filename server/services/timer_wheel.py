@@ -0,0 +1,127 @@
+"""
+Timer Wheel - Hierarchical timing wheel for deadline-based alerts
+"""
+
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+
+class TimerHandle:
+    """A scheduled timer; pass it to TimerWheel.cancel to drop it"""
+
+    __slots__ = ("deadline_tick", "payload", "level", "slot", "active")
+
+    def __init__(self, deadline_tick: int, payload: Any):
+        self.deadline_tick = deadline_tick
+        self.payload = payload
+        self.level = 0
+        self.slot = 0
+        self.active = True
+
+
+class TimerWheel:
+    """
+    Hierarchical timing wheel
+
+    Level 0 has one slot per tick; each higher level covers ``slots``
+    times the span of the level below and is cascaded down when the
+    lower level wraps. Scheduling and cancelling are O(1), and advancing
+    costs O(1) per tick plus the timers that actually expire or cascade,
+    independent of how many timers are pending.
+    """
+
+    def __init__(
+        self,
+        tick_seconds: float = 1.0,
+        slots: int = 256,
+        levels: int = 4,
+        start: Optional[float] = None
+    ):
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self._origin = time.monotonic() if start is None else start
+        self._tick = 0
+        self._max_delta = slots ** levels - 1
+        self._wheels: List[List[Dict[TimerHandle, None]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def schedule(self, deadline: float, payload: Any) -> TimerHandle:
+        """
+        Schedule ``payload`` to expire at ``deadline`` (monotonic seconds)
+        """
+        deadline_tick = math.ceil((deadline - self._origin) / self.tick_seconds)
+        # Anything already due fires on the next tick
+        deadline_tick = max(deadline_tick, self._tick + 1)
+        handle = TimerHandle(deadline_tick, payload)
+        self._insert(handle)
+        self._count += 1
+        return handle
+
+    def cancel(self, handle: Optional[TimerHandle]):
+        """
+        Cancel a pending timer (no-op if it already fired or was cancelled)
+        """
+        if handle is None or not handle.active:
+            return
+        self._wheels[handle.level][handle.slot].pop(handle, None)
+        handle.active = False
+        self._count -= 1
+
+    def deadline(self, handle: TimerHandle) -> float:
+        """
+        Monotonic time at which ``handle`` expires
+        """
+        return self._origin + handle.deadline_tick * self.tick_seconds
+
+    def advance(self, now: Optional[float] = None) -> List[Any]:
+        """
+        Move the wheel to ``now`` and return payloads of expired timers
+        """
+        now = time.monotonic() if now is None else now
+        target = math.floor((now - self._origin) / self.tick_seconds)
+        expired = []
+        while self._tick < target:
+            self._tick += 1
+            self._cascade()
+            bucket = self._wheels[0][self._tick % self.slots]
+            if bucket:
+                self._wheels[0][self._tick % self.slots] = {}
+                for handle in bucket:
+                    handle.active = False
+                    expired.append(handle.payload)
+                self._count -= len(bucket)
+        return expired
+
+    def _insert(self, handle: TimerHandle):
+        delta = min(handle.deadline_tick - self._tick, self._max_delta)
+        tick = self._tick + delta
+        level = 0
+        span = self.slots
+        while delta >= span and level < self.levels - 1:
+            level += 1
+            span *= self.slots
+        slot = (tick // self.slots ** level) % self.slots
+        handle.level = level
+        handle.slot = slot
+        self._wheels[level][slot][handle] = None
+
+    def _cascade(self):
+        # Re-file timers from higher levels whose span starts at this tick
+        span = 1
+        for level in range(1, self.levels):
+            span *= self.slots
+            if self._tick % span:
+                break
+            slot = (self._tick // span) % self.slots
+            bucket = self._wheels[level][slot]
+            if bucket:
+                self._wheels[level][slot] = {}
+                for handle in bucket:
+                    self._insert(handle)
@@ -0,0 +1,243 @@
+"""
+Tests for upload admission control
+"""
+
+import json
+
+import pytest
+
+from api.admission import AdmissionMiddleware
+from services.admission import (
+    DISK_FULL,
+    GPU_MEMORY_PRESSURE,
+    MEMORY_PRESSURE,
+    QUEUE_FULL,
+    TOO_LARGE,
+    AdmissionController
+)
+
+
+class FakeJobs:
+    """Stands in for the video FairScheduler"""
+
+    def __init__(self, queued=0, running=0, rate=0.0):
+        self.queued = queued
+        self.running = running
+        self.rate = rate
+
+    def depth(self):
+        return self.queued
+
+    def drain_rate(self):
+        return self.rate
+
+
+class FakeTelemetry:
+    def __init__(self, sample):
+        self.sample = sample
+
+    def latest(self):
+        return self.sample
+
+
+def make_controller(tmp_path, jobs=None, sample=None, **kwargs):
+    options = dict(
+        upload_dir=str(tmp_path), max_upload_size=1000, max_queue=4,
+        min_free_disk_gb=0.0, max_memory_percent=90.0, min_gpu_free_gb=0.5,
+        retry_min_seconds=1, retry_max_seconds=120, enabled=True
+    )
+    options.update(kwargs)
+    telemetry = FakeTelemetry(sample or {"memory": {"percent": 50.0}, "devices": []})
+    return AdmissionController(jobs or FakeJobs(), telemetry=telemetry, **options)
+
+
+class TestAdmissionController:
+    """Test admission decisions and Retry-After hints"""
+
+    def test_admits_under_limits(self, tmp_path):
+        """Test that a normal upload is admitted and tracked until released"""
+        controller = make_controller(tmp_path)
+        assert controller.admit(500) is None
+        assert controller.in_flight == 1
+        controller.release()
+        assert controller.stats()["admitted"] == 1
+
+    def test_oversize_rejected_even_when_disabled(self, tmp_path):
+        """Test that the size limit holds regardless of load shedding"""
+        controller = make_controller(tmp_path, enabled=False)
+        rejection = controller.admit(1001)
+        assert rejection.status_code == 413
+        assert rejection.reason == TOO_LARGE
+
+    def test_queue_full_retry_after_from_drain_rate(self, tmp_path):
+        """Test 429 with the time the excess jobs take to drain"""
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=6, rate=0.5))
+        rejection = controller.admit(100)
+        assert rejection.status_code == 429
+        assert rejection.reason == QUEUE_FULL
+        # 3 jobs must finish before there is room, at one every 2 seconds
+        assert rejection.retry_after == 6
+
+    def test_retry_after_clamped(self, tmp_path):
+        """Test Retry-After bounds, and the maximum when nothing has drained yet"""
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=4, rate=100.0))
+        assert controller.admit(100).retry_after == 1
+        controller.jobs.rate = 0.0
+        assert controller.admit(100).retry_after == 120
+
+    def test_in_flight_uploads_count_toward_queue(self, tmp_path):
+        """Test that uploads still streaming in take queue slots"""
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=2))
+        assert controller.admit(100) is None
+        assert controller.admit(100) is None
+        assert controller.admit(100).reason == QUEUE_FULL
+
+    def test_disk_full(self, tmp_path):
+        """Test 503 when the upload would leave too little disk"""
+        controller = make_controller(tmp_path, min_free_disk_gb=1e9)
+        rejection = controller.admit(100)
+        assert rejection.status_code == 503
+        assert rejection.reason == DISK_FULL
+
+    def test_memory_pressure(self, tmp_path):
+        """Test 503 under host memory pressure, with a drain-based hint"""
+        controller = make_controller(
+            tmp_path, jobs=FakeJobs(queued=1, running=1, rate=1.0),
+            sample={"memory": {"percent": 95.0}, "devices": []}
+        )
+        rejection = controller.admit(100)
+        assert rejection.status_code == 503
+        assert rejection.reason == MEMORY_PRESSURE
+        assert rejection.retry_after == 2
+
+    def test_gpu_memory_pressure(self, tmp_path):
+        """Test 503 only when no GPU has enough free memory"""
+        sample = {"memory": {"percent": 10.0}, "devices": [{"memory_free": 0.1}, {"memory_free": 4.0}]}
+        controller = make_controller(tmp_path, sample=sample)
+        assert controller.admit(100) is None
+        sample["devices"][1]["memory_free"] = 0.2
+        assert controller.admit(100).reason == GPU_MEMORY_PRESSURE
+
+
+async def run_asgi(middleware, body_chunks, headers=(), path="/api/v1/upload/video"):
+    """Send one POST through the middleware; returns (status, headers, body, app_body)"""
+    scope = {
+        "type": "http", "method": "POST", "path": path,
+        "headers": [(k.encode(), v.encode()) for k, v in headers]
+    }
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+        for i, chunk in enumerate(body_chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+def make_app(seen):
+    async def app(scope, receive, send):
+        data = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                seen.append(("disconnect", data))
+                return
+            data += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        seen.append(("complete", data))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    return app
+
+
+class TestAdmissionMiddleware:
+    """Test early rejection in the ASGI layer"""
+
+    @pytest.mark.asyncio
+    async def test_rejects_from_content_length_without_reading(self, tmp_path):
+        """Test that an oversize Content-Length never reaches the app"""
+        seen = []
+        middleware = AdmissionMiddleware(make_app(seen), make_controller(tmp_path))
+        status, _, body = await run_asgi(middleware, [b"x" * 10], [("content-length", "5000")])
+        assert status == 413
+        assert json.loads(body)["reason"] == TOO_LARGE
+        assert seen == []
+
+    @pytest.mark.asyncio
+    async def test_overload_sets_retry_after(self, tmp_path):
+        """Test that load rejections carry the Retry-After header and JSON hint"""
+        seen = []
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=4, rate=0.25))
+        middleware = AdmissionMiddleware(make_app(seen), controller)
+        status, headers, body = await run_asgi(middleware, [b"x"], [("content-length", "1")])
+        assert status == 429
+        assert headers[b"retry-after"] == b"4"
+        assert json.loads(body) == {"detail": "4 video jobs queued", "reason": QUEUE_FULL, "retry_after": 4}
+        assert seen == []
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_cut_off_at_limit(self, tmp_path):
+        """Test that a body without Content-Length is stopped once it passes the limit"""
+        seen = []
+        controller = make_controller(tmp_path)
+        middleware = AdmissionMiddleware(make_app(seen), controller)
+        status, _, _ = await run_asgi(middleware, [b"x" * 600, b"x" * 600, b"x" * 600])
+        assert status == 413
+        assert seen == [("disconnect", b"x" * 600)]
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_admitted_upload_passes_through(self, tmp_path):
+        """Test that admitted uploads reach the app and free their slot"""
+        seen = []
+        controller = make_controller(tmp_path)
+        middleware = AdmissionMiddleware(make_app(seen), controller)
+        status, _, body = await run_asgi(middleware, [b"ab", b"cd"], [("content-length", "4")])
+        assert status == 200
+        assert body == b"ok"
+        assert seen == [("complete", b"abcd")]
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_other_paths_untouched(self, tmp_path):
+        """Test that only the configured upload paths are checked"""
+        seen = []
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=100))
+        middleware = AdmissionMiddleware(make_app(seen), controller)
+        status, _, _ = await run_asgi(middleware, [b"{}"], path="/api/v1/upload/metadata")
+        assert status == 200
+        assert controller.stats()["admitted"] == 0
+
+
+    @pytest.mark.asyncio
+    async def test_frames_size_checked_but_never_shed(self, tmp_path):
+        """Test that frame uploads get their own size cap and skip the job queue"""
+        seen = []
+        controller = make_controller(tmp_path, jobs=FakeJobs(queued=100))
+        middleware = AdmissionMiddleware(
+            make_app(seen), controller, size_limits={"/api/v1/upload/frame": 100}
+        )
+        path = "/api/v1/upload/frame"
+        status, _, _ = await run_asgi(middleware, [b"x" * 50], [("content-length", "50")], path=path)
+        assert status == 200
+
+        status, _, body = await run_asgi(middleware, [b"x" * 10], [("content-length", "500")], path=path)
+        assert status == 413 and json.loads(body)["reason"] == TOO_LARGE
+        status, _, _ = await run_asgi(middleware, [b"x" * 60, b"x" * 60], path=path)
+        assert status == 413
+        assert seen == [("complete", b"x" * 50), ("disconnect", b"x" * 60)]
+        assert controller.stats()["admitted"] == 0 and controller.in_flight == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
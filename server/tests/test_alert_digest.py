@@ -0,0 +1,112 @@
+"""
+Unit Tests for Alert Digest Coalescing
+"""
+
+import time
+import pytest
+from services.alert_digest import AlertDigest
+from services.notification_outbox import (
+    NotificationOutbox,
+    NotificationDispatcher,
+    KIND_ALERT,
+    KIND_ALERT_DIGEST
+)
+
+
+class TestAlertDigest:
+    """Test per-recipient coalescing of alerts"""
+
+    @pytest.fixture
+    def outbox(self, tmp_path):
+        outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+        yield outbox
+        outbox.close()
+
+    @pytest.fixture
+    def digest(self, outbox):
+        return AlertDigest(outbox, window_seconds=60, max_alerts=3, urgent_types=["leave_too_long"])
+
+    @pytest.mark.asyncio
+    async def test_alerts_wait_for_window(self, outbox, digest):
+        """Test that non-urgent alerts are held for the coalescing window"""
+        await digest.queue("parent@example.com", "play_while_work", "child_001", "玩耍时间: 5 分钟")
+
+        assert outbox.claim_due(10) == []
+        assert len(outbox.claim_due(10, now=time.time() + 61)) == 1
+
+    @pytest.mark.asyncio
+    async def test_window_flushes_single_digest(self, outbox, digest):
+        """Test that alerts within one window become one digest per recipient"""
+        await digest.queue("parent@example.com", "play_while_work", "child_001", "a")
+        await digest.queue("parent@example.com", "session_end", "child_002", "b")
+        await digest.queue("other@example.com", "play_while_work", "child_003", "c")
+
+        items = outbox.claim_due(10, now=time.time() + 61)
+        by_recipient = {item["recipient"]: item for item in items}
+
+        assert by_recipient["parent@example.com"]["kind"] == KIND_ALERT_DIGEST
+        assert [a["details"] for a in by_recipient["parent@example.com"]["payload"]["alerts"]] == ["a", "b"]
+        assert by_recipient["other@example.com"]["kind"] == KIND_ALERT
+
+    @pytest.mark.asyncio
+    async def test_max_alerts_flushes_early(self, outbox, digest):
+        """Test that a full digest is sent without waiting for the window"""
+        for i in range(3):
+            await digest.queue("parent@example.com", "play_while_work", f"child_{i}", str(i))
+
+        items = outbox.claim_due(10)
+
+        assert len(items) == 1
+        assert len(items[0]["ids"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_urgent_alert_bypasses_window(self, outbox, digest):
+        """Test that urgent alerts are due at once and carry waiting alerts"""
+        await digest.queue("parent@example.com", "play_while_work", "child_001", "waiting")
+        await digest.queue("parent@example.com", "leave_too_long", "child_002", "urgent")
+
+        items = outbox.claim_due(10)
+
+        assert len(items) == 1
+        alert_types = [a["alert_type"] for a in items[0]["payload"]["alerts"]]
+        assert alert_types == ["play_while_work", "leave_too_long"]
+
+    @pytest.mark.asyncio
+    async def test_failed_digest_keeps_all_alerts(self, outbox, digest):
+        """Test that a failed digest retries every alert it contained"""
+        await digest.queue("parent@example.com", "play_while_work", "child_001", "a")
+        await digest.queue("parent@example.com", "leave_too_long", "child_002", "b")
+        item = outbox.claim_due(10)[0]
+
+        outbox.mark_failed(item["ids"], 1, "smtp down", time.time())
+
+        retried = outbox.claim_due(10)
+        assert len(retried) == 1
+        assert sorted(retried[0]["ids"]) == sorted(item["ids"])
+
+
+    @pytest.mark.asyncio
+    async def test_dispatcher_sends_one_digest_email(self, outbox, digest):
+        """Test that the dispatcher delivers a coalesced group as one email"""
+        class DigestEmailService:
+            def __init__(self):
+                self.digests = []
+
+            async def send_alert_digest(self, to_email, alerts, locale=None):
+                self.digests.append((to_email, alerts))
+                return True
+
+        email_service = DigestEmailService()
+        dispatcher = NotificationDispatcher(outbox, email_service)
+        for i in range(3):
+            await digest.queue("parent@example.com", "play_while_work", f"child_{i}", str(i))
+
+        await dispatcher.drain_once()
+
+        assert len(email_service.digests) == 1
+        assert len(email_service.digests[0][1]) == 3
+        assert outbox.count_pending("digest:parent@example.com") == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -2,27 +2,29 @@
 Unit Tests for Alert Service
 """
 
+import time
 import pytest
 from datetime import datetime
 from services.alert_service import AlertService
-from models.schemas import AlertConfig, AlertType
-from pydantic import EmailStr
+from services.notification_outbox import NotificationOutbox
+from services.session_state import SessionState
+from models.schemas import ActivityType, AlertConfig, AlertRule, WindowRule, AlertType
 
 
 class TestAlertService:
     """Test alert monitoring and triggering"""
     
     @pytest.fixture
-    def alert_service(self):
+    def alert_service(self, tmp_path):
         """Create alert service instance"""
-        return AlertService()
+        return AlertService(NotificationOutbox(str(tmp_path / "outbox.db")))
     
     @pytest.fixture
     def sample_config(self):
         """Create sample alert config"""
         return AlertConfig(
             child_id="child_001",
-            email=EmailStr("parent@example.com"),
+            email="parent@example.com",
             leave_threshold_minutes=15,
             play_while_work_threshold_minutes=5,
             enable_email=False  # Disable email for testing
@@ -41,8 +43,8 @@ class TestAlertService:
         await alert_service.start_session("session_001", "child_001")
         
         state = alert_service.session_states["session_001"]
-        assert state["is_active"] == True
-        assert state["child_id"] == "child_001"
+        assert state.is_active == True
+        assert state.child_id == "child_001"
         
     @pytest.mark.asyncio
     async def test_session_end(self, alert_service, sample_config):
@@ -52,7 +54,7 @@ class TestAlertService:
         await alert_service.end_session("session_001")
         
         state = alert_service.session_states["session_001"]
-        assert state["is_active"] == False
+        assert state.is_active == False
         
     @pytest.mark.asyncio
     async def test_leave_alert_trigger(self, alert_service, sample_config):
@@ -113,7 +115,111 @@ class TestAlertService:
         
         # Leave time should be reset
         state = alert_service.session_states["session_001"]
-        assert state.get("leave_time") is None
+        assert state.leave_time == 0
+        status = await alert_service.get_status("session_001")
+        assert status["leave_time"] is None
+
+        
+    @pytest.mark.asyncio
+    async def test_alert_is_queued_not_sent_inline(self, alert_service, sample_config):
+        """Test that triggered alerts land in the outbox for the dispatcher"""
+        sample_config.leave_threshold_minutes = 1
+        sample_config.enable_email = True
+        await alert_service.update_config(sample_config)
+        await alert_service.start_session("session_001", "child_001")
+        
+        await alert_service.check_and_trigger("session_001", "child_001", "away", 30)
+        await alert_service.check_and_trigger("session_001", "child_001", "away", 40)
+        
+        # The urgent leave alert flushes the waiting session-start alert with it
+        items = alert_service.outbox.claim_due(10)
+        assert len(items) == 1
+        alert_types = [alert["alert_type"] for alert in items[0]["payload"]["alerts"]]
+        assert alert_types == ["session_start", "leave_too_long"]
+
+        
+    @pytest.mark.asyncio
+    async def test_leave_alert_fires_without_new_events(self, alert_service, sample_config):
+        """Test that the leave deadline fires when the device stops reporting"""
+        sample_config.leave_threshold_minutes = 1
+        await alert_service.update_config(sample_config)
+        await alert_service.start_session("session_001", "child_001")
+        
+        alerts = await alert_service.check_and_trigger("session_001", "child_001", "away", 10)
+        assert alerts == []
+        
+        assert await alert_service.process_timers(time.monotonic() + 30) == []
+        assert await alert_service.process_timers(time.monotonic() + 52) == ["session_001"]
+        status = await alert_service.get_status("session_001")
+        assert status["alerts_sent"] == ["leave_too_long"]
+        
+    @pytest.mark.asyncio
+    async def test_return_cancels_deadline(self, alert_service, sample_config):
+        """Test that returning to study cancels the pending leave deadline"""
+        sample_config.leave_threshold_minutes = 1
+        await alert_service.update_config(sample_config)
+        await alert_service.start_session("session_001", "child_001")
+        
+        await alert_service.check_and_trigger("session_001", "child_001", "away", 10)
+        await alert_service.check_and_trigger("session_001", "child_001", "studying", 10)
+        
+        assert len(alert_service.timer_wheel) == 0
+        assert await alert_service.process_timers(time.monotonic() + 120) == []
+
+        
+    @pytest.mark.asyncio
+    async def test_window_rule_catches_alternating_play(self, alert_service, sample_config):
+        """Test that short play bursts separated by study add up in a window"""
+        sample_config.window_rules = [WindowRule(
+            threshold_minutes=5, window_minutes=20, alert_type=AlertType.PLAY_WHILE_WORK
+        )]
+        await alert_service.update_config(sample_config)
+        await alert_service.start_session("session_001", "child_001")
+        
+        triggered = []
+        for _ in range(2):
+            triggered += await alert_service.check_and_trigger("session_001", "child_001", "studying", 60)
+            triggered += await alert_service.check_and_trigger("session_001", "child_001", "playing", 240)
+            
+        # Each burst is under the consecutive threshold; together they reach 8 min
+        assert triggered == ["play_while_work"]
+        
+    @pytest.mark.asyncio
+    async def test_window_rule_rearms_after_window(self, alert_service, sample_config):
+        """Test that a window rule alerts again once the window has drained"""
+        sample_config.window_rules = [WindowRule(
+            threshold_minutes=5, window_minutes=20, alert_type=AlertType.PLAY_WHILE_WORK
+        )]
+        await alert_service.update_config(sample_config)
+        state = SessionState("child_001", 0)
+        
+        first = await alert_service._check_window_rules(state, sample_config, "s", "playing", 300, now=0)
+        again = await alert_service._check_window_rules(state, sample_config, "s", "playing", 300, now=60)
+        drained = await alert_service._check_window_rules(state, sample_config, "s", "studying", 60, now=1500)
+        later = await alert_service._check_window_rules(state, sample_config, "s", "playing", 300, now=1560)
+        
+        assert first == ["play_while_work"]
+        assert again == []
+        assert drained == []
+        assert later == ["play_while_work"]
+
+        
+    @pytest.mark.asyncio
+    async def test_declarative_rule_triggers_alert(self, alert_service, sample_config):
+        """Test that AlertConfig.rules are compiled and evaluated per event"""
+        sample_config.rules = [AlertRule(
+            rule_id="idle_long",
+            activities=[ActivityType.IDLE],
+            threshold_minutes=2
+        )]
+        await alert_service.update_config(sample_config)
+        await alert_service.start_session("session_001", "child_001")
+        
+        first = await alert_service.check_and_trigger("session_001", "child_001", "idle", 90)
+        second = await alert_service.check_and_trigger("session_001", "child_001", "idle", 90)
+        
+        assert first == []
+        assert second == ["custom"]
 
 
 if __name__ == "__main__":
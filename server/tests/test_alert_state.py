@@ -0,0 +1,278 @@
+"""
+Unit Tests for Shared Alert State
+"""
+
+import asyncio
+import time
+
+import pytest
+from models.schemas import ActivityType, AlertConfig, AlertRule, AlertType, WindowRule
+from services.alert_service import AlertService
+from services.alert_state import (
+    AlertStateStore,
+    InMemoryAlertStateBackend,
+    LocalConfigBus,
+    RedisAlertStateBackend,
+    RedisConfigBus
+)
+from services.notification_outbox import NotificationOutbox
+
+
+def make_backend(kind):
+    if kind == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")  # fakeredis needs it to run Lua scripts
+        return RedisAlertStateBackend(fakeredis.FakeAsyncRedis(), ttl_seconds=3600)
+    return InMemoryAlertStateBackend(ttl_seconds=3600)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    return make_backend(request.param)
+
+
+@pytest.fixture(params=["memory", "redis"])
+def shared_backend(request):
+    if request.param == "memory":
+        return InMemoryAlertStateBackend(ttl_seconds=3600, shared=True)
+    return make_backend("redis")
+
+
+@pytest.fixture
+def config():
+    return AlertConfig(
+        child_id="child_001",
+        email="parent@example.com",
+        leave_threshold_minutes=1,
+        enable_email=False
+    )
+
+
+class TestAlertStateStore:
+    """Test atomic flag claims and the read-through config cache"""
+
+    @pytest.mark.asyncio
+    async def test_claim_is_exclusive(self, backend):
+        """Test that each alert flag can be claimed once per session"""
+        store = AlertStateStore(backend)
+
+        assert await store.claim_alert("s1", AlertType.LEAVE_TOO_LONG) is True
+        assert await store.claim_alert("s1", AlertType.LEAVE_TOO_LONG) is False
+        assert await store.claim_alert("s1", AlertType.PLAY_WHILE_WORK) is True
+        assert await store.claim_alert("s2", AlertType.LEAVE_TOO_LONG) is True
+        assert await backend.get_flags("s1") == 0b110
+
+        await store.reset_session("s1")
+        assert await store.claim_alert("s1", AlertType.LEAVE_TOO_LONG) is True
+
+    @pytest.mark.asyncio
+    async def test_config_read_through(self, backend, config):
+        """Test that a worker sees another worker's config after the cache TTL"""
+        writer = AlertStateStore(backend, cache_ttl_seconds=0)
+        reader = AlertStateStore(backend, cache_ttl_seconds=0)
+        assert await reader.get_config("child_001") is None
+
+        await writer.put_config(config)
+        first = await reader.get_config("child_001")
+        second = await reader.get_config("child_001")
+
+        assert first.email == "parent@example.com"
+        # Unchanged JSON keeps the same object
+        assert first is second
+
+    @pytest.mark.asyncio
+    async def test_local_cache_serves_until_ttl(self, config):
+        """Test that cached configs avoid backend reads until they expire"""
+        now = [0.0]
+        backend = InMemoryAlertStateBackend(ttl_seconds=3600)
+        store = AlertStateStore(backend, cache_ttl_seconds=10, clock=lambda: now[0])
+        await store.put_config(config)
+        await backend.set_config("child_001", config.model_copy(update={"leave_threshold_minutes": 5}).model_dump_json())
+
+        assert (await store.get_config("child_001")).leave_threshold_minutes == 1
+        now[0] = 11
+        assert (await store.get_config("child_001")).leave_threshold_minutes == 5
+
+
+class CountingBackend(InMemoryAlertStateBackend):
+    """Counts per-child config reads, the calls the cache should avoid"""
+
+    def __init__(self):
+        super().__init__(ttl_seconds=3600)
+        self.config_reads = 0
+
+    async def get_config(self, child_id):
+        self.config_reads += 1
+        return await super().get_config(child_id)
+
+
+class TestConfigCache:
+    """Test startup loading and change notifications"""
+
+    async def wait_for(self, predicate, timeout=1.0):
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not predicate():
+            assert asyncio.get_running_loop().time() < deadline
+            await asyncio.sleep(0.005)
+
+    @pytest.mark.asyncio
+    async def test_loads_all_and_serves_from_memory(self, config):
+        """Test that started caches never read configs on the hot path"""
+        backend = CountingBackend()
+        await backend.set_config("child_001", config.model_dump_json())
+        store = AlertStateStore(backend, bus=LocalConfigBus())
+
+        assert await store.start() == 1
+        for _ in range(100):
+            assert (await store.get_config("child_001")).email == "parent@example.com"
+        assert await store.get_config("unknown") is None
+        assert backend.config_reads == 0
+        await store.stop()
+
+    @pytest.mark.asyncio
+    async def test_change_reaches_other_workers(self, config):
+        """Test that a config update is pushed to every subscribed cache"""
+        backend = InMemoryAlertStateBackend(ttl_seconds=3600)
+        bus = LocalConfigBus()
+        writer = AlertStateStore(backend, bus=bus)
+        reader = AlertStateStore(backend, bus=bus)
+        await writer.start()
+        await reader.start()
+
+        await writer.put_config(config)
+        await self.wait_for(lambda: reader._configs.get("child_001") is not None)
+        await writer.put_config(config.model_copy(update={"leave_threshold_minutes": 9}))
+        await self.wait_for(
+            lambda: reader._configs["child_001"][2].leave_threshold_minutes == 9
+        )
+
+        await writer.stop()
+        await reader.stop()
+
+    @pytest.mark.asyncio
+    async def test_redis_pubsub_bus(self, config):
+        """Test change notifications over Redis pub/sub"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        client = fakeredis.FakeAsyncRedis()
+        backend = RedisAlertStateBackend(client, ttl_seconds=3600)
+        writer = AlertStateStore(backend, bus=RedisConfigBus(client))
+        reader = AlertStateStore(backend, bus=RedisConfigBus(client))
+        # start returns only once subscribed, so the first change is never missed
+        await writer.start()
+        await reader.start()
+
+        await writer.put_config(config)
+        await self.wait_for(lambda: reader._configs.get("child_001") is not None, timeout=3.0)
+
+        await writer.stop()
+        await reader.stop()
+
+    @pytest.mark.asyncio
+    async def test_redis_bus_reconnects_and_reloads(self, config):
+        """Test that a dropped subscription falls back to reads and reloads on return"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        server = fakeredis.FakeServer()
+        client = fakeredis.FakeAsyncRedis(server=server)
+        backend = RedisAlertStateBackend(client, ttl_seconds=3600)
+        store = AlertStateStore(backend, bus=RedisConfigBus(client, reconnect_min_seconds=0.2))
+        await store.start()
+
+        server.connected = False
+        await self.wait_for(lambda: not store.subscribed, timeout=3.0)
+        server.connected = True
+        # Stored while nobody was listening: no notification will ever arrive
+        await backend.set_config(config.child_id, config.model_dump_json())
+
+        await self.wait_for(lambda: store.subscribed, timeout=3.0)
+        assert store._configs["child_001"][2].email == "parent@example.com"
+        await store.stop()
+
+
+class TestMultiWorkerAlerts:
+    """Two AlertService instances sharing one backend behave like two workers"""
+
+    @pytest.mark.asyncio
+    async def test_alert_fires_once_across_workers(self, backend, config, tmp_path):
+        """Test that the same session alert is not double-fired"""
+        outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+        workers = [
+            AlertService(outbox, AlertStateStore(backend, cache_ttl_seconds=0))
+            for _ in range(2)
+        ]
+        await workers[0].update_config(config)
+
+        fired = []
+        for worker in workers:
+            fired += await worker.check_and_trigger("session_001", "child_001", "away", 120)
+
+        assert fired == ["leave_too_long"]
+        # The second worker learned the config from the shared backend
+        assert "child_001" in workers[1].configs
+        outbox.close()
+
+    def make_workers(self, backend, tmp_path):
+        outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+        workers = [
+            AlertService(outbox, AlertStateStore(backend, cache_ttl_seconds=0))
+            for _ in range(2)
+        ]
+        return outbox, workers
+
+    @pytest.mark.asyncio
+    async def test_run_split_across_workers(self, shared_backend, config, tmp_path):
+        """Test that a run adds up even when no worker sees all of it"""
+        outbox, workers = self.make_workers(shared_backend, tmp_path)
+        await workers[0].update_config(config)
+
+        assert await workers[0].check_and_trigger("s1", "child_001", "away", 40) == []
+        assert await workers[1].check_and_trigger("s1", "child_001", "away", 40) == ["leave_too_long"]
+        assert await workers[0].check_and_trigger("s1", "child_001", "away", 40) == []
+
+        # Studying on one worker ends the run for both
+        await workers[0].check_and_trigger("s2", "child_001", "away", 40)
+        await workers[1].check_and_trigger("s2", "child_001", "studying", 10)
+        assert await workers[0].check_and_trigger("s2", "child_001", "away", 40) == []
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_rules_fire_once_across_workers(self, shared_backend, config, tmp_path):
+        """Test that rule and window alerts are decided once for all workers"""
+        outbox, workers = self.make_workers(shared_backend, tmp_path)
+        config.window_rules = [WindowRule(
+            activities=[ActivityType.IDLE], threshold_minutes=2, window_minutes=20,
+            alert_type=AlertType.LEAVE_TOO_LONG
+        )]
+        config.rules = [AlertRule(
+            rule_id="idle_run", activities=[ActivityType.IDLE], threshold_minutes=1,
+            alert_type=AlertType.LEAVE_TOO_LONG
+        )]
+        await workers[0].update_config(config)
+        await workers[1].load_configs()
+
+        fired = []
+        for i in range(6):
+            fired += await workers[i % 2].check_and_trigger("s1", "child_001", "idle", 30)
+        # The rule fires once at 60s and the window once at 120s
+        assert fired == ["leave_too_long", "leave_too_long"]
+        await workers[1].stop()
+        outbox.close()
+
+    @pytest.mark.asyncio
+    async def test_deadline_skipped_after_run_ends_elsewhere(self, shared_backend, config, tmp_path):
+        """Test that a worker's deadline does not fire for a run another worker ended"""
+        outbox, workers = self.make_workers(shared_backend, tmp_path)
+        await workers[0].update_config(config)
+
+        await workers[0].check_and_trigger("s1", "child_001", "away", 30)
+        await workers[1].check_and_trigger("s1", "child_001", "studying", 10)
+        assert await workers[0].process_timers(time.monotonic() + 120) == []
+
+        await workers[0].check_and_trigger("s2", "child_001", "away", 30)
+        assert await workers[0].process_timers(time.monotonic() + 240) == ["s2"]
+        outbox.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,125 @@
+"""
+Unit Tests for CPU Inference Optimization
+"""
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from services.cpu_inference import (
+    CHANNELS_LAST,
+    EAGER,
+    INT8_DYNAMIC,
+    TORCHSCRIPT,
+    CPUInferenceOptimizer,
+    tune_threads
+)
+from services.model_cache import ModelArtifactCache
+from services.gpu_detector import GPUDetector
+
+
+def make_model():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 8, 3, padding=1),
+        torch.nn.ReLU(),
+        torch.nn.AdaptiveAvgPool2d(4),
+        torch.nn.Flatten(),
+        torch.nn.Linear(128, 64),
+        torch.nn.ReLU(),
+        torch.nn.Linear(64, 4)
+    )
+
+
+class TestCPUInference:
+    """Test CPU candidate selection and the decision cache"""
+
+    @pytest.fixture
+    def optimizer(self, tmp_path):
+        return CPUInferenceOptimizer(
+            cache_path=str(tmp_path / "cpu.json"),
+            runs=3,
+            max_error=1.0,
+            artifacts=ModelArtifactCache(str(tmp_path / "artifacts"))
+        )
+
+    @pytest.fixture
+    def example(self):
+        return torch.randn(1, 3, 16, 16)
+
+    def test_tune_threads(self):
+        threads = tune_threads(1)
+        assert threads["intra_op"] == 1
+
+    def test_benchmark_covers_applicable_candidates(self, optimizer, example):
+        """Test that eager, channels_last, dynamic int8 and TorchScript are all timed"""
+        results = optimizer.benchmark(make_model().eval(), example)
+        assert {EAGER, CHANNELS_LAST, INT8_DYNAMIC, TORCHSCRIPT} <= set(results)
+        assert results[CHANNELS_LAST]["error"] < 1e-4
+        assert results[TORCHSCRIPT]["error"] < 1e-4
+
+    def test_int8_skipped_without_linear_layers(self, optimizer, example):
+        """Test that dynamic quantization is only tried where it applies"""
+        model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3)).eval()
+        assert INT8_DYNAMIC not in optimizer.benchmark(model, example)
+
+    def test_optimized_model_matches_eager(self, optimizer, example):
+        """Test that the chosen variant gives the eager outputs"""
+        model = make_model().eval()
+        with torch.inference_mode():
+            expected = model(example)
+        optimized = optimizer.optimize(make_model(), example)
+        with torch.inference_mode():
+            assert torch.allclose(optimized(example), expected, atol=0.1)
+
+    def test_inaccurate_candidates_rejected(self, tmp_path, example):
+        """Test that a candidate drifting past max_error is never chosen"""
+        optimizer = CPUInferenceOptimizer(cache_path=str(tmp_path / "cpu.json"), runs=3, max_error=0.0)
+        optimizer.benchmark = lambda *args: {
+            EAGER: {"ms": 2.0, "error": 0.0},
+            INT8_DYNAMIC: {"ms": 1.0, "error": 0.2}
+        }
+        optimizer.optimize(make_model(), example, cache_key="pose")
+        key = optimizer.decision_key(make_model(), example, "pose")
+        assert optimizer.cached_decision(key)["mode"] == EAGER
+
+    def test_decision_cached_across_restarts(self, optimizer, example):
+        """Test that a second process reuses the decision without benchmarking"""
+        optimizer.optimize(make_model(), example, cache_key="pose")
+
+        restarted = CPUInferenceOptimizer(
+            cache_path=optimizer.cache_path, runs=3, artifacts=optimizer.artifacts
+        )
+        restarted.benchmark = lambda *args: pytest.fail("benchmarked again")
+        model = restarted.optimize(make_model(), example, cache_key="pose")
+        with torch.inference_mode():
+            assert model(example).shape == (1, 4)
+
+    def test_retrained_weights_benchmarked_again(self, optimizer, example):
+        """Test that a cached decision is not reused for different weights"""
+        optimizer.optimize(make_model(), example, cache_key="pose")
+        retrained = make_model()
+        with torch.no_grad():
+            retrained[0].weight.add_(1.0)
+
+        assert optimizer.decision_key(retrained, example, "pose") != optimizer.decision_key(make_model(), example, "pose")
+        assert optimizer.cached_decision(optimizer.decision_key(retrained, example, "pose")) is None
+
+    def test_without_example_input_returns_eval_model(self, optimizer):
+        model = optimizer.optimize(make_model().train())
+        assert not model.training
+
+    def test_gpu_detector_uses_cpu_path(self, monkeypatch, optimizer, example):
+        """Test that optimize_for_inference no longer returns CPU models unchanged"""
+        if torch.cuda.is_available():
+            pytest.skip("CUDA host")
+        import services.cpu_inference as cpu_inference
+        monkeypatch.setattr(cpu_inference, "cpu_inference", optimizer)
+        GPUDetector.optimize_for_inference(
+            make_model(), example, cache_key="pose", artifacts=optimizer.artifacts
+        )
+        assert len(optimizer._decisions) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
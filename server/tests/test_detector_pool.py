@@ -0,0 +1,114 @@
+"""
+Unit Tests for the Detector Pool and Model Warmup
+"""
+
+import threading
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.pose_detector import BehaviorAnalyzer, DetectorPool, PoseDetector, parse_resolution
+from services.quality_control import TIERS
+
+
+class RecordingDetector(PoseDetector):
+    """Fallback detector that records the frame shapes it was given"""
+
+    def __init__(self):
+        super().__init__()
+        self.shapes = []
+
+    def warmup(self) -> bool:
+        self.available = False
+        return False
+
+    def detect(self, frame, tier=None):
+        self.shapes.append((frame.shape, tier.name if tier else None))
+        return super().detect(frame, tier)
+
+
+class TestDetectorPool:
+    """Test detector pooling and warmup"""
+
+    @pytest.fixture
+    def pool(self):
+        return DetectorPool(size=2, resolutions=["64x48", "32x16"], factory=RecordingDetector)
+
+    def test_parse_resolution(self):
+        assert parse_resolution("1280x720") == (1280, 720)
+
+    def test_pooled_detectors_do_not_track_across_frames(self):
+        """Test that shared detectors treat each frame alone; single-stream ones track"""
+        pool = DetectorPool(size=2, resolutions=["32x24"])
+        assert all(d.static_image_mode for d in pool.detectors)
+        assert BehaviorAnalyzer().pose_detector.static_image_mode is False
+        assert PoseDetector().static_image_mode is False
+
+    def test_warmup_runs_every_resolution_on_every_detector(self, pool):
+        """Test that each detector sees synthetic frames at each resolution and tier"""
+        assert not pool.ready
+        stats = pool.warmup(frames=2)
+
+        assert pool.ready
+        expected = [
+            ((height, width, 3), tier.name)
+            for width, height in [(64, 48), (32, 16)]
+            for tier in TIERS
+            for _ in range(2)
+        ]
+        for detector in pool.detectors:
+            assert detector.shapes == expected
+        assert set(stats["ms_per_frame"]) == {
+            f"{tier.name}@{res}" for tier in TIERS for res in ["64x48", "32x16"]
+        }
+
+    def test_acquire_lends_each_detector_once(self, pool):
+        """Test that a borrowed detector is not handed out again"""
+        with pool.acquire() as first, pool.acquire() as second:
+            assert first is not second
+            with pytest.raises(TimeoutError):
+                with pool.acquire(timeout=0.01):
+                    pass
+        with pool.acquire(timeout=0.01) as again:
+            assert again in pool.detectors
+
+    def test_acquire_waits_for_release(self, pool):
+        """Test that a blocked thread gets a detector once one is returned"""
+        got = []
+
+        def borrow():
+            with pool.acquire(timeout=1) as detector:
+                got.append(detector)
+
+        with pool.acquire(), pool.acquire():
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            thread.join(timeout=0.05)
+            assert not got
+        thread.join(timeout=1)
+        assert len(got) == 1
+
+
+class TestAnalysisServiceWarmup:
+    """Test readiness gating in the analysis service"""
+
+    @pytest.mark.asyncio
+    async def test_ready_after_warmup(self):
+        """Test that the service is ready only once the pool is warm"""
+        pool = DetectorPool(size=1, resolutions=["32x24"], factory=RecordingDetector)
+        service = AnalysisService(detector_pool=pool)
+        assert not service.ready
+
+        info = service.warmup()
+        assert service.ready
+        assert "available" in info
+        # A shared pool is warmed once, on the first device
+        assert [stats["detectors"] for stats in info["detectors"].values()] == [1]
+
+        import numpy as np
+        result = await service.analyze_frame(np.zeros((24, 32, 3), dtype=np.uint8))
+        assert result["person_detected"] is True
+        assert result["quality_tier"] == "full"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
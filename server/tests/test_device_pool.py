@@ -0,0 +1,144 @@
+"""
+Unit Tests for the Device Pool
+"""
+
+import os
+import threading
+import pytest
+
+from services.device_pool import DevicePool, PoolDevice, affinity_cpus
+
+
+def gpus(count):
+    devices = []
+    for index in range(count):
+        device = PoolDevice(f"cuda:{index}", "cuda", index)
+        device.memory_total, device.memory_free = 16.0, 16.0
+        devices.append(device)
+    return devices
+
+
+class FakeTelemetry:
+    def __init__(self, devices):
+        self.devices = devices
+
+    def latest(self):
+        return {"devices": self.devices}
+
+
+class TestDevicePool:
+    """Test device discovery and least-loaded assignment"""
+
+    def test_cpu_core_groups(self, monkeypatch):
+        """Test that CPU hosts are split into core-group devices"""
+        monkeypatch.setattr("services.device_pool.affinity_cpus", lambda: list(range(10)))
+        pool = DevicePool(devices=None, cpu_group_size=4)
+        assert [d.cores for d in pool.devices] == [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9]]
+        assert [d.capacity for d in pool.devices] == [4, 4, 2]
+
+    def test_every_gpu_discovered(self, monkeypatch):
+        """Test that each GPU the detector reports becomes a device"""
+        monkeypatch.setattr("services.device_pool.settings.USE_GPU", True)
+        monkeypatch.setattr("services.device_pool.settings.MODEL_WARMUP", True)
+        monkeypatch.setattr("services.device_pool.GPUDetector.check_gpu", lambda: {"devices": [
+            {"index": 0, "memory_total": 16.0, "memory_free": 8.0},
+            {"index": 1, "memory_total": 16.0, "memory_free": 16.0}
+        ]})
+        pool = DevicePool(devices=None)
+        assert [d.name for d in pool.devices] == ["cuda:0", "cuda:1"]
+        assert pool.assign("s1").name == "cuda:1"
+
+    def test_cpu_groups_without_gpus(self, monkeypatch):
+        """Test that hosts without GPUs fall back to core groups"""
+        monkeypatch.setattr("services.device_pool.settings.USE_GPU", True)
+        monkeypatch.setattr("services.device_pool.settings.MODEL_WARMUP", True)
+        monkeypatch.setattr("services.device_pool.GPUDetector.check_gpu", lambda: {"devices": []})
+        monkeypatch.setattr("services.device_pool.affinity_cpus", lambda: [0, 1])
+        pool = DevicePool(devices=None, cpu_group_size=4)
+        assert [d.name for d in pool.devices] == ["cpu:0"]
+
+    def test_sessions_spread_and_stick(self):
+        """Test that new sessions go to the emptiest device and stay there"""
+        pool = DevicePool(devices=gpus(3))
+        assigned = [pool.assign(f"s{i}").name for i in range(6)]
+        assert sorted(assigned) == ["cuda:0", "cuda:0", "cuda:1", "cuda:1", "cuda:2", "cuda:2"]
+        assert pool.assign("s0").name == assigned[0]
+        assert sum(d["sessions"] for d in pool.stats()["devices"]) == 6
+
+    def test_queue_depth_steers_new_work(self):
+        """Test that a busy device is skipped for new sessions"""
+        pool = DevicePool(devices=gpus(2))
+        with pool.acquire() as busy:
+            with pool.acquire() as other:
+                assert other is not busy
+            assert pool.assign("fresh") is not busy
+
+    def test_memory_pressure_from_telemetry(self):
+        """Test that a nearly full GPU loses ties to a free one"""
+        telemetry = FakeTelemetry([
+            {"index": 0, "memory_total": 16.0, "memory_free": 1.0},
+            {"index": 1, "memory_total": 16.0, "memory_free": 15.0}
+        ])
+        pool = DevicePool(devices=gpus(2), telemetry=telemetry)
+        assert pool.assign("s1").name == "cuda:1"
+
+    def test_idle_sessions_expire(self):
+        """Test that idle assignments are dropped after the TTL"""
+        now = [0.0]
+        pool = DevicePool(devices=gpus(2), session_ttl_seconds=10, clock=lambda: now[0])
+        pool.assign("old")
+        now[0] = 11.0
+        pool.assign("new")
+        assert pool.stats()["sessions"] == 1
+
+    def test_release(self):
+        pool = DevicePool(devices=gpus(1))
+        pool.assign("s1")
+        pool.release("s1")
+        assert pool.stats()["devices"][0]["sessions"] == 0
+
+    def test_acquire_records_utilization(self):
+        pool = DevicePool(devices=gpus(1))
+        with pool.acquire("s1") as device:
+            assert device.in_flight == 1
+        stats = pool.stats()["devices"][0]
+        assert stats["completed"] == 1 and stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_run_passes_device(self):
+        """Test that jobs get their device and are counted"""
+        pool = DevicePool(devices=gpus(1))
+        try:
+            name = await pool.run("s1", lambda device, suffix: device.name + suffix, "!")
+        finally:
+            pool.close()
+        stats = pool.stats()["devices"][0]
+        assert name == "cuda:0!"
+        assert stats["completed"] == 1 and stats["in_flight"] == 0
+
+    @pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="no CPU affinity")
+    @pytest.mark.asyncio
+    async def test_cpu_threads_pinned_at_start(self):
+        """Test that a group's threads, and threads they start, stay on its cores"""
+        cores = affinity_cpus()[:1]
+        pool = DevicePool(devices=[PoolDevice("cpu:0", "cpu", 0, cores)])
+        before = os.sched_getaffinity(0)
+        seen = []
+
+        def job(device):
+            seen.append(os.sched_getaffinity(0))
+            # Stands in for a MediaPipe graph thread started by the job
+            child = threading.Thread(target=lambda: seen.append(os.sched_getaffinity(0)))
+            child.start()
+            child.join()
+
+        try:
+            await pool.run("s1", job)
+        finally:
+            pool.close()
+        assert seen == [set(cores), set(cores)]
+        assert os.sched_getaffinity(0) == before
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
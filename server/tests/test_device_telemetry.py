@@ -0,0 +1,70 @@
+"""
+Unit Tests for Device Telemetry
+"""
+
+import asyncio
+import pytest
+
+from services.device_telemetry import DeviceTelemetry, read_memory
+
+
+class TestDeviceTelemetry:
+    """Test cached device telemetry"""
+
+    @pytest.fixture
+    def telemetry(self):
+        return DeviceTelemetry(interval_seconds=0.01, history_size=3, probe_gpu=False)
+
+    def test_latest_before_first_sample(self, telemetry):
+        """Test that the placeholder has the check_gpu shape"""
+        latest = telemetry.latest()
+        for key in ["available", "cuda_available", "name", "device_count", "cpu", "memory"]:
+            assert key in latest
+        assert latest["sampled_at"] is None
+
+    def test_cpu_only_sample(self, telemetry):
+        """Test that CPU hosts report CPU and memory utilization"""
+        telemetry.sample()
+        sample = telemetry.sample()
+        assert sample["available"] is False
+        assert sample["cpu"]["count"] >= 1
+        if read_memory() is not None:
+            assert sample["memory"]["total"] > 0
+            assert 0 <= sample["cpu"]["percent"] <= 100
+
+    def test_latest_is_cached(self, telemetry):
+        """Test that reads return the last sample without sampling again"""
+        sample = telemetry.sample()
+        telemetry._sample_cpu = lambda: pytest.fail("sampled on read")
+        assert telemetry.latest() is sample
+        assert telemetry.latest() is sample
+
+    def test_history_is_bounded(self, telemetry):
+        """Test that only the last history_size samples are kept"""
+        samples = [telemetry.sample() for _ in range(5)]
+        assert telemetry.history() == samples[-3:]
+
+    def test_gpu_probe_failure_still_reports_host(self):
+        """Test that a failing GPU query falls back to the CPU-only shape"""
+        telemetry = DeviceTelemetry(history_size=3, probe_gpu=True)
+
+        def broken():
+            raise RuntimeError("driver gone")
+
+        telemetry._sample_gpu = broken
+        sample = telemetry.sample()
+        assert sample["available"] is False
+        assert sample["cpu"] is not None
+
+    @pytest.mark.asyncio
+    async def test_background_sampling(self, telemetry):
+        """Test that the sampler keeps refreshing in the background"""
+        telemetry.start()
+        await asyncio.sleep(0.1)
+        await telemetry.stop()
+        assert len(telemetry.history()) == 3
+        assert telemetry.latest()["sampled_at"] is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
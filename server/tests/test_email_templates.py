@@ -0,0 +1,134 @@
+"""
+Unit Tests for Email Templates
+"""
+
+import pytest
+from services.email_templates import EmailTemplates
+from services.email_service import EmailService
+
+
+class RecordingPool:
+    """Stands in for the SMTP pool and keeps sent messages"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, message):
+        self.messages.append(message)
+
+
+class TestEmailTemplates:
+    """Test template rendering, caching and localization"""
+
+    @pytest.fixture
+    def templates(self):
+        return EmailTemplates(default_locale="zh_CN")
+
+    def test_alert_text_matches_catalog(self, templates):
+        """Test alert subject and body rendering"""
+        subject, body = templates.alert_text("leave_too_long", "小明", "离开时间: 16 分钟")
+
+        assert subject == "⚠️ 小明 离开时间过长"
+        assert body == "提醒：小明 已经离开超过15分钟了。请关注。"
+
+    def test_unknown_alert_type_uses_details(self, templates):
+        """Test that unknown types fall back to the generic subject and details"""
+        subject, body = templates.alert_text("unregistered", "小明", "自定义提醒")
+
+        assert subject == "HomeworkGuardian 提醒"
+        assert body == "自定义提醒"
+
+    def test_custom_rule_alert_names_the_rule(self, templates):
+        """Test that rule alerts get their own text, including the rule details"""
+        subject, body = templates.alert_text("custom", "小明", "idle_long: 3 分钟")
+        other = templates.render_alert("custom", "小明", "focus: 5 分钟")
+
+        assert subject == "🔔 小明 触发了提醒规则"
+        assert body == "提醒：小明触发了您设置的提醒规则（idle_long: 3 分钟）。"
+        assert other.body == "提醒：小明触发了您设置的提醒规则（focus: 5 分钟）。"
+
+    def test_render_alert_is_cached(self, templates):
+        """Test that identical (type, child, locale) tuples reuse one rendering"""
+        first = templates.render_alert("play_while_work", "小明", "a")
+        second = templates.render_alert("play_while_work", "小明", "b")
+        other = templates.render_alert("play_while_work", "小红", "a")
+
+        assert first is second
+        assert first is not other
+
+    def test_cached_html_fills_send_time(self, templates):
+        """Test that only the send time is substituted per message"""
+        rendered = templates.render_alert("session_start", "$小明", "")
+        html = rendered.html("2026-02-21 10:00:00")
+
+        assert "<h2>✅ $小明 开始学习了</h2>" in html
+        assert "时间: 2026-02-21 10:00:00" in html
+
+    def test_registered_locale_overrides_and_falls_back(self, templates):
+        """Test that a partial catalog overrides its keys and inherits the rest"""
+        templates.register_locale("en", {
+            "alert.leave_too_long.subject": "⚠️ $child_name has been away too long"
+        })
+
+        subject, body = templates.alert_text("leave_too_long", "Tom", "", locale="en")
+
+        assert subject == "⚠️ Tom has been away too long"
+        assert body == "提醒：Tom 已经离开超过15分钟了。请关注。"
+        assert templates.alert_text("leave_too_long", "Tom", "", locale="fr")[0] == "⚠️ Tom 离开时间过长"
+
+    @pytest.mark.asyncio
+    async def test_send_alert_uses_templates(self, templates):
+        """Test that EmailService sends the rendered alert"""
+        email_service = EmailService(templates)
+        email_service.smtp_user = "user"
+        email_service.smtp_password = "password"
+        email_service.pool = RecordingPool()
+
+        sent = await email_service.send_alert("parent@example.com", "session_end", "小明", "")
+
+        assert sent is True
+        message = email_service.pool.messages[0]
+        assert message["Subject"] == "🏁 小明 学习结束"
+        text_part, html_part = message.get_payload()
+        assert text_part.get_payload(decode=True).decode("utf-8") == "小明今日学习已结束。详情请查看学习报告。"
+        assert "<h2>🏁 小明 学习结束</h2>" in html_part.get_payload(decode=True).decode("utf-8")
+
+    @pytest.mark.asyncio
+    async def test_repeated_alerts_get_their_own_parts(self, templates):
+        """Test that messages built from one cached rendering share no MIME parts"""
+        email_service = EmailService(templates)
+        email_service.smtp_user = "user"
+        email_service.smtp_password = "password"
+        email_service.pool = RecordingPool()
+
+        for recipient in ("a@example.com", "b@example.com"):
+            await email_service.send_alert(recipient, "session_end", "小明", "")
+
+        first, second = (m.get_payload()[0] for m in email_service.pool.messages)
+        assert first is not second
+        assert first.get_payload() == second.get_payload()
+
+    @pytest.mark.asyncio
+    async def test_send_daily_report_uses_templates(self, templates):
+        """Test that daily reports are rendered from the catalog"""
+        email_service = EmailService(templates)
+        email_service.smtp_user = "user"
+        email_service.smtp_password = "password"
+        email_service.pool = RecordingPool()
+
+        await email_service.send_daily_report("parent@example.com", "小明", {
+            "total_study_time": 14400,
+            "focus_score": 72.5,
+            "activities": {"studying": 14400, "away": 3600}
+        })
+
+        message = email_service.pool.messages[0]
+        body = message.get_payload()[0].get_payload(decode=True).decode("utf-8")
+        assert message["Subject"] == "📊 小明 今日学习报告"
+        assert "学习时长: 4.0 小时" in body
+        assert "专注度: 72.5%" in body
+        assert "- 离开: 60 分钟" in body
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
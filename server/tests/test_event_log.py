@@ -0,0 +1,179 @@
+"""
+Unit Tests for the Partitioned Event Log
+"""
+
+import pytest
+from services.event_log import (
+    EventLogConsumer,
+    FileEventLog,
+    RedisEventLog,
+    partition_for
+)
+
+
+@pytest.fixture(params=["file", "redis"])
+def make_log(request, tmp_path):
+    if request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")  # partition locks run Lua scripts
+        client = fakeredis.FakeAsyncRedis()
+        return lambda: RedisEventLog(client, partitions=4, max_len=10000)
+    return lambda: FileEventLog(str(tmp_path / "log"), partitions=4)
+
+
+def event(session_id, seq):
+    return {"session_id": session_id, "child_id": "child_001", "seq": seq}
+
+
+class Recorder:
+    """Handler that records events and can fail on demand"""
+
+    def __init__(self, fail_on=None):
+        self.events = []
+        self.fail_on = fail_on
+
+    async def __call__(self, event):
+        if event["seq"] == self.fail_on:
+            self.fail_on = None
+            raise RuntimeError("boom")
+        self.events.append((event["session_id"], event["seq"]))
+
+
+class TestEventLog:
+    """Test partitioning, acknowledgement, replay and lag"""
+
+    def test_partition_is_stable(self):
+        """Test that a session always maps to the same partition"""
+        assert partition_for("session_001", 8) == partition_for("session_001", 8)
+        assert len({partition_for(f"s{i}", 8) for i in range(100)}) == 8
+
+    @pytest.mark.asyncio
+    async def test_consumer_processes_in_order_and_acks(self, make_log):
+        """Test that every event is handled once, in order per session"""
+        log = make_log()
+        for seq in range(5):
+            for session_id in ("a", "b", "c"):
+                await log.append(event(session_id, seq))
+        handler = Recorder()
+        consumer = EventLogConsumer(log, handler, group="alerts", consumer="c1")
+
+        assert await consumer.consume_once() == 15
+        assert await consumer.consume_once() == 0
+        for session_id in ("a", "b", "c"):
+            assert [s for sid, s in handler.events if sid == session_id] == list(range(5))
+        stats = await consumer.stats()
+        assert stats["total_lag"] == 0
+        assert stats["total_pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_each_partition_has_one_owner(self, make_log):
+        """Test that a second consumer only takes over partitions once they are released"""
+        log = make_log()
+        for seq in range(3):
+            await log.append(event("a", seq))
+        first_handler, second_handler = Recorder(), Recorder()
+        first = EventLogConsumer(log, first_handler, group="alerts", consumer="c1")
+        second = EventLogConsumer(log, second_handler, group="alerts", consumer="c2")
+
+        assert await first.consume_once() == 3
+        await log.append(event("a", 3))
+        assert await second.consume_once() == 0
+        assert second.partitions == []
+
+        await first.stop()
+        assert await second.consume_once() == 1
+        assert second_handler.events == [("a", 3)]
+        await second.stop()
+
+    @pytest.mark.asyncio
+    async def test_lag_reported_before_consumption(self, make_log):
+        """Test that appended but unread events show up as lag"""
+        log = make_log()
+        for seq in range(3):
+            await log.append(event("a", seq))
+        consumer = EventLogConsumer(log, Recorder(), group="alerts", consumer="c1")
+
+        assert (await consumer.stats())["total_lag"] == 3
+
+    @pytest.mark.asyncio
+    async def test_pending_replayed_after_crash(self, make_log):
+        """Test that entries a crashed consumer never acked are replayed"""
+        log = make_log()
+        for seq in range(3):
+            await log.append(event("a", seq))
+        partition = partition_for("a", 4)
+        # A consumer reads and dies before acknowledging
+        await log.read("alerts", "crashed", partition, 10)
+
+        handler = Recorder()
+        survivor = EventLogConsumer(
+            make_log(), handler, group="alerts", consumer="c2", claim_idle_seconds=0
+        )
+        await survivor.consume_once()
+
+        assert handler.events == [("a", 0), ("a", 1), ("a", 2)]
+        assert survivor.replayed == 3
+        assert (await survivor.stats())["total_pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failure_leaves_rest_pending(self, make_log):
+        """Test that a failed event and its successors are retried in order"""
+        log = make_log()
+        for seq in range(3):
+            await log.append(event("a", seq))
+        handler = Recorder(fail_on=1)
+        consumer = EventLogConsumer(log, handler, group="alerts", consumer="c1", claim_idle_seconds=0)
+
+        await consumer.consume_once()
+        assert handler.events == [("a", 0)]
+        assert consumer.failed == 1
+
+        await consumer.consume_once()
+        assert handler.events == [("a", 0), ("a", 1), ("a", 2)]
+
+    @pytest.mark.asyncio
+    async def test_failure_blocks_newer_entries(self, make_log):
+        """Test that new entries wait while an older one is pending retry"""
+        log = make_log()
+        for seq in range(2):
+            await log.append(event("a", seq))
+        handler = Recorder(fail_on=0)
+        consumer = EventLogConsumer(log, handler, group="alerts", consumer="c1", claim_idle_seconds=3600)
+
+        await consumer.consume_once()
+        await log.append(event("a", 2))
+        await consumer.consume_once()
+        assert handler.events == []
+
+        consumer.claim_idle_seconds = 0
+        await consumer.consume_once()
+        assert handler.events == [("a", 0), ("a", 1), ("a", 2)]
+
+    @pytest.mark.asyncio
+    async def test_poison_entry_dead_lettered(self, make_log):
+        """Test that an entry failing every delivery is set aside, not retried forever"""
+        log = make_log()
+        for seq in range(3):
+            await log.append(event("a", seq))
+
+        class Poisoned(Recorder):
+            async def __call__(self, event):
+                if event["seq"] == 1:
+                    raise RuntimeError("boom")
+                await super().__call__(event)
+
+        handler = Poisoned()
+        consumer = EventLogConsumer(
+            log, handler, group="alerts", consumer="c1", claim_idle_seconds=0, max_deliveries=2
+        )
+        for _ in range(3):
+            await consumer.consume_once()
+
+        assert handler.events == [("a", 0), ("a", 2)]
+        assert consumer.dead_lettered == 1
+        assert consumer.failed == 2
+        assert (await consumer.stats())["total_pending"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
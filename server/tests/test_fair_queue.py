@@ -0,0 +1,193 @@
+"""
+Tests for weighted fair scheduling of video jobs
+"""
+
+import asyncio
+
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.fair_queue import FairScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def job(scheduler, tenant, log, gate=None, cost=1.0):
+    async with scheduler.slot(tenant, cost):
+        log.append(tenant)
+        if gate is not None:
+            await gate.wait()
+        await asyncio.sleep(0)
+
+
+class TestFairScheduler:
+    """Test slot ordering, caps and metrics"""
+
+    @pytest.mark.asyncio
+    async def test_light_tenant_not_starved(self):
+        """Test that one job from a new tenant jumps a heavy tenant's backlog"""
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={})
+        log = []
+        gate = asyncio.Event()
+        heavy = [asyncio.create_task(job(scheduler, "heavy", log, gate)) for _ in range(10)]
+        await asyncio.sleep(0)
+        light = asyncio.create_task(job(scheduler, "light", log, gate))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*heavy, light)
+
+        assert log.index("light") == 1
+
+    @pytest.mark.asyncio
+    async def test_weights_share_slots(self):
+        """Test that a tenant with twice the weight gets twice the slots"""
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={"a": 2.0})
+        log = []
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(job(scheduler, name, log, gate)) for name in ["a", "b"] * 6]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+        assert log[:9].count("a") == 6
+        assert log[:9].count("b") == 3
+
+    @pytest.mark.asyncio
+    async def test_cost_counts_against_share(self):
+        """Test that large uploads use up a tenant's share faster"""
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={})
+        log = []
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(job(scheduler, "big", log, gate, cost=4.0)) for _ in range(2)]
+        tasks += [asyncio.create_task(job(scheduler, "small", log, gate, cost=1.0)) for _ in range(4)]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+
+        assert log == ["big", "small", "small", "small", "small", "big"]
+
+    @pytest.mark.asyncio
+    async def test_tenant_concurrency_cap(self):
+        """Test that a tenant never holds more than its cap of free slots"""
+        scheduler = FairScheduler(concurrency=4, tenant_concurrency=2, weights={})
+        log = []
+        gate = asyncio.Event()
+        tasks = [asyncio.create_task(job(scheduler, "a", log, gate)) for _ in range(5)]
+        await asyncio.sleep(0)
+
+        stats = scheduler.stats()
+        assert stats["running"] == 2
+        assert stats["tenants"]["a"] == {
+            "weight": 1.0, "queued": 3, "running": 2, "completed": 0,
+            "wait_p95_seconds": 0.0, "wait_max_seconds": 0.0
+        }
+        gate.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.stats()["completed"] == 5
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test that a caller giving up while queued frees its place"""
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={})
+        log = []
+        gate = asyncio.Event()
+        first = asyncio.create_task(job(scheduler, "a", log, gate))
+        waiting = asyncio.create_task(job(scheduler, "b", log, gate))
+        await asyncio.sleep(0)
+        assert scheduler.depth() == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.depth() == 0
+        gate.set()
+        await first
+        assert scheduler.running == 0
+
+    @pytest.mark.asyncio
+    async def test_wait_times_recorded_per_tenant(self):
+        """Test that wait time is measured from enqueue to grant"""
+        clock = FakeClock()
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={}, clock=clock)
+        log = []
+        gate, hold = asyncio.Event(), asyncio.Event()
+        first = asyncio.create_task(job(scheduler, "a", log, gate))
+        second = asyncio.create_task(job(scheduler, "b", log, hold))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["tenants"]["a"]["wait_max_seconds"] == 0.0
+        clock.now = 3.0
+        gate.set()
+        await first
+
+        assert scheduler.stats()["tenants"]["b"]["wait_p95_seconds"] == 3.0
+        hold.set()
+        await second
+
+    @pytest.mark.asyncio
+    async def test_drain_rate(self):
+        """Test completions per second over the recent window"""
+        clock = FakeClock()
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={}, clock=clock)
+        assert scheduler.drain_rate() == 0.0
+        for _ in range(5):
+            await job(scheduler, "a", [])
+            clock.now += 2.0
+        # 5 completions, the oldest 10 seconds ago
+        assert scheduler.drain_rate() == pytest.approx(0.5)
+        clock.now += 120.0
+        assert scheduler.drain_rate() == 0.0
+
+    @pytest.mark.asyncio
+    async def test_idle_tenants_evicted(self):
+        """Test that tenants with nothing queued or running are forgotten"""
+        scheduler = FairScheduler(concurrency=1, tenant_concurrency=1, weights={})
+        log = []
+        gate = asyncio.Event()
+        first = asyncio.create_task(job(scheduler, "a", log, gate))
+        waiting = asyncio.create_task(job(scheduler, "b", log, gate))
+        await asyncio.sleep(0)
+        assert set(scheduler.stats()["tenants"]) == {"a", "b"}
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert set(scheduler.stats()["tenants"]) == {"a"}
+        gate.set()
+        await first
+        for name in ["c", "d", "e"]:
+            await job(scheduler, name, log)
+
+        assert scheduler.stats()["tenants"] == {}
+        assert scheduler.completed == 4
+
+
+class TestProcessVideoFairness:
+    """Test that video processing goes through the fair scheduler"""
+
+    @pytest.mark.asyncio
+    async def test_process_video_uses_tenant_slot(self, monkeypatch):
+        """Test that jobs are accounted to the tenant, falling back to a shared one"""
+        service = AnalysisService(video_jobs=FairScheduler(concurrency=2, weights={}))
+        seen = []
+        slot = service.video_jobs.slot
+
+        def record(tenant, cost=1.0):
+            seen.append(tenant)
+            return slot(tenant, cost)
+
+        monkeypatch.setattr(service.video_jobs, "slot", record)
+        await service.process_video(None, session_id="s1", tenant="child_1")
+        await service.process_video(None, session_id="s2")
+
+        assert seen == ["child_1", "anonymous"]
+        assert service.video_jobs.completed == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,194 @@
+"""
+Tests for deadline-aware frame scheduling
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.device_pool import DevicePool, PoolDevice
+from services.frame_scheduler import STALE, SUPERSEDED, FrameScheduler
+from services.pose_detector import DetectorPool, PoseDetector
+from services.quality_control import QualityController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class GatedAnalyzer:
+    """Records frames in analysis order; each call waits for the gate"""
+
+    def __init__(self, clock, cost_seconds=0.0):
+        self.clock = clock
+        self.cost_seconds = cost_seconds
+        self.gate = asyncio.Event()
+        self.gate.set()
+        self.calls = []
+
+    async def __call__(self, frame, session_id, tier):
+        self.calls.append((session_id, frame, tier.name if tier else None))
+        await self.gate.wait()
+        self.clock.now += self.cost_seconds
+        return {"session_id": session_id, "frame": frame}
+
+
+def make_scheduler(cost_seconds=0.0, **kwargs):
+    clock = FakeClock()
+    analyzer = GatedAnalyzer(clock, cost_seconds)
+    options = dict(workers=1, staleness_seconds=2.0)
+    options.update(kwargs)
+    return FrameScheduler(analyzer, clock=clock, **options), analyzer, clock
+
+
+async def busy(scheduler, analyzer):
+    """Occupy the single worker with a blocker frame"""
+    analyzer.gate.clear()
+    blocker = scheduler.submit_live("blocker", "b0")
+    await asyncio.sleep(0)
+    return blocker
+
+
+class TestFrameScheduler:
+    """Test ordering and dropping of queued frames"""
+
+    @pytest.mark.asyncio
+    async def test_newer_frame_supersedes_queued_one(self):
+        """Test that only a session's latest queued frame is analyzed"""
+        scheduler, analyzer, _ = make_scheduler()
+        blocker = await busy(scheduler, analyzer)
+        first = scheduler.submit_live("s1", "f1")
+        second = scheduler.submit_live("s1", "f2")
+        third = scheduler.submit_live("s1", "f3")
+
+        assert (await first)["reason"] == SUPERSEDED
+        assert (await second)["reason"] == SUPERSEDED
+        analyzer.gate.set()
+        assert (await third)["frame"] == "f3"
+        await blocker
+        assert [frame for _, frame, _ in analyzer.calls] == ["b0", "f3"]
+        assert scheduler.stats()[SUPERSEDED] == 2
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_live_frame_requires_session(self):
+        """Test that anonymous live frames are refused instead of superseding each other"""
+        scheduler, _, _ = make_scheduler()
+        with pytest.raises(ValueError):
+            scheduler.submit_live(None, "f1")
+        assert scheduler.stats()["submitted"] == 0
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_stale_frame_is_dropped(self):
+        """Test that a frame past its deadline is never analyzed"""
+        scheduler, analyzer, clock = make_scheduler()
+        blocker = await busy(scheduler, analyzer)
+        late = scheduler.submit_live("s1", "f1", age_seconds=1.5)
+        clock.now += 1.0
+        analyzer.gate.set()
+
+        result = await late
+        await blocker
+        assert result["dropped"] is True
+        assert result["reason"] == STALE
+        assert result["age_seconds"] == pytest.approx(2.5)
+        assert [frame for _, frame, _ in analyzer.calls] == ["b0"]
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_earliest_deadline_first_across_sessions(self):
+        """Test that the session with the oldest frame is served first"""
+        scheduler, analyzer, _ = make_scheduler()
+        blocker = await busy(scheduler, analyzer)
+        newer = scheduler.submit_live("s1", "new", age_seconds=0.2)
+        older = scheduler.submit_live("s2", "old", age_seconds=1.0)
+        analyzer.gate.set()
+
+        await asyncio.gather(blocker, newer, older)
+        assert [frame for _, frame, _ in analyzer.calls] == ["b0", "old", "new"]
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_segments_wait_for_live_frames_and_are_never_dropped(self):
+        """Test that report frames run after live work, at full quality, however old"""
+        scheduler, analyzer, _ = make_scheduler()
+        blocker = await busy(scheduler, analyzer)
+        segment = scheduler.submit_segment("s1", "seg", age_seconds=600.0)
+        live = scheduler.submit_live("s2", "live")
+        analyzer.gate.set()
+
+        await asyncio.gather(blocker, segment, live)
+        assert analyzer.calls[1:] == [("s2", "live", None), ("s1", "seg", "full")]
+        assert (await segment)["age_seconds"] == pytest.approx(600.0)
+        assert scheduler.stats()["segments"] == 1
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_age_bounded_under_overload(self):
+        """Test that analyzed live frames are never older than budget plus one analysis"""
+        scheduler, analyzer, _ = make_scheduler(cost_seconds=0.5)
+        futures = [scheduler.submit_live(f"s{i}", f"f{i}") for i in range(20)]
+        results = await asyncio.gather(*futures)
+
+        analyzed = [r for r in results if not r.get("dropped")]
+        stale = [r for r in results if r.get("reason") == STALE]
+        assert len(analyzed) + len(stale) == 20
+        assert stale
+        assert max(r["age_seconds"] for r in analyzed) <= 2.5
+        stats = scheduler.stats()
+        assert stats["live_age_max_seconds"] <= 2.5
+        assert stats["live_backlog"] == 0
+        await scheduler.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_cancels_queued_frames(self):
+        """Test that stopping resolves queued frames instead of leaving callers hanging"""
+        scheduler, analyzer, _ = make_scheduler()
+        await busy(scheduler, analyzer)
+        queued = scheduler.submit_segment("s1", "seg")
+        await scheduler.stop()
+        assert queued.cancelled()
+        assert scheduler.backlog() == 0
+
+
+class StubDetector(PoseDetector):
+    """Pose detector without MediaPipe"""
+
+    def warmup(self):
+        self.available = False
+        return False
+
+
+class TestAnalysisScheduling:
+    """Test the analysis service's scheduled entry points"""
+
+    @pytest.mark.asyncio
+    async def test_segment_frames_use_full_quality(self):
+        """Test that report frames ignore the load-adaptive tier"""
+        quality = QualityController(enabled=False)
+        quality.level = 3
+        service = AnalysisService(
+            detector_pool=DetectorPool(size=1, resolutions=["32x16"], factory=StubDetector),
+            device_pool=DevicePool(devices=[PoolDevice("cpu:0", "cpu", 0)]),
+            quality=quality
+        )
+        frame = np.zeros((24, 32, 3), dtype=np.uint8)
+
+        live = await service.submit_live_frame(frame, "s1")
+        segment = await service.submit_segment_frame(frame, "s1")
+
+        assert live["quality_tier"] == "minimal"
+        assert segment["quality_tier"] == "full"
+        assert service.queue_depth() == 0
+        await service.scheduler.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
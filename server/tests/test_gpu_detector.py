@@ -21,6 +21,11 @@ class TestGPUDetector:
         for key in required_keys:
             assert key in result, f"Missing key: {key}"
             
+    def test_every_gpu_listed(self):
+        """Test that each counted GPU is reported under devices"""
+        result = GPUDetector.check_gpu()
+        assert [d["index"] for d in result["devices"]] == list(range(result["device_count"]))
+            
     def test_get_device_returns_torch_device(self):
         """Test that get_device returns a torch.device"""
         device = GPUDetector.get_device()
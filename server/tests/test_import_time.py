@@ -0,0 +1,64 @@
+"""
+Import-time budget for the API process
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use or during warmup, never by importing the API
+HEAVY_MODULES = {"torch", "cv2", "mediapipe", "pygame", "tensorflow"}
+
+# Cumulative import time allowed for api.routes (fastapi itself is ~0.3s)
+ROUTES_BUDGET_SECONDS = 1.0
+
+
+def import_profile(module: str):
+    """Run ``python -X importtime`` and return ({module: cumulative seconds}, top-level modules)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = line.split("|")
+        if not total.strip().isdigit():
+            continue
+        name = name.strip()
+        cumulative[name] = int(total) / 1e6
+    return cumulative, {name.split(".")[0] for name in cumulative}
+
+
+class TestImportTime:
+    """Test that importing the API does not load models"""
+
+    @pytest.mark.parametrize("module", [
+        "api.routes",
+        "services.alert_service",
+        "services.gpu_detector",
+        "services.pose_detector",
+        "services.sound_alert"
+    ])
+    def test_no_heavy_imports(self, module):
+        """Test that model and media libraries are not imported eagerly"""
+        _, loaded = import_profile(module)
+        assert not loaded & HEAVY_MODULES
+
+    def test_routes_within_budget(self):
+        """Test that importing the routes stays within the cold-start budget"""
+        cumulative, _ = import_profile("api.routes")
+        assert cumulative["api.routes"] < ROUTES_BUDGET_SECONDS
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,130 @@
+"""
+Unit Tests for the Shard Ring and Session-Affine Ingestion
+"""
+
+import asyncio
+import time
+import pytest
+from models.schemas import AlertConfig
+from services.ingest_shards import ShardCoordinator
+from services.shard_ring import HashRing
+
+
+class TestHashRing:
+    """Test ownership, balance and minimal movement"""
+
+    def test_owner_is_stable(self):
+        """Test that ownership depends only on the node set"""
+        ring = HashRing(["a", "b", "c"])
+        other = HashRing(["c", "a", "b"])
+
+        assert all(ring.owner(f"s{i}") == other.owner(f"s{i}") for i in range(1000))
+        assert HashRing().owner("s1") is None
+
+    def test_balanced(self):
+        """Test that virtual nodes spread keys evenly"""
+        ring = HashRing([f"n{i}" for i in range(4)])
+        counts = {}
+        for i in range(20000):
+            owner = ring.owner(f"session_{i}")
+            counts[owner] = counts.get(owner, 0) + 1
+
+        assert min(counts.values()) > 20000 / 4 * 0.75
+
+    def test_join_moves_only_keys_to_new_node(self):
+        """Test that adding a node only takes keys, never shuffles the rest"""
+        ring = HashRing(["a", "b", "c"])
+        before = {f"s{i}": ring.owner(f"s{i}") for i in range(5000)}
+
+        ring.add_node("d")
+        moved = [k for k, owner in before.items() if ring.owner(k) != owner]
+
+        assert all(ring.owner(k) == "d" for k in moved)
+        assert 0.15 < len(moved) / len(before) < 0.35
+
+        ring.remove_node("d")
+        assert all(ring.owner(k) == owner for k, owner in before.items())
+
+
+class TestShardCoordinator:
+    """Test routing and resharding with real worker processes"""
+
+    @pytest.mark.asyncio
+    async def test_session_state_follows_reshard(self, tmp_path):
+        """Test that sessions keep their alert state when workers join and leave"""
+        coordinator = ShardCoordinator(workers=2, outbox_path=str(tmp_path / "outbox.db"))
+        await coordinator.start()
+        try:
+            await coordinator.update_config(AlertConfig(
+                child_id="child_001",
+                email="parent@example.com",
+                leave_threshold_minutes=1,
+                enable_email=False
+            ))
+            sessions = [f"session_{i}" for i in range(40)]
+            for session_id in sessions:
+                result = await coordinator.submit({
+                    "session_id": session_id,
+                    "child_id": "child_001",
+                    "activity": "away",
+                    "duration_seconds": 30
+                })
+                assert result["worker"] == coordinator.ring.owner(session_id)
+
+            await coordinator.add_worker()
+            assert len(coordinator.ring) == 3
+            assert coordinator.resharded_sessions > 0
+
+            await coordinator.remove_worker(coordinator.ring.nodes[0])
+            # The accumulated 30s carried over, so 40s more crosses 1 minute
+            for session_id in sessions:
+                result = await coordinator.submit({
+                    "session_id": session_id,
+                    "child_id": "child_001",
+                    "activity": "away",
+                    "duration_seconds": 40
+                })
+                assert result["alerts_triggered"] == ["leave_too_long"]
+
+            status = await coordinator.get_status(sessions[0])
+            assert status["history"] == ["away", "away"]
+        finally:
+            await coordinator.stop()
+
+    @pytest.mark.asyncio
+    async def test_dead_worker_removed_once(self, tmp_path):
+        """Test that concurrent callers drop a dead shard once and waiters fail fast"""
+        coordinator = ShardCoordinator(workers=2, outbox_path=str(tmp_path / "outbox.db"))
+        await coordinator.start()
+        try:
+            dead = coordinator.ring.nodes[0]
+            process = coordinator._workers[dead]
+            process.terminate()
+            process.join(5)
+            waiting = asyncio.create_task(coordinator._call(dead, "stats", None))
+            await asyncio.sleep(0)
+
+            sessions = [f"session_{i}" for i in range(20)]
+            started = time.monotonic()
+            results = await asyncio.gather(*[
+                coordinator.submit({
+                    "session_id": session_id,
+                    "child_id": "child_001",
+                    "activity": "away",
+                    "duration_seconds": 30
+                })
+                for session_id in sessions
+            ])
+
+            with pytest.raises(RuntimeError):
+                await waiting
+            assert time.monotonic() - started < 10
+            assert coordinator.ring.nodes == [n for n in coordinator._workers]
+            assert dead not in coordinator._workers
+            assert {r["worker"] for r in results} == set(coordinator.ring.nodes)
+        finally:
+            await coordinator.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
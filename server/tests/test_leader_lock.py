@@ -0,0 +1,86 @@
+"""
+Unit Tests for Leader Locks
+"""
+
+import asyncio
+import pytest
+from services.leader_lock import FileLeaderLock, LeadershipLost, RedisLeaderLock, leadership
+
+
+def make_locks(kind, tmp_path):
+    if kind == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")  # fakeredis needs it to run Lua scripts
+        client = fakeredis.FakeAsyncRedis()
+        return [RedisLeaderLock(client, "job", ttl_seconds=30) for _ in range(2)]
+    return [FileLeaderLock("job", str(tmp_path)) for _ in range(2)]
+
+
+@pytest.fixture(params=["file", "redis"])
+def locks(request, tmp_path):
+    return make_locks(request.param, tmp_path)
+
+
+class TestLeaderLock:
+    """Test that exactly one holder wins"""
+
+    @pytest.mark.asyncio
+    async def test_one_holder(self, locks):
+        """Test that a held lock is refused to others until released"""
+        first, second = locks
+        assert await first.acquire() is True
+        assert await first.acquire() is True  # renewing our own lock
+        assert await second.acquire() is False
+
+        await first.release()
+        assert await second.acquire() is True
+        await second.release()
+
+    @pytest.mark.asyncio
+    async def test_leadership_block(self, locks):
+        """Test that only one of two concurrent blocks leads"""
+        first, second = locks
+        async with leadership(first) as leader:
+            assert leader is True
+            async with leadership(second) as other:
+                assert other is False
+        assert first.held is False
+        assert await second.acquire() is True
+        await second.release()
+
+
+class ExpiringLock:
+    """Lock that refuses its first renewal"""
+
+    ttl_seconds = 0.03
+
+    def __init__(self):
+        self.held = False
+        self.acquired = 0
+
+    async def acquire(self):
+        self.acquired += 1
+        self.held = self.acquired == 1
+        return self.held
+
+    async def release(self):
+        self.held = False
+
+
+class TestLeadershipLoss:
+    """Test that a job stops once its lock can no longer be renewed"""
+
+    @pytest.mark.asyncio
+    async def test_lost_lock_cancels_block(self):
+        """Test that the guarded block is interrupted with LeadershipLost"""
+        finished = False
+        with pytest.raises(LeadershipLost):
+            async with leadership(ExpiringLock()) as leader:
+                assert leader is True
+                await asyncio.sleep(1)
+                finished = True
+        assert finished is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
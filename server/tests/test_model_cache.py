@@ -0,0 +1,109 @@
+"""
+Unit Tests for the Model Artifact Cache
+"""
+
+import json
+import os
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from services.model_cache import ModelArtifactCache, main, model_hash
+
+
+def make_model():
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, 3, padding=1),
+        torch.nn.ReLU(),
+        torch.nn.Flatten(),
+        torch.nn.Linear(4 * 8 * 8, 2)
+    ).eval()
+
+
+class TestModelArtifactCache:
+    """Test artifact keys, creation and reuse"""
+
+    @pytest.fixture
+    def cache(self, tmp_path):
+        return ModelArtifactCache(str(tmp_path / "artifacts"))
+
+    @pytest.fixture
+    def example(self):
+        return torch.randn(1, 3, 8, 8)
+
+    def test_hash_follows_weights(self):
+        """Test that identical weights share a hash and changed weights do not"""
+        assert model_hash(make_model()) == model_hash(make_model())
+        changed = make_model()
+        with torch.no_grad():
+            changed[0].bias.add_(1.0)
+        assert model_hash(changed) != model_hash(make_model())
+
+    def test_key_includes_torch_version_and_device(self, cache):
+        key = cache.key(make_model(), "cuda:1")
+        assert key.endswith("-cuda")
+        assert f"torch{torch.__version__.split('+')[0]}" in key
+
+    def test_created_once(self, cache):
+        """Test that an artifact is built on the first request only"""
+        calls = []
+
+        def create(path):
+            calls.append(path)
+            with open(path, "wb") as f:
+                f.write(b"artifact")
+
+        model = make_model()
+        first = cache.get_or_create(model, "cpu", "blob.bin", create)
+        second = cache.get_or_create(make_model(), "cpu", "blob.bin", create)
+        assert first == second and len(calls) == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert not [f for f in os.listdir(os.path.dirname(first)) if f.endswith(".tmp")]
+
+    def test_failed_build_leaves_nothing(self, cache):
+        def create(path):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise RuntimeError("export failed")
+
+        with pytest.raises(RuntimeError):
+            cache.get_or_create(make_model(), "cpu", "blob.bin", create)
+        assert cache.entries() == []
+
+    def test_torchscript_round_trip(self, cache, example):
+        """Test that a warm load matches the eager model without re-tracing"""
+        model = make_model()
+        with torch.inference_mode():
+            expected = model(example)
+            cold = cache.torchscript(model, example)
+            warm = ModelArtifactCache(cache.root).torchscript(make_model(), example)
+            assert torch.allclose(cold(example), expected, atol=1e-5)
+            assert torch.allclose(warm(example), expected, atol=1e-5)
+        assert cache.misses == 1
+        assert "model.ts" in cache.entries()[0]["artifacts"]
+
+    def test_cli_warm_list_clear(self, tmp_path, capsys, monkeypatch):
+        """Test pre-populating the cache the way an image build would"""
+        if torch.cuda.is_available():
+            pytest.skip("CUDA host")
+        import services.cpu_inference as cpu_inference
+        monkeypatch.setattr(
+            cpu_inference,
+            "cpu_inference",
+            cpu_inference.CPUInferenceOptimizer(cache_path=str(tmp_path / "cpu.json"), runs=2)
+        )
+        root = str(tmp_path / "artifacts")
+
+        assert main(["--root", root, "warm", "test_model_cache:make_model", "--shape", "1,3,8,8"]) == 0
+        capsys.readouterr()
+        assert main(["--root", root, "list"]) == 0
+        entries = json.loads(capsys.readouterr().out)
+        assert "model.ts" in entries[0]["artifacts"]
+
+        assert main(["--root", root, "clear"]) == 0
+        assert not os.path.exists(root)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,184 @@
+"""
+Unit Tests for the Notification Outbox and Dispatcher
+"""
+
+import asyncio
+import time
+import pytest
+from services.notification_outbox import (
+    NotificationOutbox,
+    NotificationDispatcher,
+    STATUS_DEAD,
+    STATUS_PENDING,
+    STATUS_SENDING
+)
+
+
+class FakeEmailService:
+    """Email service whose sends fail a configurable number of times"""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.alerts = []
+        self.reports = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _attempt(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.failures > 0:
+            self.failures -= 1
+            return False
+        return True
+
+    async def send_alert(self, to_email, alert_type, child_name, details, locale=None):
+        sent = await self._attempt()
+        if sent:
+            self.alerts.append((to_email, alert_type, child_name, details))
+        return sent
+
+    async def send_daily_report(self, to_email, child_name, report_data):
+        sent = await self._attempt()
+        if sent:
+            self.reports.append((to_email, child_name))
+        return sent
+
+
+class TestNotificationOutbox:
+    """Test durable queueing, retries and dead-lettering"""
+
+    @pytest.fixture
+    def outbox(self, tmp_path):
+        outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+        yield outbox
+        outbox.close()
+
+    def test_queue_survives_reopen(self, outbox):
+        """Test that queued notifications are persisted to disk"""
+        outbox.queue_alert("parent@example.com", "leave_too_long", "child_001", "离开时间: 16 分钟")
+        outbox.close()
+
+        reopened = NotificationOutbox(outbox.path)
+        items = reopened.claim_due(10)
+        reopened.close()
+
+        assert len(items) == 1
+        assert items[0]["payload"]["alert_type"] == "leave_too_long"
+
+    def test_bulk_enqueue(self, outbox):
+        """Test that bulk-queued daily reports are all claimable"""
+        queued = outbox.queue_daily_reports([
+            (f"parent{i}@example.com", f"child_{i:03d}", {"date": "2026-02-21"}) for i in range(3)
+        ])
+
+        items = outbox.claim_due(10)
+        assert queued == 3
+        assert [item["payload"]["child_name"] for item in items] == ["child_000", "child_001", "child_002"]
+
+    def test_claimed_rows_recovered_after_lease_expiry(self, outbox):
+        """Test that rows left in sending state are retried once their lease runs out"""
+        outbox.queue_alert("parent@example.com", "play_while_work", "child_001", "")
+        now = time.time()
+        outbox.claim_due(10, now=now)
+        assert outbox.stats()[STATUS_SENDING] == 1
+        outbox.close()
+
+        reopened = NotificationOutbox(outbox.path)
+        assert reopened.claim_due(10, now=now + outbox.lease_seconds + 1)[0]["ids"] == [1]
+        reopened.close()
+
+    def test_live_claims_not_taken_by_other_processes(self, outbox):
+        """Test that opening the outbox elsewhere leaves rows being sent alone"""
+        outbox.queue_alert("parent@example.com", "play_while_work", "child_001", "")
+        now = time.time()
+        assert len(outbox.claim_due(10, now=now)) == 1
+
+        other = NotificationOutbox(outbox.path)
+        assert other.claim_due(10, now=now + 1) == []
+        assert other.stats()[STATUS_SENDING] == 1
+        other.close()
+
+    def test_coalescing_leaves_backoff_to_run(self, outbox):
+        """Test that a due alert does not drag a failed sibling out of its backoff"""
+        now = time.time()
+        failed = outbox.queue_alert("parent@example.com", "session_start", "child_001", "", coalesce_key="k")
+        outbox.claim_due(10, now=now)
+        outbox.mark_failed([failed], 1, "smtp down", retry_at=now + 600)
+        waiting = outbox.queue_alert("parent@example.com", "play_while_work", "child_001", "", delay=60, coalesce_key="k")
+        urgent = outbox.queue_alert("parent@example.com", "leave_too_long", "child_001", "", coalesce_key="k")
+
+        items = outbox.claim_due(10, now=now + 1)
+
+        assert [item["ids"] for item in items] == [[waiting, urgent]]
+        outbox.mark_sent([waiting, urgent])
+        assert outbox.claim_due(10, now=now + 600)[0]["ids"] == [failed]
+
+    @pytest.mark.asyncio
+    async def test_dispatch_delivers_and_deletes(self, outbox):
+        """Test that delivered notifications leave the outbox"""
+        email_service = FakeEmailService()
+        dispatcher = NotificationDispatcher(outbox, email_service, concurrency=2)
+        outbox.queue_alert("parent@example.com", "leave_too_long", "child_001", "details")
+        outbox.queue_daily_report("parent@example.com", "child_001", {"date": "2026-02-21"})
+
+        attempted = await dispatcher.drain_once()
+
+        assert attempted == 2
+        assert len(email_service.alerts) == 1
+        assert len(email_service.reports) == 1
+        assert outbox.stats() == {STATUS_PENDING: 0, STATUS_SENDING: 0, STATUS_DEAD: 0}
+
+    @pytest.mark.asyncio
+    async def test_failed_send_is_retried_with_backoff(self, outbox):
+        """Test that a failure schedules a later retry instead of losing the alert"""
+        email_service = FakeEmailService(failures=1)
+        dispatcher = NotificationDispatcher(outbox, email_service, base_delay=60)
+        outbox.queue_alert("parent@example.com", "leave_too_long", "child_001", "details")
+
+        await dispatcher.drain_once()
+
+        assert email_service.alerts == []
+        assert outbox.stats()[STATUS_PENDING] == 1
+        next_due = outbox.next_due_at()
+        # Not due again until the backoff has elapsed
+        assert outbox.claim_due(10) == []
+        assert len(outbox.claim_due(10, now=next_due)) == 1
+
+    @pytest.mark.asyncio
+    async def test_dead_letter_after_max_attempts(self, outbox):
+        """Test that a notification that keeps failing is dead-lettered"""
+        email_service = FakeEmailService(failures=10)
+        dispatcher = NotificationDispatcher(
+            outbox, email_service, max_attempts=3, base_delay=0.001, max_delay=0.001
+        )
+        outbox.queue_alert("parent@example.com", "leave_too_long", "child_001", "details")
+
+        for _ in range(3):
+            await asyncio.sleep(0.002)
+            await dispatcher.drain_once()
+
+        assert outbox.stats()[STATUS_DEAD] == 1
+        assert outbox.stats()[STATUS_PENDING] == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, outbox):
+        """Test that no more than `concurrency` sends run at once"""
+        email_service = FakeEmailService(delay=0.01)
+        dispatcher = NotificationDispatcher(outbox, email_service, concurrency=3)
+        for i in range(12):
+            outbox.queue_alert("parent@example.com", "leave_too_long", f"child_{i}", "")
+
+        await dispatcher.drain_once()
+
+        assert len(email_service.alerts) == 12
+        assert email_service.max_in_flight <= 3
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
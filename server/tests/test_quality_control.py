@@ -0,0 +1,137 @@
+"""
+Tests for load-adaptive detection quality tiers
+"""
+
+import numpy as np
+import pytest
+
+from services.analysis_service import AnalysisService
+from services.device_pool import DevicePool, PoolDevice
+from services.pose_detector import DetectorPool, PoseDetector
+from services.quality_control import TIERS, QualityController
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_controller(queue=None, **kwargs):
+    clock = FakeClock()
+    depth = queue if queue is not None else [0]
+    options = dict(
+        slo_ms=100.0, queue_high=8, queue_low=2,
+        degrade_after=2, recover_after=4, interval_seconds=1.0, enabled=True
+    )
+    options.update(kwargs)
+    controller = QualityController(queue_depth=lambda: depth[0], clock=clock, **options)
+    return controller, clock, depth
+
+
+def tick(controller, clock, latency_ms, checks=1):
+    """Observe one frame per evaluation interval, ``checks`` times"""
+    for _ in range(checks):
+        clock.now += 1.0
+        controller.observe(latency_ms, controller.level)
+
+
+class TestQualityController:
+    """Test tier transitions"""
+
+    def test_degrades_after_consecutive_slow_checks(self):
+        """Test that the tier steps down only after degrade_after checks"""
+        controller, clock, _ = make_controller()
+        tick(controller, clock, 250.0)
+        assert controller.tier.name == "full"
+        tick(controller, clock, 250.0)
+        assert controller.tier.name == "reduced"
+        tick(controller, clock, 250.0, checks=10)
+        assert controller.tier is TIERS[-1]
+
+    def test_queue_depth_degrades(self):
+        """Test that a deep queue degrades even with fast frames"""
+        controller, clock, depth = make_controller()
+        depth[0] = 20
+        tick(controller, clock, 10.0, checks=2)
+        assert controller.level == 1
+
+    def test_no_change_inside_band(self):
+        """Test that latency between the recover and SLO thresholds holds the tier"""
+        controller, clock, _ = make_controller()
+        tick(controller, clock, 250.0, checks=2)
+        assert controller.level == 1
+        tick(controller, clock, 80.0, checks=20)
+        assert controller.level == 1
+
+    def test_recovers_slower_than_it_degrades(self):
+        """Test that recovery needs recover_after calm checks"""
+        controller, clock, _ = make_controller()
+        tick(controller, clock, 250.0, checks=2)
+        assert controller.level == 1
+        tick(controller, clock, 10.0, checks=3)
+        assert controller.level == 1
+        tick(controller, clock, 10.0)
+        assert controller.level == 0
+        assert controller.transitions == 2
+
+    def test_evaluates_once_per_interval(self):
+        """Test that frames within one interval count as a single check"""
+        controller, clock, _ = make_controller()
+        clock.now += 1.0
+        for _ in range(10):
+            controller.observe(250.0, controller.level)
+        assert controller.level == 0
+
+    def test_disabled_never_moves(self):
+        """Test that a disabled controller stays at full quality"""
+        controller, clock, depth = make_controller(enabled=False)
+        depth[0] = 50
+        tick(controller, clock, 500.0, checks=10)
+        assert controller.level == 0
+        assert controller.stats()["frames_by_tier"]["full"] == 10
+
+
+class RecordingDetector(PoseDetector):
+    """Pose detector that records the tier each frame was run at"""
+
+    def __init__(self):
+        super().__init__()
+        self.tiers = []
+
+    def warmup(self):
+        self.available = False
+        return False
+
+    def detect(self, frame, tier=None):
+        self.tiers.append(tier.name)
+        return super().detect(frame, tier)
+
+
+class TestAnalysisQuality:
+    """Test tier selection in the analysis service"""
+
+    @pytest.mark.asyncio
+    async def test_frame_uses_current_tier(self):
+        """Test that frames run at, and report, the controller's tier"""
+        detector_pool = DetectorPool(size=1, resolutions=["32x16"], factory=RecordingDetector)
+        device_pool = DevicePool(devices=[PoolDevice("cpu:0", "cpu", 0)])
+        controller, _, _ = make_controller()
+        service = AnalysisService(
+            detector_pool=detector_pool, device_pool=device_pool, quality=controller
+        )
+        controller.level = 2
+
+        result = await service.analyze_frame(np.zeros((24, 32, 3), dtype=np.uint8))
+
+        assert result["quality_tier"] == "low"
+        assert result["sample_fps"] == TIERS[2].sample_fps
+        assert detector_pool.detectors[0].tiers == ["low"]
+        assert controller.stats()["frames_by_tier"]["low"] == 1
+        assert service.pending_frames == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,156 @@
+"""
+Unit Tests for the Nightly Report Batch
+"""
+
+import asyncio
+import os
+import pytest
+from services.leader_lock import FileLeaderLock
+from services.report_batch import DailyReportBatch, compute_report_chunk
+
+
+class RecordingOutbox:
+    """Collects queued daily report emails"""
+
+    def __init__(self):
+        self.sent = []
+
+    def queue_daily_reports(self, reports):
+        for recipient, child_name, report_data in reports:
+            self.sent.append((recipient, child_name, report_data["date"]))
+        return len(reports)
+
+
+def make_children(count):
+    return [(f"child_{i:03d}", f"parent{i}@example.com") for i in range(count)]
+
+
+class TestDailyReportBatch:
+    """Test batch generation, progress and resumption"""
+
+    @pytest.fixture
+    def outbox(self):
+        return RecordingOutbox()
+
+    def test_compute_report_chunk(self):
+        """Test that a chunk yields one report per child"""
+        reports = compute_report_chunk(["child_001", "child_002"], "2026-02-21")
+        assert [r["child_id"] for r in reports] == ["child_001", "child_002"]
+        assert all(r["date"] == "2026-02-21" for r in reports)
+
+    @pytest.mark.asyncio
+    async def test_run_generates_and_emails_all(self, tmp_path, outbox):
+        """Test that every child gets a stored report and one email"""
+        batch = DailyReportBatch(
+            outbox,
+            children_provider=lambda: make_children(7),
+            output_dir=str(tmp_path),
+            workers=2,
+            chunk_size=3
+        )
+
+        progress = await batch.run("2026-02-21")
+
+        assert progress["total_children"] == 7
+        assert progress["chunks_total"] == 3
+        assert progress["chunks_done"] == 3
+        assert progress["emails_queued"] == 7
+        assert progress["running"] is False
+        assert sorted(child for _, child, _ in outbox.sent) == [
+            child for child, _ in make_children(7)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_resume_skips_completed_chunks(self, tmp_path, outbox):
+        """Test that a rerun only redoes chunks missing from the checkpoint"""
+        batch = DailyReportBatch(
+            outbox,
+            children_provider=lambda: make_children(6),
+            output_dir=str(tmp_path),
+            workers=1,
+            chunk_size=2
+        )
+        await batch.run("2026-02-21")
+
+        # Simulate a crash that lost the last chunk before its emails went out
+        run_dir = tmp_path / "2026-02-21"
+        os.remove(run_dir / "chunk-00002.json")
+        os.remove(run_dir / "chunk-00002.sent")
+        outbox.sent.clear()
+
+        progress = await batch.run("2026-02-21")
+
+        assert progress["chunks_resumed"] == 2
+        assert progress["children_done"] == 2
+        assert sorted(child for _, child, _ in outbox.sent) == ["child_004", "child_005"]
+
+    @pytest.mark.asyncio
+    async def test_resume_requeues_unsent_emails(self, tmp_path, outbox):
+        """Test that stored but unsent chunks are emailed without recomputing"""
+        batch = DailyReportBatch(
+            outbox,
+            children_provider=lambda: make_children(4),
+            output_dir=str(tmp_path),
+            workers=1,
+            chunk_size=2
+        )
+        await batch.run("2026-02-21")
+        os.remove(tmp_path / "2026-02-21" / "chunk-00000.sent")
+        outbox.sent.clear()
+
+        progress = await batch.run("2026-02-21")
+
+        assert progress["children_done"] == 0
+        assert sorted(child for _, child, _ in outbox.sent) == ["child_000", "child_001"]
+
+    @pytest.mark.asyncio
+    async def test_scheduler_resumes_every_unfinished_date(self, tmp_path, outbox):
+        """Test that start-up resumes runs from earlier days, not just today"""
+        batch = DailyReportBatch(
+            outbox,
+            children_provider=lambda: make_children(2),
+            output_dir=str(tmp_path / "batches"),
+            workers=1,
+            lock=FileLeaderLock("report-batch", str(tmp_path / "locks"))
+        )
+        for date in ["2026-02-19", "2026-02-20", "2026-02-21"]:
+            await batch.run(date)
+        for date in ["2026-02-21", "2026-02-19"]:
+            os.remove(tmp_path / "batches" / date / "chunk-00000.sent")
+        outbox.sent.clear()
+        assert batch._incomplete_dates() == ["2026-02-19", "2026-02-21"]
+
+        batch.start_scheduler()
+        for _ in range(100):
+            if len(outbox.sent) == 4:
+                break
+            await asyncio.sleep(0.01)
+        await batch.stop_scheduler()
+
+        assert sorted({date for _, _, date in outbox.sent}) == ["2026-02-19", "2026-02-21"]
+        assert batch._incomplete_dates() == []
+
+    @pytest.mark.asyncio
+    async def test_only_leader_runs(self, tmp_path, outbox):
+        """Test that a worker without the leader lock skips the scheduled run"""
+        batches = [
+            DailyReportBatch(
+                outbox,
+                children_provider=lambda: make_children(2),
+                output_dir=str(tmp_path / "batches"),
+                workers=1,
+                lock=FileLeaderLock("report-batch", str(tmp_path / "locks"))
+            )
+            for _ in range(2)
+        ]
+        await batches[0].lock.acquire()
+        await batches[1]._run_safely("2026-02-21")
+        assert outbox.sent == []
+
+        await batches[0].lock.release()
+        await batches[1]._run_safely("2026-02-21")
+        assert len(outbox.sent) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,178 @@
+"""
+Unit Tests for Report Cache
+"""
+
+import time
+import pytest
+from datetime import datetime, timezone
+from services.report_cache import (
+    ReportCache,
+    CachedReport,
+    InMemoryReportBackend,
+    RedisReportBackend,
+    REPORT_DAILY,
+    REPORT_WEEKLY,
+    week_start
+)
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestReportCache:
+    """Test report caching, eviction and invalidation"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def report_cache(self, clock):
+        """Create an in-memory report cache"""
+        return ReportCache(InMemoryReportBackend(max_entries=2, ttl_seconds=60, clock=clock))
+
+    @pytest.mark.asyncio
+    async def test_put_then_get(self, report_cache):
+        """Test that a stored report is returned with the same ETag"""
+        stored = await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"data": 1})
+        cached = await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21")
+
+        assert cached is not None
+        assert cached.etag == stored.etag
+        assert cached.body == b'{"data":1}'
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, report_cache):
+        """Test that the least recently used entry is evicted"""
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-19", {"d": 1})
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-20", {"d": 2})
+        # Touch the oldest entry so the second one becomes LRU
+        await report_cache.get(REPORT_DAILY, "child_001", "2026-02-19")
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 3})
+
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-19") is not None
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-20") is None
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry(self, report_cache, clock):
+        """Test that entries expire after the TTL"""
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 1})
+        clock.now += 61
+
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is None
+
+    @pytest.mark.asyncio
+    async def test_event_invalidates_only_covering_periods(self):
+        """Test that an event drops its day and week but nothing else"""
+        cache = ReportCache(InMemoryReportBackend(max_entries=10, ttl_seconds=60))
+        event_time = datetime(2026, 2, 21, 10, 30)
+        await cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 1})
+        await cache.put(REPORT_DAILY, "child_001", "2026-02-20", {"d": 2})
+        await cache.put(REPORT_WEEKLY, "child_001", week_start(event_time), {"w": 1})
+        await cache.put(REPORT_DAILY, "child_002", "2026-02-21", {"d": 3})
+
+        await cache.invalidate_event("child_001", event_time)
+
+        assert await cache.get(REPORT_DAILY, "child_001", "2026-02-21") is None
+        assert await cache.get(REPORT_WEEKLY, "child_001", week_start(event_time)) is None
+        assert await cache.get(REPORT_DAILY, "child_001", "2026-02-20") is not None
+        assert await cache.get(REPORT_DAILY, "child_002", "2026-02-21") is not None
+
+    @pytest.mark.asyncio
+    async def test_report_built_before_invalidation_not_stored(self, report_cache):
+        """Test that a report generated across an invalidation is served but not cached"""
+        generation = await report_cache.generation(REPORT_DAILY, "child_001", "2026-02-21")
+        await report_cache.invalidate_event("child_001", datetime(2026, 2, 21, 10, 0))
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 1}, generation)
+
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is None
+
+        generation = await report_cache.generation(REPORT_DAILY, "child_001", "2026-02-21")
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 2}, generation)
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is not None
+
+    @pytest.mark.asyncio
+    async def test_aware_event_invalidates_local_day(self, monkeypatch):
+        """Test that a UTC timestamp drops the report for its local date"""
+        monkeypatch.setenv("TZ", "Asia/Shanghai")
+        time.tzset()
+        try:
+            cache = ReportCache(InMemoryReportBackend(max_entries=10, ttl_seconds=60))
+            # Sunday 20:00 UTC is already Monday in UTC+8
+            event_time = datetime(2026, 2, 22, 20, 0, tzinfo=timezone.utc)
+            await cache.put(REPORT_DAILY, "child_001", "2026-02-23", {"d": 1})
+            await cache.put(REPORT_WEEKLY, "child_001", "2026-02-23", {"w": 1})
+
+            await cache.invalidate_event("child_001", event_time)
+
+            assert week_start(event_time) == "2026-02-23"
+            assert await cache.get(REPORT_DAILY, "child_001", "2026-02-23") is None
+            assert await cache.get(REPORT_WEEKLY, "child_001", "2026-02-23") is None
+        finally:
+            monkeypatch.undo()
+            time.tzset()
+
+    def test_week_start_is_monday(self):
+        """Test that weekly periods start on Monday"""
+        assert week_start(datetime(2026, 2, 21)) == "2026-02-16"
+        assert week_start(datetime(2026, 2, 16)) == "2026-02-16"
+
+    def test_etag_matching(self):
+        """Test If-None-Match parsing"""
+        report = CachedReport.from_payload({"status": "success"})
+
+        assert report.matches(report.etag)
+        assert report.matches(f'"other", W/{report.etag}')
+        assert report.matches("*")
+        assert not report.matches('"other"')
+        assert not report.matches(None)
+
+
+class TestRedisReportBackend:
+    """Test the shared Redis backend against fakeredis"""
+
+    @pytest.fixture
+    def report_cache(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        client = fakeredis.FakeAsyncRedis()
+        return ReportCache(RedisReportBackend(client, max_entries=2, ttl_seconds=60))
+
+    @pytest.mark.asyncio
+    async def test_round_trip_and_invalidate(self, report_cache):
+        """Test that reports survive a round trip and are invalidated by events"""
+        stored = await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 1})
+        cached = await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21")
+        assert cached.etag == stored.etag
+        assert cached.body == stored.body
+
+        await report_cache.invalidate_event("child_001", datetime(2026, 2, 21, 9, 0))
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is None
+
+    @pytest.mark.asyncio
+    async def test_stale_generation_not_stored(self, report_cache):
+        """Test that a write racing an invalidation is dropped"""
+        generation = await report_cache.generation(REPORT_DAILY, "child_001", "2026-02-21")
+        await report_cache.invalidate_event("child_001", datetime(2026, 2, 21, 9, 0))
+        await report_cache.put(REPORT_DAILY, "child_001", "2026-02-21", {"d": 1}, generation)
+
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is None
+
+    @pytest.mark.asyncio
+    async def test_size_limit(self, report_cache):
+        """Test that the oldest entries are dropped beyond max_entries"""
+        for day in ("2026-02-19", "2026-02-20", "2026-02-21"):
+            await report_cache.put(REPORT_DAILY, "child_001", day, {"day": day})
+
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-19") is None
+        assert await report_cache.get(REPORT_DAILY, "child_001", "2026-02-21") is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
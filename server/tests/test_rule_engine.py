@@ -0,0 +1,85 @@
+"""
+Unit Tests for the Rule Engine
+"""
+
+import pytest
+from models.schemas import ActivityType, AlertRule, AlertType
+from services.rule_engine import RuleEngine
+
+
+def play_rule(**kwargs):
+    values = dict(
+        rule_id="play",
+        activities=[ActivityType.PLAYING, ActivityType.DISTRACTED],
+        threshold_minutes=5,
+        cooldown_minutes=10
+    )
+    values.update(kwargs)
+    return AlertRule(**values)
+
+
+class TestRuleEngine:
+    """Test rule indexing, consecutive runs, windows and cooldowns"""
+
+    @pytest.fixture
+    def engine(self):
+        return RuleEngine()
+
+    def test_consecutive_run_fires_once(self, engine):
+        """Test that a run over the threshold fires once, spanning activities in the set"""
+        engine.set_rules("child_001", [play_rule()])
+
+        assert engine.evaluate("s1", "child_001", "playing", 180, now=0) == []
+        matches = engine.evaluate("s1", "child_001", "distracted", 180, now=180)
+        assert [m.rule.rule_id for m in matches] == ["play"]
+        assert matches[0].minutes == 6
+        assert engine.evaluate("s1", "child_001", "playing", 60, now=1000) == []
+
+    def test_other_activity_breaks_run_lazily(self, engine):
+        """Test that an unindexed event still resets consecutive runs"""
+        engine.set_rules("child_001", [play_rule()])
+
+        engine.evaluate("s1", "child_001", "playing", 240, now=0)
+        engine.evaluate("s1", "child_001", "studying", 60, now=240)
+
+        assert engine.evaluate("s1", "child_001", "playing", 240, now=300) == []
+
+    def test_window_rule_respects_cooldown(self, engine):
+        """Test windowed totals and the cooldown between repeated alerts"""
+        engine.set_rules("child_001", [play_rule(window_minutes=20, cooldown_minutes=10)])
+
+        engine.evaluate("s1", "child_001", "playing", 240, now=0)
+        engine.evaluate("s1", "child_001", "studying", 60, now=240)
+        assert len(engine.evaluate("s1", "child_001", "playing", 120, now=300)) == 1
+        assert engine.evaluate("s1", "child_001", "playing", 60, now=420) == []
+        assert len(engine.evaluate("s1", "child_001", "playing", 60, now=960)) == 1
+
+    def test_only_indexed_rules_are_evaluated(self, engine):
+        """Test that rules are keyed by child and activity"""
+        engine.set_rules("child_001", [
+            play_rule(),
+            AlertRule(
+                rule_id="away",
+                activities=[ActivityType.AWAY],
+                threshold_minutes=1,
+                alert_type=AlertType.LEAVE_TOO_LONG
+            )
+        ])
+
+        assert engine.evaluate("s1", "child_002", "away", 600, now=0) == []
+        matches = engine.evaluate("s1", "child_001", "away", 600, now=0)
+        assert [m.rule.alert_type for m in matches] == [AlertType.LEAVE_TOO_LONG]
+        assert engine.rule_count() == 2
+
+    def test_replacing_rules_resets_progress(self, engine):
+        """Test that recompiling a child's rules drops stale progress"""
+        engine.set_rules("child_001", [play_rule()])
+        engine.evaluate("s1", "child_001", "playing", 240, now=0)
+
+        engine.set_rules("child_001", [play_rule()])
+
+        assert engine.evaluate("s1", "child_001", "playing", 60, now=240) == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
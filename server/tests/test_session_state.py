@@ -0,0 +1,125 @@
+"""
+Unit Tests for Session State and Idle Eviction
+"""
+
+import sys
+import pytest
+from datetime import datetime
+from models.schemas import AlertType
+from services.session_state import SessionState, SessionStore
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def legacy_state_size(state: dict) -> int:
+    """Size of the dict-based state AlertService used to keep"""
+    return sys.getsizeof(state) + sum(sys.getsizeof(v) for v in state.values())
+
+
+class TestSessionState:
+    """Test flag packing and footprint"""
+
+    def test_flags(self):
+        """Test active flag and alert bits"""
+        state = SessionState("child_001", 100)
+        state.mark_sent(AlertType.PLAY_WHILE_WORK)
+
+        assert state.is_active
+        assert state.alert_sent(AlertType.PLAY_WHILE_WORK)
+        assert not state.alert_sent(AlertType.LEAVE_TOO_LONG)
+        assert state.alerts_sent == ["play_while_work"]
+
+        state.is_active = False
+        assert not state.is_active
+        assert state.alerts_sent == ["play_while_work"]
+
+    def test_smaller_than_dict_state(self):
+        """Test the slotted record against the previous dict layout"""
+        legacy = {
+            "child_id": "child_001",
+            "is_active": True,
+            "start_time": datetime.now(),
+            "leave_time": datetime.now(),
+            "leave_duration": 120,
+            "play_time": None,
+            "play_duration": 0,
+            "alerts_sent": ["leave_too_long"],
+            "timers": {}
+        }
+        state = SessionState("child_001", 100)
+        state.leave_time = 100
+        state.leave_duration = 120
+
+        assert state.footprint() * 3 < legacy_state_size(legacy)
+
+
+class TestSessionStore:
+    """Test LRU ordering and incremental TTL eviction"""
+
+    def test_idle_sessions_are_evicted(self):
+        """Test that sessions idle past the TTL are dropped"""
+        clock = FakeClock()
+        evicted = []
+        store = SessionStore(
+            idle_ttl_seconds=60,
+            evict_batch=10,
+            on_evict=lambda sid, state: evicted.append(sid),
+            clock=clock
+        )
+        store.touch("s1", "child_001")
+        store.touch("s2", "child_002")
+        clock.now += 30
+        store.touch("s1", "child_001")
+        clock.now += 40
+
+        store.evict()
+
+        assert evicted == ["s2"]
+        assert "s1" in store and "s2" not in store
+
+    def test_eviction_is_incremental(self):
+        """Test that one call evicts at most evict_batch sessions"""
+        clock = FakeClock()
+        store = SessionStore(idle_ttl_seconds=60, evict_batch=5, clock=clock)
+        for i in range(20):
+            store.touch(f"s{i}", "child_001")
+        clock.now += 61
+
+        assert store.evict() == 5
+        assert len(store) == 15
+        # Each touch also pays down a batch
+        store.touch("fresh", "child_001")
+        assert len(store) == 11
+
+    def test_get_does_not_refresh(self):
+        """Test that read-only lookups do not keep sessions alive"""
+        clock = FakeClock()
+        store = SessionStore(idle_ttl_seconds=60, evict_batch=5, clock=clock)
+        store.touch("s1", "child_001")
+        clock.now += 50
+        assert store.get("s1") is not None
+        clock.now += 20
+
+        store.evict()
+        assert store.get("s1") is None
+
+    def test_memory_stats(self):
+        """Test that memory per session is reported"""
+        store = SessionStore(idle_ttl_seconds=60, evict_batch=5)
+        for i in range(10):
+            store.start(f"s{i}", "child_001")
+
+        stats = store.memory_stats()
+        assert stats["sessions"] == 10
+        assert 0 < stats["bytes_per_session"] < 1024
+        assert stats["approx_total_bytes"] == stats["bytes_per_session"] * 10
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
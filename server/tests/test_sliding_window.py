@@ -0,0 +1,51 @@
+"""
+Unit Tests for Sliding-Window Counters
+"""
+
+import pytest
+from services.sliding_window import SlidingWindowCounter
+
+
+class TestSlidingWindowCounter:
+    """Test bucketed window accumulation and expiry"""
+
+    def test_accumulates_within_window(self):
+        """Test that time inside the window adds up"""
+        counter = SlidingWindowCounter(window_seconds=1200, bucket_seconds=60)
+        counter.add(0, 60)
+        counter.add(300, 120)
+
+        assert counter.total(600) == 180
+
+    def test_old_buckets_expire(self):
+        """Test that time older than the window is dropped bucket by bucket"""
+        counter = SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+        counter.add(0, 30)
+        counter.add(120, 40)
+
+        assert counter.total(299) == 70
+        assert counter.total(300) == 40
+        assert counter.total(419) == 40
+        assert counter.total(420) == 0
+
+    def test_long_gap_clears_everything(self):
+        """Test that a gap longer than the window resets the counter"""
+        counter = SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+        for t in range(0, 300, 10):
+            counter.add(t, 10)
+
+        assert counter.total(10000) == 0
+        counter.add(10000, 5)
+        assert counter.total(10000) == 5
+
+    def test_out_of_order_time_goes_to_newest_bucket(self):
+        """Test that a clock step backwards does not corrupt the total"""
+        counter = SlidingWindowCounter(window_seconds=300, bucket_seconds=60)
+        counter.add(200, 10)
+        counter.add(100, 10)
+
+        assert counter.total(200) == 20
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
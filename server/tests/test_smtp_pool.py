@@ -0,0 +1,103 @@
+"""
+Unit Tests for the SMTP Connection Pool (against a local aiosmtpd server)
+"""
+
+import asyncio
+import socket
+import pytest
+from email.mime.text import MIMEText
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+from services.smtp_pool import SMTPConnectionPool
+
+
+class RecordingHandler:
+    """aiosmtpd handler that records which session delivered each message"""
+
+    def __init__(self):
+        self.sessions = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.append(id(session))
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_message(index):
+    message = MIMEText(f"body {index}")
+    message["Subject"] = f"test {index}"
+    message["From"] = "noreply@homeworkguardian.com"
+    message["To"] = "parent@example.com"
+    return message
+
+
+class TestSMTPConnectionPool:
+    """Test connection reuse, limits and reconnection"""
+
+    @pytest.fixture
+    def smtp_server(self):
+        handler = RecordingHandler()
+        controller = aiosmtpd_controller.Controller(
+            handler, hostname="127.0.0.1", port=free_port()
+        )
+        controller.start()
+        yield controller, handler
+        controller.stop()
+
+    def make_pool(self, controller, **kwargs):
+        return SMTPConnectionPool(
+            controller.hostname,
+            controller.port,
+            start_tls=False,
+            **kwargs
+        )
+
+    @pytest.mark.asyncio
+    async def test_reuses_connections(self, smtp_server):
+        """Test that a burst is delivered over at most `size` connections"""
+        controller, handler = smtp_server
+        pool = self.make_pool(controller, size=2)
+
+        await asyncio.gather(*[pool.send_message(make_message(i)) for i in range(20)])
+        await pool.close()
+
+        assert len(handler.sessions) == 20
+        assert pool.connections_opened <= 2
+        assert len(set(handler.sessions)) <= 2
+
+    @pytest.mark.asyncio
+    async def test_max_messages_per_connection(self, smtp_server):
+        """Test that connections are recycled after the message limit"""
+        controller, handler = smtp_server
+        pool = self.make_pool(controller, size=1, max_messages_per_connection=3)
+
+        for i in range(7):
+            await pool.send_message(make_message(i))
+        await pool.close()
+
+        assert len(handler.sessions) == 7
+        assert pool.connections_opened == 3
+
+    @pytest.mark.asyncio
+    async def test_reconnects_after_disconnect(self, smtp_server):
+        """Test that a dropped idle connection is replaced transparently"""
+        controller, handler = smtp_server
+        pool = self.make_pool(controller, size=1, idle_check_seconds=0)
+
+        await pool.send_message(make_message(0))
+        # Drop the pooled connection underneath the pool
+        pool._idle[0].client.close()
+        await pool.send_message(make_message(1))
+        await pool.close()
+
+        assert len(handler.sessions) == 2
+        assert pool.connections_opened == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
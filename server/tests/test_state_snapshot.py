@@ -0,0 +1,186 @@
+"""
+Unit Tests for Alert State Snapshots and the Delta Journal
+"""
+
+import time
+import pytest
+from models.schemas import AlertConfig
+from services.alert_service import AlertService
+from services.notification_outbox import NotificationOutbox
+from services.state_snapshot import StateSnapshotter
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = NotificationOutbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def config():
+    return AlertConfig(
+        child_id="child_001",
+        email="parent@example.com",
+        leave_threshold_minutes=1,
+        enable_email=False
+    )
+
+
+def snapshotter_for(service, tmp_path, slot=0):
+    return StateSnapshotter(service, directory=str(tmp_path / "state"), slot=slot)
+
+
+class TestStateSnapshot:
+    """Test snapshot/journal round trips and timer restoration"""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_round_trip(self, outbox, config, tmp_path):
+        """Test that sessions, flags and configs survive a restart"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        for i in range(50):
+            await service.start_session(f"session_{i}", "child_001")
+            await service.check_and_trigger(f"session_{i}", "child_001", "away", 70)
+        await service.end_session("session_0")
+        await snapshotter_for(service, tmp_path).snapshot()
+
+        restored = AlertService(outbox)
+        result = await snapshotter_for(restored, tmp_path).restore()
+
+        assert result["sessions"] == 50
+        assert "child_001" in restored.configs
+        assert list(restored.session_states) == list(service.session_states)
+        state = restored.session_states["session_7"]
+        assert state.leave_duration == 70
+        assert state.alerts_sent == ["leave_too_long"]
+        assert restored.session_states["session_0"].is_active is False
+
+    @pytest.mark.asyncio
+    async def test_journal_applies_changes_after_snapshot(self, outbox, config, tmp_path):
+        """Test that journaled updates and evictions are replayed over the snapshot"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        snapshotter = snapshotter_for(service, tmp_path)
+        await service.start_session("kept", "child_001")
+        await service.start_session("dropped", "child_001")
+        await snapshotter.snapshot()
+
+        await service.check_and_trigger("kept", "child_001", "away", 20)
+        await service.check_and_trigger("new", "child_001", "playing", 30)
+        service.session_states.pop("dropped")
+        service.dirty_sessions.add("dropped")
+        assert await snapshotter.flush() > 0
+
+        restored = AlertService(outbox)
+        result = await snapshotter_for(restored, tmp_path).restore()
+
+        assert result["journal_entries"] == 3
+        assert set(restored.session_states) == {"kept", "new"}
+        assert restored.session_states["kept"].leave_duration == 20
+        assert restored.session_states["new"].play_duration == 30
+
+    @pytest.mark.asyncio
+    async def test_replayed_sessions_keep_last_seen_order(self, outbox, config, tmp_path):
+        """Test that journal replay leaves the store oldest first for eviction"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        snapshotter = snapshotter_for(service, tmp_path)
+        now = int(time.time())
+        await service.start_session("old", "child_001")
+        service.session_states["old"].last_seen = now - 50
+        await snapshotter.snapshot()
+
+        for session_id, age in (("a", 10), ("b", 30), ("c", 20)):
+            await service.start_session(session_id, "child_001")
+            service.session_states[session_id].last_seen = now - age
+        await snapshotter.flush()
+
+        restored = AlertService(outbox)
+        await snapshotter_for(restored, tmp_path).restore()
+
+        assert list(restored.session_states) == ["old", "b", "c", "a"]
+
+    @pytest.mark.asyncio
+    async def test_pending_deadline_survives_restart(self, outbox, config, tmp_path):
+        """Test that an in-progress leave timer is rescheduled, not reset"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        await service.start_session("session_001", "child_001")
+        await service.check_and_trigger("session_001", "child_001", "away", 10)
+        await snapshotter_for(service, tmp_path).snapshot()
+
+        restored = AlertService(outbox)
+        await snapshotter_for(restored, tmp_path).restore()
+
+        assert len(restored.timer_wheel) == 1
+        assert await restored.process_timers(time.monotonic() + 30) == []
+        assert await restored.process_timers(time.monotonic() + 52) == ["session_001"]
+
+    @pytest.mark.asyncio
+    async def test_torn_journal_tail_is_ignored(self, outbox, config, tmp_path):
+        """Test that a partially written journal entry does not break restore"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        snapshotter = snapshotter_for(service, tmp_path)
+        await service.check_and_trigger("session_001", "child_001", "away", 20)
+        await snapshotter.flush()
+        with open(snapshotter.journal_path, "ab") as f:
+            f.write(b"\x01\xff\xff\x00\x00partial")
+
+        restored = AlertService(outbox)
+        result = await snapshotter_for(restored, tmp_path).restore()
+
+        assert result["sessions"] == 1
+        assert restored.session_states["session_001"].leave_duration == 20
+
+    @pytest.mark.asyncio
+    async def test_stale_journal_after_crash_is_skipped(self, outbox, config, tmp_path):
+        """Test that journal entries older than the snapshot are not replayed over it"""
+        service = AlertService(outbox)
+        await service.update_config(config)
+        snapshotter = snapshotter_for(service, tmp_path)
+        await snapshotter.snapshot()
+        await service.check_and_trigger("session_001", "child_001", "away", 20)
+        await snapshotter.flush()
+        with open(snapshotter.journal_path, "rb") as f:
+            stale = f.read()
+
+        await service.check_and_trigger("session_001", "child_001", "away", 20)
+        await snapshotter.snapshot()
+        # Crash after the snapshot replaced the old one, before the journal was truncated
+        with open(snapshotter.journal_path, "wb") as f:
+            f.write(stale)
+
+        restored = AlertService(outbox)
+        result = await snapshotter_for(restored, tmp_path).restore()
+
+        assert result["journal_entries"] == 0
+        assert restored.session_states["session_001"].leave_duration == 40
+
+    @pytest.mark.asyncio
+    async def test_workers_write_separate_slots(self, outbox, config, tmp_path):
+        """Test that concurrent workers never share snapshot files"""
+        workers = [AlertService(outbox) for _ in range(2)]
+        snapshotters = [snapshotter_for(w, tmp_path, slot=None) for w in workers]
+        for i, (worker, snapshotter) in enumerate(zip(workers, snapshotters)):
+            await worker.update_config(config)
+            await worker.start_session(f"session_{i}", "child_001")
+            await snapshotter.snapshot()
+
+        assert [s.slot for s in snapshotters] == [0, 1]
+        assert snapshotters[0].snapshot_path != snapshotters[1].snapshot_path
+        await snapshotters[1].stop()
+
+        # A restarted worker takes over the free slot and its sessions
+        restored = AlertService(outbox)
+        replacement = snapshotter_for(restored, tmp_path, slot=None)
+        result = await replacement.restore()
+        assert result["slot"] == 1
+        assert list(restored.session_states) == ["session_1"]
+        await replacement.stop()
+        await snapshotters[0].stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
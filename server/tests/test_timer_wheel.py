@@ -0,0 +1,78 @@
+"""
+Unit Tests for the Hierarchical Timer Wheel
+"""
+
+import random
+import pytest
+from services.timer_wheel import TimerWheel
+
+
+class TestTimerWheel:
+    """Test scheduling, cancellation and cascading"""
+
+    def test_fires_at_deadline(self):
+        """Test that a timer expires exactly when its deadline passes"""
+        wheel = TimerWheel(tick_seconds=1.0, start=0.0)
+        wheel.schedule(5.0, "a")
+
+        assert wheel.advance(4.0) == []
+        assert wheel.advance(5.0) == ["a"]
+        assert len(wheel) == 0
+
+    def test_past_deadline_fires_next_tick(self):
+        """Test that an already-due timer fires on the next advance"""
+        wheel = TimerWheel(tick_seconds=1.0, start=0.0)
+        wheel.advance(10.0)
+        wheel.schedule(3.0, "late")
+
+        assert wheel.advance(11.0) == ["late"]
+
+    def test_cancel(self):
+        """Test that cancelled timers never fire"""
+        wheel = TimerWheel(tick_seconds=1.0, start=0.0)
+        handle = wheel.schedule(5.0, "a")
+        wheel.schedule(5.0, "b")
+
+        wheel.cancel(handle)
+        wheel.cancel(handle)
+
+        assert len(wheel) == 1
+        assert wheel.advance(6.0) == ["b"]
+
+    def test_cascades_through_levels(self):
+        """Test timers spanning every level fire at the right tick"""
+        wheel = TimerWheel(tick_seconds=1.0, slots=4, levels=3, start=0.0)
+        rng = random.Random(7)
+        deadlines = [rng.randint(1, 200) for _ in range(300)]
+        for i, deadline in enumerate(deadlines):
+            wheel.schedule(float(deadline), (deadline, i))
+
+        for now in range(1, 201):
+            for deadline, _ in wheel.advance(float(now)):
+                assert deadline == now
+        assert len(wheel) == 0
+
+    def test_beyond_range_is_clamped_then_fires(self):
+        """Test that deadlines past the wheel span still fire on time"""
+        wheel = TimerWheel(tick_seconds=1.0, slots=4, levels=2, start=0.0)
+        wheel.schedule(40.0, "far")
+
+        fired_at = None
+        for now in range(1, 50):
+            if wheel.advance(float(now)):
+                fired_at = now
+        assert fired_at == 40
+
+    def test_many_timers(self):
+        """Test that 100k timers can be scheduled and cancelled"""
+        wheel = TimerWheel(tick_seconds=1.0, start=0.0)
+        handles = [wheel.schedule(float(60 + i % 3600), i) for i in range(100000)]
+        for handle in handles[::2]:
+            wheel.cancel(handle)
+
+        assert len(wheel) == 50000
+        assert len(wheel.advance(3700.0)) == 50000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])